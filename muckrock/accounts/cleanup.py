@@ -0,0 +1,181 @@
+"""
+Delete expired data in bounded batches for the nightly clean up
+
+Each BatchDeleter deletes the rows matching its queryset in primary key order,
+one batch per transaction, pausing between batches so that replication and
+vacuum can keep up.  The last primary key handled is saved in redis, so a run
+which runs out of time picks up where it left off on the next night.
+"""
+
+# Django
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.utils import timezone
+
+# Standard Library
+import logging
+import time
+from datetime import timedelta
+
+# Third Party
+import boto3
+from django_redis import get_redis_connection
+from reversion.models import Revision, Version
+
+# MuckRock
+from muckrock.foia.models import RawEmail
+
+logger = logging.getLogger(__name__)
+
+# how long to keep old revisions for
+REVISION_DAYS = 180
+# directories on the media bucket holding generated files for downloading,
+# which are only linked to for AWS_MEDIA_EXPIRATION_SECONDS
+EXPORT_DIRS = ["exported_csv", "zip_request", "agency_mass_import"]
+
+
+class BatchDeleter:
+    """Delete the rows matching a queryset in primary key ordered batches"""
+
+    prefix = "cleanup"
+    # forget the checkpoint if the clean up has not run for a week
+    checkpoint_timeout = 7 * 24 * 60 * 60
+
+    def __init__(self, name, queryset, batch_size=1000, pause=0.1, pre_delete=None):
+        # pylint: disable=too-many-arguments
+        self.name = name
+        self.queryset = queryset
+        self.batch_size = batch_size
+        self.pause = pause
+        # called with each batch before it is deleted
+        self.pre_delete = pre_delete
+        self.redis = get_redis_connection("lock")
+
+    def _key(self):
+        """The redis key for the checkpoint"""
+        return "{}:{}:last_pk".format(self.prefix, self.name)
+
+    def get_checkpoint(self):
+        """Get the last primary key handled by a previous run, if any"""
+        last_pk = self.redis.get(self._key())
+        if last_pk is None:
+            return None
+        return self.queryset.model._meta.pk.to_python(last_pk.decode("utf8"))
+
+    def set_checkpoint(self, last_pk):
+        """Save the last primary key handled"""
+        self.redis.set(self._key(), last_pk, ex=self.checkpoint_timeout)
+
+    def run(self, deadline):
+        """Delete batches until there are no more rows or the deadline passes
+
+        Returns the number of rows deleted
+        """
+        label = self.queryset.model._meta.label
+        last_pk = self.get_checkpoint()
+        deleted = 0
+        start = time.monotonic()
+        while time.monotonic() < deadline:
+            queryset = self.queryset
+            if last_pk is not None:
+                queryset = queryset.filter(pk__gt=last_pk)
+            pks = list(
+                queryset.order_by("pk").values_list("pk", flat=True)[: self.batch_size]
+            )
+            if not pks:
+                # finished a full pass, start from the beginning next time
+                self.redis.delete(self._key())
+                break
+            batch = self.queryset.filter(pk__gte=pks[0], pk__lte=pks[-1])
+            with transaction.atomic():
+                if self.pre_delete is not None:
+                    self.pre_delete(batch)
+                _, counts = batch.delete()
+            deleted += counts.get(label, 0)
+            last_pk = pks[-1]
+            self.set_checkpoint(last_pk)
+            time.sleep(self.pause)
+        log_throughput(self.name, deleted, time.monotonic() - start)
+        return deleted
+
+
+def log_throughput(name, deleted, duration):
+    """Log how quickly rows were deleted"""
+    logger.info(
+        "DB Clean up %s: deleted %d in %.1fs (%.1f/s)",
+        name,
+        deleted,
+        duration,
+        deleted / duration if duration > 0 else 0,
+    )
+
+
+def delete_raw_email_files(raw_emails):
+    """Delete the stored files for raw emails which are about to be deleted"""
+    for raw_email in raw_emails.exclude(raw_email_file=""):
+        raw_email.raw_email_file.delete(save=False)
+
+
+def get_deleters():
+    """The deleters to run, in order"""
+    now = timezone.now()
+    revision_cutoff = now - timedelta(days=REVISION_DAYS)
+    return [
+        BatchDeleter("sessions", Session.objects.filter(expire_date__lt=now)),
+        # delete the versions separately first, so that deleting each batch of
+        # revisions does not cascade to an unbounded number of versions
+        BatchDeleter(
+            "versions",
+            Version.objects.filter(revision__date_created__lt=revision_cutoff),
+        ),
+        BatchDeleter(
+            "revisions", Revision.objects.filter(date_created__lt=revision_cutoff)
+        ),
+        # raw emails whose communication has been deleted
+        BatchDeleter(
+            "raw_emails",
+            RawEmail.objects.filter(email=None, communication=None),
+            batch_size=100,
+            pre_delete=delete_raw_email_files,
+        ),
+    ]
+
+
+def delete_expired_exports(deadline):
+    """Delete generated download files whose links have expired
+
+    Returns the number of files deleted
+    """
+    cutoff = timezone.now() - timedelta(
+        seconds=int(settings.AWS_MEDIA_EXPIRATION_SECONDS)
+    )
+    bucket = boto3.resource("s3").Bucket(settings.AWS_MEDIA_BUCKET_NAME)
+    paginator = bucket.meta.client.get_paginator("list_objects_v2")
+    deleted = 0
+    start = time.monotonic()
+    for dir_name in EXPORT_DIRS:
+        # each page has at most 1000 keys, the limit for a single delete call
+        for page in paginator.paginate(Bucket=bucket.name, Prefix=dir_name + "/"):
+            if time.monotonic() >= deadline:
+                break
+            keys = [
+                {"Key": obj["Key"]}
+                for obj in page.get("Contents", [])
+                if obj["LastModified"] < cutoff
+            ]
+            if keys:
+                bucket.delete_objects(Delete={"Objects": keys, "Quiet": True})
+                deleted += len(keys)
+    log_throughput("exports", deleted, time.monotonic() - start)
+    return deleted
+
+
+def run_cleanup(seconds):
+    """Run each of the clean ups, stopping after the given number of seconds"""
+    deadline = time.monotonic() + seconds
+    totals = {}
+    for deleter in get_deleters():
+        totals[deleter.name] = deleter.run(deadline)
+    totals["exports"] = delete_expired_exports(deadline)
+    return totals
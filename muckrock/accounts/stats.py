@@ -0,0 +1,78 @@
+"""
+Helpers for collecting the nightly statistics
+"""
+
+# Django
+from django.db.models import Count, Q
+
+# Standard Library
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# statistics field suffix -> entitlement slug
+ENTITLEMENTS = [
+    ("pro", "professional"),
+    ("basic", "free"),
+    ("beta", "beta"),
+    ("proxy", "proxy"),
+    ("admin", "admin"),
+]
+
+
+def count_if(distinct=False, **filters):
+    """Count rows matching the given filters, for use in a conditional aggregate"""
+    return Count("pk", filter=Q(**filters), distinct=distinct)
+
+
+def count_choices(prefix, field, choices, distinct=False, **filters):
+    """Build a conditional count for each value of a field
+
+    `choices` maps a suffix for the statistics field name to the value of `field`
+    """
+    return {
+        "{}_{}".format(prefix, suffix): count_if(
+            distinct=distinct, **{field: value}, **filters
+        )
+        for suffix, value in choices
+    }
+
+
+class StatisticsCollector:
+    """Run the queries needed for the nightly statistics, timing each one
+
+    Each method runs a single query and records how long it took under the given
+    name, so slow queries can be found from the logs
+    """
+
+    def __init__(self):
+        self.timings = []
+
+    def _timed(self, name, func, *args, **kwargs):
+        """Call the function and record its run time"""
+        start = time.monotonic()
+        result = func(*args, **kwargs)
+        self.timings.append((name, time.monotonic() - start))
+        return result
+
+    def aggregate(self, name, queryset, **aggregates):
+        """Compute all of the aggregates over the queryset in a single query"""
+        return self._timed(name, queryset.aggregate, **aggregates)
+
+    def count(self, name, queryset):
+        """Count the queryset"""
+        return self._timed(name, queryset.count)
+
+    def value(self, name, func):
+        """Compute a single value with a custom function"""
+        return self._timed(name, func)
+
+    def log_timings(self):
+        """Log the collected timings, slowest first"""
+        total = sum(duration for _, duration in self.timings)
+        logger.info(
+            "Statistics collected with %d queries in %.2fs", len(self.timings), total
+        )
+        for name, duration in sorted(self.timings, key=lambda t: t[1], reverse=True):
+            logger.info("Statistics query %s: %.3fs", name, duration)
@@ -5,23 +5,31 @@ Tasks for the account application
 # Django
 from celery.exceptions import SoftTimeLimitExceeded
 from celery.schedules import crontab
-from celery.task import periodic_task
+from celery.task import periodic_task, task
 from django.contrib.auth.models import User
-from django.core.management import call_command
-from django.db.models import Count, F, Sum
+from django.db.models import Count, F, Q, Sum
 from django.utils import timezone
 
 # Standard Library
 import logging
 import os
 from datetime import date, datetime, time, timedelta
+from decimal import Decimal
 
 # Third Party
+from actstream.models import Action
 from raven import Client
 from raven.contrib.celery import register_logger_signal, register_signal
 
 # MuckRock
+from muckrock.accounts import cleanup
 from muckrock.accounts.models import Statistics
+from muckrock.accounts.stats import (
+    ENTITLEMENTS,
+    StatisticsCollector,
+    count_choices,
+    count_if,
+)
 from muckrock.agency.models import Agency
 from muckrock.communication.models import (
     EmailCommunication,
@@ -29,6 +37,7 @@ from muckrock.communication.models import (
     MailCommunication,
     PortalCommunication,
 )
+from muckrock.core.utils import notify_user_pks
 from muckrock.crowdfund.models import Crowdfund, CrowdfundPayment
 from muckrock.crowdsource.models import Crowdsource, CrowdsourceResponse
 from muckrock.foia.models import FOIACommunication, FOIAComposer, FOIAFile, FOIARequest
@@ -62,463 +71,347 @@ register_signal(client)
     name="muckrock.accounts.tasks.store_statistics",
 )
 def store_statistics():
-    """Store the daily statistics"""
+    """Store the daily statistics
+
+    Each table is only scanned once, using conditional aggregates to compute all
+    of the counts needed from it
+    """
     # pylint: disable=too-many-statements
+    # pylint: disable=too-many-locals
 
     midnight = time(tzinfo=timezone.get_current_timezone())
     today_midnight = datetime.combine(date.today(), midnight)
     yesterday = date.today() - timedelta(1)
     yesterday_midnight = today_midnight - timedelta(1)
+    yesterday_range = (yesterday_midnight, today_midnight)
+
+    stats = StatisticsCollector()
+
+    def crowdfund_entitlement(slug):
+        """Crowdfunds belonging to a user with the given entitlement"""
+        return Q(foia__composer__organization__entitlement__slug=slug) | Q(
+            projects__contributors__organizations__entitlement__slug=slug
+        )
 
     kwargs = {}
     kwargs["date"] = yesterday
-    kwargs["total_requests"] = FOIARequest.objects.count()
-    kwargs["total_requests_success"] = FOIARequest.objects.filter(status="done").count()
-    kwargs["total_requests_denied"] = FOIARequest.objects.filter(
-        status="rejected"
-    ).count()
-    kwargs["total_requests_draft"] = 0  # draft is no longer a valid status
-    kwargs["total_requests_submitted"] = FOIARequest.objects.filter(
-        status="submitted"
-    ).count()
-    kwargs["total_requests_awaiting_ack"] = FOIARequest.objects.filter(
-        status="ack"
-    ).count()
-    kwargs["total_requests_awaiting_response"] = FOIARequest.objects.filter(
-        status="processed"
-    ).count()
-    kwargs["total_requests_awaiting_appeal"] = FOIARequest.objects.filter(
-        status="appealing"
-    ).count()
-    kwargs["total_requests_fix_required"] = FOIARequest.objects.filter(
-        status="fix"
-    ).count()
-    kwargs["total_requests_payment_required"] = FOIARequest.objects.filter(
-        status="payment"
-    ).count()
-    kwargs["total_requests_no_docs"] = FOIARequest.objects.filter(
-        status="no_docs"
-    ).count()
-    kwargs["total_requests_partial"] = FOIARequest.objects.filter(
-        status="partial"
-    ).count()
-    kwargs["total_requests_abandoned"] = FOIARequest.objects.filter(
-        status="abandoned"
-    ).count()
-    kwargs["total_requests_lawsuit"] = FOIARequest.objects.filter(
-        status="lawsuit"
-    ).count()
-    kwargs["requests_processing_days"] = FOIARequest.objects.get_processing_days()
-    kwargs["total_composers"] = FOIAComposer.objects.count()
-    kwargs["total_composers_draft"] = FOIAComposer.objects.filter(
-        status="started"
-    ).count()
-    kwargs["total_composers_submitted"] = FOIAComposer.objects.filter(
-        status="submitted"
-    ).count()
-    kwargs["total_composers_filed"] = FOIAComposer.objects.filter(
-        status="filed"
-    ).count()
-    kwargs["sent_communications_portal"] = PortalCommunication.objects.filter(
-        communication__datetime__range=(yesterday_midnight, today_midnight),
-        communication__response=False,
-    ).count()
-    kwargs["sent_communications_email"] = EmailCommunication.objects.filter(
-        communication__datetime__range=(yesterday_midnight, today_midnight),
-        communication__response=False,
-    ).count()
-    kwargs["sent_communications_fax"] = FaxCommunication.objects.filter(
-        communication__datetime__range=(yesterday_midnight, today_midnight),
-        communication__response=False,
-    ).count()
-    kwargs["sent_communications_mail"] = MailCommunication.objects.filter(
-        communication__datetime__range=(yesterday_midnight, today_midnight),
-        communication__response=False,
-    ).count()
-    kwargs["machine_requests"] = FoiaMachineRequest.objects.count()
-    kwargs["machine_requests_success"] = FoiaMachineRequest.objects.filter(
-        status="done"
-    ).count()
-    kwargs["machine_requests_denied"] = FoiaMachineRequest.objects.filter(
-        status="rejected"
-    ).count()
-    kwargs["machine_requests_draft"] = FoiaMachineRequest.objects.filter(
-        status="started"
-    ).count()
-    kwargs["machine_requests_submitted"] = FoiaMachineRequest.objects.filter(
-        status="submitted"
-    ).count()
-    kwargs["machine_requests_awaiting_ack"] = FoiaMachineRequest.objects.filter(
-        status="ack"
-    ).count()
-    kwargs["machine_requests_awaiting_response"] = FoiaMachineRequest.objects.filter(
-        status="processed"
-    ).count()
-    kwargs["machine_requests_awaiting_appeal"] = FoiaMachineRequest.objects.filter(
-        status="appealing"
-    ).count()
-    kwargs["machine_requests_fix_required"] = FoiaMachineRequest.objects.filter(
-        status="fix"
-    ).count()
-    kwargs["machine_requests_payment_required"] = FoiaMachineRequest.objects.filter(
-        status="payment"
-    ).count()
-    kwargs["machine_requests_no_docs"] = FoiaMachineRequest.objects.filter(
-        status="no_docs"
-    ).count()
-    kwargs["machine_requests_partial"] = FoiaMachineRequest.objects.filter(
-        status="partial"
-    ).count()
-    kwargs["machine_requests_abandoned"] = FoiaMachineRequest.objects.filter(
-        status="abandoned"
-    ).count()
-    kwargs["machine_requests_lawsuit"] = FoiaMachineRequest.objects.filter(
-        status="lawsuit"
-    ).count()
-    kwargs["total_pages"] = FOIAFile.objects.aggregate(Sum("pages"))["pages__sum"]
-    # user stats will now be kept on squarelet
-    kwargs["total_users"] = 0
-    kwargs["total_users_excluding_agencies"] = 0
-    kwargs["total_users_filed"] = (
-        User.objects.annotate(num_foia=Count("composers")).exclude(num_foia=0).count()
-    )  # this is still on muckrock since it deals with foia composers
-    kwargs["total_agencies"] = Agency.objects.count()
-    kwargs["total_fees"] = FOIARequest.objects.aggregate(Sum("price"))["price__sum"]
-    kwargs["pro_users"] = 0  # squarelet
-    kwargs["pro_user_names"] = ""  # squarelet
-    kwargs["daily_requests_pro"] = (
-        FOIARequest.objects.filter(
-            composer__organization__entitlement__slug="professional"
-        )
-        .get_submitted_range(yesterday_midnight, today_midnight)
-        .exclude_org_users()
-        .count()
-    )
-    kwargs["daily_requests_basic"] = (
-        FOIARequest.objects.filter(composer__organization__entitlement__slug="free")
-        .get_submitted_range(yesterday_midnight, today_midnight)
-        .exclude_org_users()
-        .count()
-    )
-    kwargs["daily_requests_beta"] = (
-        FOIARequest.objects.filter(composer__organization__entitlement__slug="beta")
-        .get_submitted_range(yesterday_midnight, today_midnight)
-        .exclude_org_users()
-        .count()
-    )
-    kwargs["daily_requests_proxy"] = (
-        FOIARequest.objects.filter(composer__organization__entitlement__slug="proxy")
-        .get_submitted_range(yesterday_midnight, today_midnight)
-        .exclude_org_users()
-        .count()
-    )
-    kwargs["daily_requests_admin"] = (
-        FOIARequest.objects.filter(composer__organization__entitlement__slug="admin")
-        .get_submitted_range(yesterday_midnight, today_midnight)
-        .exclude_org_users()
-        .count()
-    )
-    kwargs["daily_requests_org"] = (
-        FOIARequest.objects.filter(
-            composer__organization__entitlement__slug="organization"
-        )
-        .get_submitted_range(yesterday_midnight, today_midnight)
-        .count()
-    )
-    kwargs["daily_requests_other"] = (
-        FOIARequest.objects.exclude(
-            composer__organization__entitlement__slug__in=[
-                "professional",
-                "free",
-                "beta",
-                "proxy",
-                "admin",
-                "organization",
-            ]
+
+    request_statuses = [
+        ("success", "done"),
+        ("denied", "rejected"),
+        ("submitted", "submitted"),
+        ("awaiting_ack", "ack"),
+        ("awaiting_response", "processed"),
+        ("awaiting_appeal", "appealing"),
+        ("fix_required", "fix"),
+        ("payment_required", "payment"),
+        ("no_docs", "no_docs"),
+        ("partial", "partial"),
+        ("abandoned", "abandoned"),
+        ("lawsuit", "lawsuit"),
+    ]
+    kwargs.update(
+        stats.aggregate(
+            "foia_requests",
+            FOIARequest.objects.all(),
+            total_requests=Count("pk"),
+            total_fees=Sum("price"),
+            **count_choices("total_requests", "status", request_statuses),
         )
-        .get_submitted_range(yesterday_midnight, today_midnight)
-        .count()
-    )
-    kwargs["daily_articles"] = Article.objects.filter(
-        pub_date__range=(yesterday_midnight, today_midnight)
-    ).count()
-    kwargs["orphaned_communications"] = FOIACommunication.objects.filter(
-        foia=None
-    ).count()
-    kwargs["stale_agencies"] = 0  # stake agencies no longer exist
-    kwargs["unapproved_agencies"] = Agency.objects.filter(status="pending").count()
-    kwargs["portal_agencies"] = Agency.objects.exclude(portal=None).count()
-    kwargs["total_tasks"] = Task.objects.count()
-    kwargs["total_unresolved_tasks"] = (
-        Task.objects.filter(resolved=False).get_undeferred().count()
-    )
-    kwargs["total_deferred_tasks"] = Task.objects.get_deferred().count()
-    # we no longer use generic tasks
-    kwargs["total_generic_tasks"] = 0
-    kwargs["total_unresolved_generic_tasks"] = 0
-    kwargs["total_deferred_generic_tasks"] = 0
-    kwargs["total_orphan_tasks"] = OrphanTask.objects.count()
-    kwargs["total_unresolved_orphan_tasks"] = (
-        OrphanTask.objects.filter(resolved=False).get_undeferred().count()
-    )
-    kwargs["total_deferred_orphan_tasks"] = OrphanTask.objects.get_deferred().count()
-    kwargs["total_snailmail_tasks"] = SnailMailTask.objects.count()
-    kwargs["total_unresolved_snailmail_tasks"] = (
-        SnailMailTask.objects.filter(resolved=False).get_undeferred().count()
-    )
-    kwargs[
-        "total_deferred_snailmail_tasks"
-    ] = SnailMailTask.objects.get_deferred().count()
-    kwargs["total_rejected_tasks"] = RejectedEmailTask.objects.count()
-    kwargs["total_unresolved_rejected_tasks"] = (
-        RejectedEmailTask.objects.filter(resolved=False).get_undeferred().count()
-    )
-    kwargs[
-        "total_deferred_rejected_tasks"
-    ] = RejectedEmailTask.objects.get_deferred().count()
-    kwargs["total_staleagency_tasks"] = 0
-    kwargs["total_unresolved_staleagency_tasks"] = 0
-    kwargs["total_deferred_staleagency_tasks"] = 0
-    kwargs["total_flagged_tasks"] = FlaggedTask.objects.count()
-    kwargs["total_unresolved_flagged_tasks"] = (
-        FlaggedTask.objects.filter(resolved=False).get_undeferred().count()
-    )
-    kwargs["total_deferred_flagged_tasks"] = FlaggedTask.objects.get_deferred().count()
-    kwargs["total_newagency_tasks"] = NewAgencyTask.objects.count()
-    kwargs["total_unresolved_newagency_tasks"] = (
-        NewAgencyTask.objects.filter(resolved=False).get_undeferred().count()
-    )
-    kwargs[
-        "total_deferred_newagency_tasks"
-    ] = NewAgencyTask.objects.get_deferred().count()
-    kwargs["total_response_tasks"] = ResponseTask.objects.count()
-    kwargs["total_unresolved_response_tasks"] = (
-        ResponseTask.objects.filter(resolved=False).get_undeferred().count()
-    )
-    kwargs[
-        "total_deferred_response_tasks"
-    ] = ResponseTask.objects.get_deferred().count()
-    kwargs["total_faxfail_tasks"] = FailedFaxTask.objects.count()
-    kwargs["total_unresolved_faxfail_tasks"] = (
-        FailedFaxTask.objects.filter(resolved=False).get_undeferred().count()
-    )
-    kwargs[
-        "total_deferred_faxfail_tasks"
-    ] = FailedFaxTask.objects.get_deferred().count()
-    kwargs["total_crowdfundpayment_tasks"] = CrowdfundTask.objects.count()
-    kwargs["total_unresolved_crowdfundpayment_tasks"] = (
-        CrowdfundTask.objects.filter(resolved=False).get_undeferred().count()
-    )
-    kwargs[
-        "total_deferred_crowdfundpayment_tasks"
-    ] = CrowdfundTask.objects.get_deferred().count()
-    kwargs["total_reviewagency_tasks"] = ReviewAgencyTask.objects.count()
-    kwargs["total_unresolved_reviewagency_tasks"] = (
-        ReviewAgencyTask.objects.filter(resolved=False).get_undeferred().count()
-    )
-    kwargs[
-        "total_deferred_reviewagency_tasks"
-    ] = ReviewAgencyTask.objects.get_deferred().count()
-    kwargs["total_portal_tasks"] = PortalTask.objects.count()
-    kwargs["total_unresolved_portal_tasks"] = (
-        PortalTask.objects.filter(resolved=False).get_undeferred().count()
-    )
-    kwargs["total_deferred_portal_tasks"] = PortalTask.objects.get_deferred().count()
-    kwargs["daily_robot_response_tasks"] = ResponseTask.objects.filter(
-        date_done__gte=yesterday_midnight,
-        date_done__lt=today_midnight,
-        resolved_by__username="mlrobot",
-    ).count()
-    kwargs["flag_processing_days"] = FlaggedTask.objects.get_processing_days()
-    kwargs["unresolved_snailmail_appeals"] = (
-        SnailMailTask.objects.filter(resolved=False, category="a")
-        .get_undeferred()
-        .count()
-    )
-    # squarelet
-    kwargs["total_active_org_members"] = 0
-    kwargs["total_active_orgs"] = 0
-    kwargs["total_crowdfunds"] = Crowdfund.objects.count()
-    kwargs["total_crowdfunds_pro"] = Crowdfund.objects.filter_by_entitlement(
-        "professional"
-    ).count()
-    kwargs["total_crowdfunds_basic"] = Crowdfund.objects.filter_by_entitlement(
-        "free"
-    ).count()
-    kwargs["total_crowdfunds_beta"] = Crowdfund.objects.filter_by_entitlement(
-        "beta"
-    ).count()
-    kwargs["total_crowdfunds_proxy"] = Crowdfund.objects.filter_by_entitlement(
-        "proxy"
-    ).count()
-    kwargs["total_crowdfunds_admin"] = Crowdfund.objects.filter_by_entitlement(
-        "admin"
-    ).count()
-    kwargs["open_crowdfunds"] = Crowdfund.objects.filter(closed=False).count()
-    kwargs["open_crowdfunds_pro"] = (
-        Crowdfund.objects.filter_by_entitlement("professional")
-        .filter(closed=False)
-        .count()
-    )
-    kwargs["open_crowdfunds_basic"] = (
-        Crowdfund.objects.filter_by_entitlement("free").filter(closed=False).count()
     )
-    kwargs["open_crowdfunds_beta"] = (
-        Crowdfund.objects.filter_by_entitlement("beta").filter(closed=False).count()
-    )
-    kwargs["open_crowdfunds_proxy"] = (
-        Crowdfund.objects.filter_by_entitlement("proxy").filter(closed=False).count()
-    )
-    kwargs["open_crowdfunds_admin"] = (
-        Crowdfund.objects.filter_by_entitlement("admin").filter(closed=False).count()
-    )
-    kwargs["closed_crowdfunds_0"] = (
-        Crowdfund.objects.annotate(
-            percent=F("payment_received") / F("payment_required")
+    kwargs["total_requests_draft"] = 0  # draft is no longer a valid status
+    kwargs["requests_processing_days"] = stats.value(
+        "requests_processing_days", FOIARequest.objects.get_processing_days
+    )
+    kwargs.update(
+        stats.aggregate(
+            "daily_requests",
+            FOIARequest.objects.get_submitted_range(*yesterday_range),
+            **count_choices(
+                "daily_requests",
+                "composer__organization__entitlement__slug",
+                ENTITLEMENTS,
+                composer__organization__individual=True,
+            ),
+            daily_requests_org=count_if(
+                composer__organization__entitlement__slug="organization"
+            ),
+            daily_requests_other=Count(
+                "pk",
+                filter=~Q(
+                    composer__organization__entitlement__slug__in=[
+                        slug for _, slug in ENTITLEMENTS
+                    ]
+                    + ["organization"]
+                ),
+            ),
         )
-        .filter(closed=True, percent=0)
-        .count()
     )
-    kwargs["closed_crowdfunds_0_25"] = (
-        Crowdfund.objects.annotate(
-            percent=F("payment_received") / F("payment_required")
+
+    kwargs.update(
+        stats.aggregate(
+            "composers",
+            FOIAComposer.objects.all(),
+            total_composers=Count("pk"),
+            **count_choices(
+                "total_composers",
+                "status",
+                [("draft", "started"), ("submitted", "submitted"), ("filed", "filed")],
+            ),
         )
-        .filter(closed=True, percent__gt=0, percent__lte=0.25)
-        .count()
     )
-    kwargs["closed_crowdfunds_25_50"] = (
-        Crowdfund.objects.annotate(
-            percent=F("payment_received") / F("payment_required")
+
+    for name, model in [
+        ("portal", PortalCommunication),
+        ("email", EmailCommunication),
+        ("fax", FaxCommunication),
+        ("mail", MailCommunication),
+    ]:
+        kwargs["sent_communications_{}".format(name)] = stats.count(
+            "sent_communications_{}".format(name),
+            model.objects.filter(
+                communication__datetime__range=yesterday_range,
+                communication__response=False,
+            ),
         )
-        .filter(closed=True, percent__gt=0.25, percent__lte=0.50)
-        .count()
+    kwargs["orphaned_communications"] = stats.count(
+        "orphaned_communications", FOIACommunication.objects.filter(foia=None)
     )
-    kwargs["closed_crowdfunds_50_75"] = (
-        Crowdfund.objects.annotate(
-            percent=F("payment_received") / F("payment_required")
+
+    kwargs.update(
+        stats.aggregate(
+            "machine_requests",
+            FoiaMachineRequest.objects.all(),
+            machine_requests=Count("pk"),
+            **count_choices(
+                "machine_requests",
+                "status",
+                request_statuses[:2] + [("draft", "started")] + request_statuses[2:],
+            ),
         )
-        .filter(closed=True, percent__gt=0.50, percent__lte=0.75)
-        .count()
     )
-    kwargs["closed_crowdfunds_75_100"] = (
-        Crowdfund.objects.annotate(
-            percent=F("payment_received") / F("payment_required")
+
+    kwargs["total_pages"] = stats.aggregate(
+        "total_pages", FOIAFile.objects.all(), total_pages=Sum("pages")
+    )["total_pages"]
+    # user stats will now be kept on squarelet
+    kwargs["total_users"] = 0
+    kwargs["total_users_excluding_agencies"] = 0
+    # this is still on muckrock since it deals with foia composers
+    kwargs["total_users_filed"] = stats.aggregate(
+        "total_users_filed",
+        User.objects.filter(composers__isnull=False),
+        total_users_filed=Count("pk", distinct=True),
+    )["total_users_filed"]
+    kwargs["pro_users"] = 0  # squarelet
+    kwargs["pro_user_names"] = ""  # squarelet
+
+    kwargs.update(
+        stats.aggregate(
+            "agencies",
+            Agency.objects.all(),
+            total_agencies=Count("pk"),
+            unapproved_agencies=count_if(status="pending"),
+            portal_agencies=count_if(portal__isnull=False),
         )
-        .filter(closed=True, percent__gt=0.75, percent__lte=1.00)
-        .count()
     )
-    kwargs["closed_crowdfunds_100_125"] = (
-        Crowdfund.objects.annotate(
-            percent=F("payment_received") / F("payment_required")
-        )
-        .filter(closed=True, percent__gt=1.00, percent__lte=1.25)
-        .count()
+    kwargs["stale_agencies"] = 0  # stale agencies no longer exist
+
+    kwargs["daily_articles"] = stats.count(
+        "daily_articles", Article.objects.filter(pub_date__range=yesterday_range)
     )
-    kwargs["closed_crowdfunds_125_150"] = (
-        Crowdfund.objects.annotate(
-            percent=F("payment_received") / F("payment_required")
+
+    kwargs.update(_task_statistics(stats, yesterday_range))
+
+    kwargs.update(
+        stats.aggregate(
+            "crowdfunds",
+            Crowdfund.objects.all(),
+            total_crowdfunds=Count("pk", distinct=True),
+            **{
+                "total_crowdfunds_{}".format(name): Count(
+                    "pk", filter=crowdfund_entitlement(slug), distinct=True
+                )
+                for name, slug in ENTITLEMENTS
+            },
+            open_crowdfunds=count_if(distinct=True, closed=False),
+            **{
+                "open_crowdfunds_{}".format(name): Count(
+                    "pk",
+                    filter=crowdfund_entitlement(slug) & Q(closed=False),
+                    distinct=True,
+                )
+                for name, slug in ENTITLEMENTS
+            },
+            # compare against multiples of the amount required instead of
+            # annotating the percent, so these can be filtered aggregates
+            closed_crowdfunds_0=count_if(
+                distinct=True, closed=True, payment_received=0
+            ),
+            **{
+                "closed_crowdfunds_{}_{}".format(low, high): count_if(
+                    distinct=True,
+                    closed=True,
+                    payment_received__gt=F("payment_required") * Decimal(low) / 100,
+                    payment_received__lte=F("payment_required") * Decimal(high) / 100,
+                )
+                for low, high in zip(range(0, 200, 25), range(25, 225, 25))
+            },
+            closed_crowdfunds_200=count_if(
+                distinct=True, closed=True, payment_received__gt=F("payment_required") * 2
+            ),
         )
-        .filter(closed=True, percent__gt=1.25, percent__lte=1.50)
-        .count()
     )
-    kwargs["closed_crowdfunds_150_175"] = (
-        Crowdfund.objects.annotate(
-            percent=F("payment_received") / F("payment_required")
+    kwargs.update(
+        stats.aggregate(
+            "crowdfund_payments",
+            CrowdfundPayment.objects.all(),
+            total_crowdfund_payments=Count("pk"),
+            total_crowdfund_payments_loggedin=count_if(user__isnull=False),
+            total_crowdfund_payments_loggedout=count_if(user=None),
         )
-        .filter(closed=True, percent__gt=1.50, percent__lte=1.75)
-        .count()
     )
-    kwargs["closed_crowdfunds_175_200"] = (
-        Crowdfund.objects.annotate(
-            percent=F("payment_received") / F("payment_required")
+
+    kwargs.update(
+        stats.aggregate(
+            "projects",
+            Project.objects.all(),
+            public_projects=count_if(distinct=True, private=False, approved=True),
+            private_projects=count_if(distinct=True, private=True, approved=True),
+            unapproved_projects=count_if(distinct=True, approved=False),
+            crowdfund_projects=count_if(distinct=True, crowdfunds__isnull=False),
         )
-        .filter(closed=True, percent__gt=1.75, percent__lte=2.00)
-        .count()
     )
-    kwargs["closed_crowdfunds_200"] = (
-        Crowdfund.objects.annotate(
-            percent=F("payment_received") / F("payment_required")
+    kwargs.update(
+        stats.aggregate(
+            "project_users",
+            User.objects.exclude(projects=None),
+            project_users=Count("pk", distinct=True),
+            **count_choices(
+                "project_users",
+                "organizations__entitlement__slug",
+                ENTITLEMENTS,
+                distinct=True,
+            ),
         )
-        .filter(closed=True, percent__gt=2.00)
-        .count()
     )
-    kwargs["total_crowdfund_payments"] = CrowdfundPayment.objects.count()
-    kwargs["total_crowdfund_payments_loggedin"] = CrowdfundPayment.objects.exclude(
-        user=None
-    ).count()
-    kwargs["total_crowdfund_payments_loggedout"] = CrowdfundPayment.objects.filter(
-        user=None
-    ).count()
-    kwargs["public_projects"] = Project.objects.filter(
-        private=False, approved=True
-    ).count()
-    kwargs["private_projects"] = Project.objects.filter(
-        private=True, approved=True
-    ).count()
-    kwargs["unapproved_projects"] = Project.objects.filter(approved=False).count()
-    kwargs["crowdfund_projects"] = Project.objects.exclude(crowdfunds=None).count()
-    kwargs["project_users"] = User.objects.exclude(projects=None).count()
-    kwargs["project_users_pro"] = (
-        User.objects.filter(organizations__entitlement__slug="professional")
-        .exclude(projects=None)
-        .count()
+
+    kwargs["total_exemptions"] = stats.count(
+        "total_exemptions", Exemption.objects.all()
     )
-    kwargs["project_users_basic"] = (
-        User.objects.filter(organizations__entitlement__slug="free")
-        .exclude(projects=None)
-        .count()
+    kwargs["total_invoked_exemptions"] = stats.count(
+        "total_invoked_exemptions", InvokedExemption.objects.all()
     )
-    kwargs["project_users_beta"] = (
-        User.objects.filter(organizations__entitlement__slug="beta")
-        .exclude(projects=None)
-        .count()
+    kwargs["total_example_appeals"] = stats.count(
+        "total_example_appeals", ExampleAppeal.objects.all()
     )
-    kwargs["project_users_proxy"] = (
-        User.objects.filter(organizations__entitlement__slug="proxy")
-        .exclude(projects=None)
-        .count()
+
+    kwargs.update(
+        stats.aggregate(
+            "crowdsources",
+            Crowdsource.objects.all(),
+            total_crowdsources=Count("pk"),
+            **count_choices(
+                "total",
+                "status",
+                [
+                    ("draft_crowdsources", "draft"),
+                    ("open_crowdsources", "open"),
+                    ("close_crowdsources", "close"),
+                ],
+            ),
+        )
     )
-    kwargs["project_users_admin"] = (
-        User.objects.filter(organizations__entitlement__slug="admin")
-        .exclude(projects=None)
-        .count()
+    kwargs.update(
+        stats.aggregate(
+            "crowdsource_responses",
+            CrowdsourceResponse.objects.all(),
+            total_crowdsource_responses=Count("pk", distinct=True),
+            num_crowdsource_responded_users=Count("user", distinct=True),
+            **count_choices(
+                "crowdsource_responses",
+                "user__organizations__entitlement__slug",
+                ENTITLEMENTS,
+                distinct=True,
+            ),
+        )
     )
-    kwargs["total_exemptions"] = Exemption.objects.count()
-    kwargs["total_invoked_exemptions"] = InvokedExemption.objects.count()
-    kwargs["total_example_appeals"] = ExampleAppeal.objects.count()
-    kwargs["total_crowdsources"] = Crowdsource.objects.count()
-    kwargs["total_draft_crowdsources"] = Crowdsource.objects.filter(
-        status="draft"
-    ).count()
-    kwargs["total_open_crowdsources"] = Crowdsource.objects.filter(
-        status="open"
-    ).count()
-    kwargs["total_close_crowdsources"] = Crowdsource.objects.filter(
-        status="close"
-    ).count()
-    kwargs[
-        "num_crowdsource_responded_users"
-    ] = CrowdsourceResponse.objects.get_user_count()
-    kwargs["total_crowdsource_responses"] = CrowdsourceResponse.objects.count()
-    kwargs["crowdsource_responses_pro"] = CrowdsourceResponse.objects.filter(
-        user__organizations__entitlement__slug="professional"
-    ).count()
-    kwargs["crowdsource_responses_basic"] = CrowdsourceResponse.objects.filter(
-        user__organizations__entitlement__slug="free"
-    ).count()
-    kwargs["crowdsource_responses_beta"] = CrowdsourceResponse.objects.filter(
-        user__organizations__entitlement__slug="beta"
-    ).count()
-    kwargs["crowdsource_responses_proxy"] = CrowdsourceResponse.objects.filter(
-        user__organizations__entitlement__slug="proxy"
-    ).count()
-    kwargs["crowdsource_responses_admin"] = CrowdsourceResponse.objects.filter(
-        user__organizations__entitlement__slug="admin"
-    ).count()
 
+    # squarelet
+    kwargs["total_active_org_members"] = 0
+    kwargs["total_active_orgs"] = 0
+
+    stats.log_timings()
     Statistics.objects.create(**kwargs)
 
 
+def _task_statistics(stats, yesterday_range):
+    """Compute the task statistics, with one query per task type"""
+    today = date.today()
+    undeferred = Q(date_deferred__lte=today) | Q(date_deferred=None)
+    deferred = Q(date_deferred__gt=today)
+
+    def task_counts(name=None):
+        """The total, unresolved and deferred counts for a task type"""
+        name = "{}_".format(name) if name else ""
+        return {
+            "total_{}tasks".format(name): Count("pk"),
+            "total_unresolved_{}tasks".format(name): Count(
+                "pk", filter=Q(resolved=False) & undeferred
+            ),
+            "total_deferred_{}tasks".format(name): Count("pk", filter=deferred),
+        }
+
+    kwargs = stats.aggregate("tasks", Task.objects.all(), **task_counts())
+    for name, model, extra in [
+        ("orphan", OrphanTask, {}),
+        (
+            "snailmail",
+            SnailMailTask,
+            {
+                "unresolved_snailmail_appeals": Count(
+                    "pk", filter=Q(resolved=False, category="a") & undeferred
+                )
+            },
+        ),
+        ("rejected", RejectedEmailTask, {}),
+        ("flagged", FlaggedTask, {}),
+        ("newagency", NewAgencyTask, {}),
+        (
+            "response",
+            ResponseTask,
+            {
+                "daily_robot_response_tasks": count_if(
+                    date_done__gte=yesterday_range[0],
+                    date_done__lt=yesterday_range[1],
+                    resolved_by__username="mlrobot",
+                )
+            },
+        ),
+        ("faxfail", FailedFaxTask, {}),
+        ("crowdfundpayment", CrowdfundTask, {}),
+        ("reviewagency", ReviewAgencyTask, {}),
+        ("portal", PortalTask, {}),
+    ]:
+        kwargs.update(
+            stats.aggregate(
+                "{}_tasks".format(name),
+                model.objects.all(),
+                **task_counts(name),
+                **extra,
+            )
+        )
+    kwargs["flag_processing_days"] = stats.value(
+        "flag_processing_days", FlaggedTask.objects.get_processing_days
+    )
+    # we no longer use generic or stale agency tasks
+    for name in ("generic", "staleagency"):
+        kwargs["total_{}_tasks".format(name)] = 0
+        kwargs["total_unresolved_{}_tasks".format(name)] = 0
+        kwargs["total_deferred_{}_tasks".format(name)] = 0
+    return kwargs
+
+
 @periodic_task(
     run_every=crontab(hour=1, minute=0),
     time_limit=1800,
@@ -526,11 +419,26 @@ def store_statistics():
     name="muckrock.accounts.tasks.db_cleanup",
 )
 def db_cleanup():
-    """Call some management commands to clean up the database"""
+    """Delete expired sessions, old revisions and other expired data in batches
+
+    Stops a few minutes before the time limit, and resumes from where it left off
+    on the next run
+    """
     logger.info("Starting DB Clean up")
     try:
-        call_command("clearsessions", verbosity=2)
-        call_command("deleterevisions", days=180, verbosity=2)
+        cleanup.run_cleanup(seconds=25 * 60)
     except SoftTimeLimitExceeded:
         logger.error("DB Clean up took too long")
     logger.info("Ending DB Clean up")
+
+
+@task(ignore_result=True, name="muckrock.accounts.tasks.notify_users")
+def notify_users(user_pks, action_pk, **kwargs):
+    """Notify many users about an action"""
+    # pylint: disable=unused-argument
+    try:
+        action = Action.objects.get(pk=action_pk)
+    except Action.DoesNotExist:
+        logger.warning("Action %s no longer exists, not notifying", action_pk)
+        return
+    notify_user_pks(user_pks, action)
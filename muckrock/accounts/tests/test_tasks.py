@@ -3,13 +3,23 @@ Tests tasks for the Accounts application
 """
 
 # Django
+from django.contrib.sessions.models import Session
 from django.test import TestCase
+from django.utils import timezone
+
+# Standard Library
+import time
+from datetime import date, timedelta
 
 # Third Party
+from mock import patch
 from nose.tools import eq_
 
 # MuckRock
 from muckrock.accounts import models, tasks
+from muckrock.accounts.cleanup import BatchDeleter
+from muckrock.foia.factories import FOIARequestFactory
+from muckrock.task.factories import FlaggedTaskFactory, SnailMailTaskFactory
 
 
 class TestStatisticsTask(TestCase):
@@ -23,3 +33,57 @@ class TestStatisticsTask(TestCase):
         eq_(
             new_stat_count, stat_count + 1, "A new Statistics object should be created."
         )
+
+    def test_stats_counts(self):
+        """The aggregated counts should match the data"""
+        foia = FOIARequestFactory(status="done", price=10)
+        FOIARequestFactory(status="done", price=10)
+        FOIARequestFactory(status="rejected", price=5)
+        SnailMailTaskFactory(category="a", communication__foia=foia)
+        SnailMailTaskFactory(resolved=True, communication__foia=foia)
+        FlaggedTaskFactory(foia=foia, date_deferred=date.today() + timedelta(1))
+        tasks.store_statistics()
+        stat = models.Statistics.objects.last()
+        eq_(stat.total_requests, 3)
+        eq_(stat.total_requests_success, 2)
+        eq_(stat.total_requests_denied, 1)
+        eq_(stat.total_requests_lawsuit, 0)
+        eq_(stat.total_fees, 25)
+        eq_(stat.total_snailmail_tasks, 2)
+        eq_(stat.total_unresolved_snailmail_tasks, 1)
+        eq_(stat.unresolved_snailmail_appeals, 1)
+        eq_(stat.total_flagged_tasks, 1)
+        eq_(stat.total_unresolved_flagged_tasks, 0)
+        eq_(stat.total_deferred_flagged_tasks, 1)
+        eq_(stat.total_tasks, 3)
+
+
+class TestBatchDeleter(TestCase):
+    """Expired rows should be deleted in batches"""
+
+    @patch("muckrock.accounts.cleanup.get_redis_connection")
+    def test_run(self, mock_redis):
+        """Only matching rows are deleted, and the checkpoint is cleared at the end"""
+        mock_redis.return_value.get.return_value = None
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(
+                session_key="expired%d" % i,
+                session_data="",
+                expire_date=now - timedelta(1),
+            )
+        Session.objects.create(
+            session_key="current", session_data="", expire_date=now + timedelta(1)
+        )
+        deleter = BatchDeleter(
+            "sessions",
+            Session.objects.filter(expire_date__lt=now),
+            batch_size=2,
+            pause=0,
+        )
+        eq_(deleter.run(time.monotonic() + 60), 5)
+        eq_(list(Session.objects.values_list("session_key", flat=True)), ["current"])
+        eq_(mock_redis.return_value.set.call_count, 3)
+        mock_redis.return_value.delete.assert_called_once_with(
+            "cleanup:sessions:last_pk"
+        )
@@ -13,9 +13,10 @@ class AgencyConfig(AppConfig):
 
     def ready(self):
         """Registers agencies with the activity streams plugin"""
-        # pylint: disable=invalid-name, import-outside-toplevel
+        # pylint: disable=invalid-name, import-outside-toplevel, unused-import
         from actstream import registry as action
         from watson import search
+        import muckrock.agency.signals
 
         Agency = self.get_model("Agency")
         action.register(Agency)
@@ -11,18 +11,23 @@ from django.utils.text import slugify
 
 # Standard Library
 import csv
+import logging
 import re
+import time
+from email.utils import getaddresses, parseaddr
 
 # Third Party
-from fuzzywuzzy import fuzz, process
 from localflavor.us.us_states import STATE_CHOICES
 
 # MuckRock
+from muckrock.agency.index import AgencyNameIndex
 from muckrock.agency.models import Agency, AgencyAddress, AgencyEmail, AgencyPhone
 from muckrock.communication.models import Address, EmailAddress, PhoneNumber
 from muckrock.jurisdiction.models import Jurisdiction
 from muckrock.portal.models import PORTAL_TYPES, Portal
 
+logger = logging.getLogger(__name__)
+
 STATES = [s[0] for s in STATE_CHOICES]  # pylint: disable=not-an-iterable
 PORTALS = [p[0] for p in PORTAL_TYPES]
 
@@ -63,17 +68,89 @@ class PyReader:
             yield datum
 
 
+class JurisdictionAgencies:
+    """The approved agencies in a jurisdiction, indexed by name for matching"""
+
+    def __init__(self, agencies):
+        self.agencies = {}
+        self.names = {}
+        self.index = AgencyNameIndex()
+        for agency in agencies:
+            self.add(agency)
+
+    def add(self, agency):
+        """Add an agency, so that later rows may match it"""
+        self.agencies[agency.pk] = agency
+        self.names.setdefault(agency.name.lower(), agency)
+        self.index.add((agency.pk, agency.name, agency.status, agency.user_id, 0))
+
+    def match(self, name):
+        """Find the agency matching the name
+
+        Returns the agency, and its score if it was not an exact match
+        """
+        agency = self.names.get(name.lower())
+        if agency is not None:
+            return agency, None
+        pk, score = self.index.best_match(name)
+        return self.agencies.get(pk), score
+
+
+class AgencyContacts:
+    """The contact information already on an agency"""
+
+    def __init__(self):
+        self.emails = set()
+        self.phones = set()
+        self.addresses = set()
+        self.primary_email = False
+        self.primary_fax = False
+        self.primary_address = False
+
+
 class Importer:
-    """Match and import multiple agencies at a time"""
+    """Match and import multiple agencies at a time
+
+    Each jurisdiction, and the agencies and contact information in it, is only
+    loaded once per import.  Rows are imported in chunks - the email addresses
+    and phone numbers for a chunk are fetched at once, and the new contact
+    information for a chunk is created in bulk.
+    """
 
     p_zip = re.compile(r"^\d{5}(?:-\d{4})?$")
+    chunk_size = 500
 
     def __init__(self, reader):
         self.data = reader.read()
+        # jurisdiction name -> jurisdiction
+        self._jurisdictions = {}
+        # jurisdiction pk -> JurisdictionAgencies
+        self._agencies = {}
+        # agency pk -> AgencyContacts
+        self._contacts = {}
+        self._contacts_loaded = set()
+        # email address or number, as given -> EmailAddress or PhoneNumber
+        self._email_addresses = {}
+        self._phone_numbers = {}
+        # agency emails, phones and addresses to create at the end of the chunk
+        self._new_contacts = []
 
     def _match_jurisdiction(self, datum):
         """Match the jurisdiction name"""
-        jurisdiction_name = datum["jurisdiction"]
+        key = datum["jurisdiction"].strip().lower()
+        if key not in self._jurisdictions:
+            self._jurisdictions[key] = self._find_jurisdiction(datum["jurisdiction"])
+        jurisdiction = self._jurisdictions[key]
+
+        datum["match_jurisdiction"] = jurisdiction
+        if jurisdiction is None:
+            datum["jurisdiction_status"] = "no jurisdiction"
+        else:
+            datum["jurisdiction_status"] = "found"
+        return jurisdiction
+
+    def _find_jurisdiction(self, jurisdiction_name):
+        """Look up a jurisdiction by name"""
         # if there is a comma in the name, it is a locality state pair
         # seperate and try to find an exact match
         if "," in jurisdiction_name:
@@ -90,14 +167,22 @@ class Importer:
             jurisdiction = Jurisdiction.objects.filter(
                 Q(name__iexact=name) | Q(abbrev__iexact=name), level__in=("s", "f")
             ).first()
-
-        datum["match_jurisdiction"] = jurisdiction
-        if jurisdiction is None:
-            datum["jurisdiction_status"] = "no jurisdiction"
-        else:
-            datum["jurisdiction_status"] = "found"
         return jurisdiction
 
+    def _get_agencies(self, jurisdiction):
+        """Load the approved agencies in a jurisdiction"""
+        if jurisdiction.pk not in self._agencies:
+            agencies = (
+                Agency.objects.get_approved()
+                .filter(jurisdiction=jurisdiction)
+                .select_related("portal")
+                .order_by("pk")
+            )
+            for agency in agencies:
+                agency.jurisdiction = jurisdiction
+            self._agencies[jurisdiction.pk] = JurisdictionAgencies(agencies)
+        return self._agencies[jurisdiction.pk]
+
     def _set_match_agency(self, datum, agency, status, score=None):
         """Set match agency and related attributes for easy access"""
         datum["match_agency"] = agency
@@ -114,26 +199,13 @@ class Importer:
         if jurisdiction is None:
             return datum
 
-        agencies = Agency.objects.get_approved().filter(jurisdiction=jurisdiction)
-
-        try:
-            agency = agencies.get(name__iexact=datum["agency"])
+        agency, score = self._get_agencies(jurisdiction).match(datum["agency"])
+        if agency is None:
+            datum["agency_status"] = "no agency"
+        elif score is None:
             self._set_match_agency(datum, agency, "exact match")
-            return datum
-        except Agency.DoesNotExist:
-            pass
-
-        match = process.extractOne(
-            datum["agency"],
-            {a: a.name for a in agencies},
-            scorer=fuzz.partial_ratio,
-            score_cutoff=83,
-        )
-        if match:
-            _agency_name, score, agency = match
-            self._set_match_agency(datum, agency, "fuzzy match", score)
         else:
-            datum["agency_status"] = "no agency"
+            self._set_match_agency(datum, agency, "fuzzy match", score)
 
         return datum
 
@@ -148,14 +220,33 @@ class Importer:
             error = True
         return error
 
+    def _match_datum(self, datum):
+        """Validate and match a datum"""
+        error = self._validate(datum)
+        if error:
+            return datum
+        else:
+            return self._match_one(datum)
+
     def match(self):
         """Match each datum"""
+        start, count = time.time(), 0
         for datum in self.data:
-            error = self._validate(datum)
-            if error:
-                yield datum
-            else:
-                yield self._match_one(datum)
+            yield self._match_datum(datum)
+            count += 1
+        self._log_rate("Matched", count, start)
+
+    @staticmethod
+    def _log_rate(action, count, start):
+        """Log how quickly the rows were processed"""
+        elapsed = time.time() - start
+        logger.info(
+            "%s %d agency rows in %.1f seconds (%.1f rows/sec)",
+            action,
+            count,
+            elapsed,
+            count / elapsed if elapsed else 0,
+        )
 
     def _create_agency(self, datum, user):
         """Create an agency when importing a new agency"""
@@ -167,19 +258,88 @@ class Importer:
             user=user,
         )
         self._set_match_agency(datum, agency, "created")
+        # later rows in the import may match the new agency
+        self._get_agencies(datum["match_jurisdiction"]).add(agency)
+        self._contacts[agency.pk] = AgencyContacts()
         return agency
 
+    def _get_contacts(self, agency):
+        """Get the contact information already on an agency"""
+        jurisdiction_id = agency.jurisdiction_id
+        if jurisdiction_id not in self._contacts_loaded:
+            # load the contact information for the whole jurisdiction at once
+            self._contacts_loaded.add(jurisdiction_id)
+            self._load_contacts(jurisdiction_id)
+        return self._contacts.setdefault(agency.pk, AgencyContacts())
+
+    def _load_contacts(self, jurisdiction_id):
+        """Load the contact information for the agencies in a jurisdiction"""
+        agencies = {
+            "agency__jurisdiction_id": jurisdiction_id,
+            "agency__status": "approved",
+        }
+        for agency_pk, email_pk, request_type, email_type, status in (
+            AgencyEmail.objects.filter(**agencies).values_list(
+                "agency_id", "email_id", "request_type", "email_type", "email__status"
+            )
+        ):
+            contacts = self._contacts.setdefault(agency_pk, AgencyContacts())
+            contacts.emails.add(email_pk)
+            if (request_type, email_type, status) == ("primary", "to", "good"):
+                contacts.primary_email = True
+        for agency_pk, phone_pk, request_type, type_, status in (
+            AgencyPhone.objects.filter(**agencies).values_list(
+                "agency_id", "phone_id", "request_type", "phone__type", "phone__status"
+            )
+        ):
+            contacts = self._contacts.setdefault(agency_pk, AgencyContacts())
+            contacts.phones.add(phone_pk)
+            if (request_type, type_, status) == ("primary", "fax", "good"):
+                contacts.primary_fax = True
+        for agency_pk, address_pk, request_type in AgencyAddress.objects.filter(
+            **agencies
+        ).values_list("agency_id", "address_id", "request_type"):
+            contacts = self._contacts.setdefault(agency_pk, AgencyContacts())
+            contacts.addresses.add(address_pk)
+            if request_type == "primary":
+                contacts.primary_address = True
+
+    def _fetch_chunk(self, chunk):
+        """Fetch the email addresses and phone numbers for a chunk of data"""
+        emails = []
+        numbers = []
+        for datum in chunk:
+            emails.extend(e for e in (datum.get("email"), datum.get("cc_emails")) if e)
+            numbers.extend(
+                (datum[field], field) for field in ("phone", "fax") if datum.get(field)
+            )
+        self._email_addresses = EmailAddress.objects.fetch_bulk(emails)
+        self._phone_numbers = PhoneNumber.objects.fetch_bulk(numbers)
+
+    def _save_chunk(self):
+        """Create the new agency emails, phones and addresses for a chunk"""
+        for model in (AgencyEmail, AgencyPhone, AgencyAddress):
+            model.objects.bulk_create(
+                c for c in self._new_contacts if isinstance(c, model)
+            )
+        self._new_contacts = []
+
     def _import_email(self, agency, datum):
         """Import an agency's email address"""
         email = datum.get("email")
         cc_emails = datum.get("cc_emails", "")
         if email:
-            email_address = EmailAddress.objects.fetch(email)
-            cc_email_addresses = EmailAddress.objects.fetch_many(cc_emails)
+            email_address = self._email_addresses.get(parseaddr(email)[1])
+            cc_email_addresses = [
+                self._email_addresses[e]
+                for _, e in getaddresses([cc_emails])
+                if e in self._email_addresses
+            ]
             if email_address is None:
                 # email failed validation
                 datum["email_status"] = "error"
                 return
+            contacts = self._get_contacts(agency)
             if datum["agency_status"] == "created":
                 # if the agency was just created, it does not have any existing emails
                 request_type = "primary"
@@ -188,12 +348,12 @@ class Importer:
                 status = "primary"
             else:
                 # otherwise check for existing email addresses
-                if any(e == email_address for e in agency.emails.all()):
+                if email_address.pk in contacts.emails:
                     # email address is already present on the agency
                     datum["email_status"] = "already set"
                     return
                 # check if it already has a primary email address
-                if agency.get_emails("primary", "to"):  # optimize
+                if contacts.primary_email:
                     request_type = "none"
                     email_type = "none"
                     cc_type = "none"
@@ -203,60 +363,78 @@ class Importer:
                     email_type = "to"
                     cc_type = "cc"
                     status = "primary"
-            AgencyEmail.objects.create(
-                agency=agency,
-                email=email_address,
-                request_type=request_type,
-                email_type=email_type,
-            )
-            for cc_email_address in cc_email_addresses:
-                AgencyEmail.objects.get_or_create(
+            self._new_contacts.append(
+                AgencyEmail(
                     agency=agency,
-                    email=cc_email_address,
-                    defaults={"request_type": request_type, "email_type": cc_type},
+                    email=email_address,
+                    request_type=request_type,
+                    email_type=email_type,
                 )
+            )
+            contacts.emails.add(email_address.pk)
+            contacts.primary_email = contacts.primary_email or (
+                email_type == "to" and email_address.status == "good"
+            )
+            for cc_email_address in cc_email_addresses:
+                if cc_email_address.pk not in contacts.emails:
+                    self._new_contacts.append(
+                        AgencyEmail(
+                            agency=agency,
+                            email=cc_email_address,
+                            request_type=request_type,
+                            email_type=cc_type,
+                        )
+                    )
+                    contacts.emails.add(cc_email_address.pk)
             datum["email_status"] = "set {}".format(status)
 
     def _import_phone(self, agency, datum):
         """Import an agency's phone number"""
         phone = datum.get("phone")
         if phone:
-            phone_number = PhoneNumber.objects.fetch(phone, type_="phone")
+            phone_number = self._phone_numbers.get(phone)
             if phone_number is None:
                 datum["phone_status"] = "error"
                 return
-            _, created = AgencyPhone.objects.update_or_create(
-                agency=agency, phone=phone_number
-            )
-            if created:
-                datum["phone_status"] = "set"
-            else:
+            contacts = self._get_contacts(agency)
+            if phone_number.pk in contacts.phones:
                 datum["phone_status"] = "already set"
+            else:
+                self._new_contacts.append(
+                    AgencyPhone(agency=agency, phone=phone_number)
+                )
+                contacts.phones.add(phone_number.pk)
+                datum["phone_status"] = "set"
 
     def _import_fax(self, agency, datum):
         """Import an agency's fax number"""
         fax = datum.get("fax")
         if fax:
-            fax_number = PhoneNumber.objects.fetch(fax, type_="fax")
+            fax_number = self._phone_numbers.get(fax)
             if fax_number is None:
                 datum["fax_status"] = "error"
                 return
+            contacts = self._get_contacts(agency)
             if datum["agency_status"] == "created":
                 request_type = "primary"
                 status = "primary"
             else:
-                if any(p == fax_number for p in agency.phones.filter(type="fax")):
+                if fax_number.pk in contacts.phones:
                     # fax is already present on the agency
                     datum["fax_status"] = "already set"
                     return
-                if agency.get_faxes("primary"):  # optimize
+                if contacts.primary_fax:
                     request_type = "none"
                     status = "other"
                 else:
                     request_type = "primary"
                     status = "primary"
-            AgencyPhone.objects.create(
-                agency=agency, phone=fax_number, request_type=request_type
+            self._new_contacts.append(
+                AgencyPhone(agency=agency, phone=fax_number, request_type=request_type)
+            )
+            contacts.phones.add(fax_number.pk)
+            contacts.primary_fax = contacts.primary_fax or (
+                request_type == "primary" and fax_number.status == "good"
             )
             datum["fax_status"] = "set {}".format(status)
 
@@ -296,22 +474,27 @@ class Importer:
                 attn_override="",
                 address="",
             )
+            contacts = self._get_contacts(agency)
             if datum["agency_status"] == "created":
                 request_type = "primary"
                 status = "primary"
             else:
-                if any(a == address for a in agency.addresses.all()):
+                if address.pk in contacts.addresses:
                     # address is already present on the agency
                     datum["address_status"] = "already set"
                     return
-                if agency.get_addresses("primary"):  # optimize
+                if contacts.primary_address:
                     request_type = "none"
                     status = "other"
                 else:
                     request_type = "primary"
                     status = "primary"
-            AgencyAddress.objects.create(
-                agency=agency, address=address, request_type=request_type
+            self._new_contacts.append(
+                AgencyAddress(agency=agency, address=address, request_type=request_type)
+            )
+            contacts.addresses.add(address.pk)
+            contacts.primary_address = (
+                contacts.primary_address or request_type == "primary"
             )
             datum["address_status"] = "set {}".format(status)
 
@@ -389,11 +572,31 @@ class Importer:
 
         return datum
 
+    def _chunks(self):
+        """Split the data into chunks"""
+        chunk = []
+        for datum in self.data:
+            chunk.append(datum)
+            if len(chunk) == self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
     def import_(self, user=None, dry=False):
         """Import all agency data"""
+        start, count = time.time(), 0
         with transaction.atomic():
             sid = transaction.savepoint()
-            for datum in self.match():
-                yield self._import_one(datum, user)
+            for chunk in self._chunks():
+                self._fetch_chunk(chunk)
+                # match each datum just before importing it, so that it may
+                # match an agency created by an earlier datum
+                for datum in chunk:
+                    self._import_one(self._match_datum(datum), user)
+                self._save_chunk()
+                yield from chunk
+                count += len(chunk)
             if dry:
                 transaction.savepoint_rollback(sid)
+        self._log_rate("Imported", count, start)
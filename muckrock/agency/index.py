@@ -0,0 +1,134 @@
+"""
+An in memory index of agency names for the composer autocomplete
+
+The composer autocomplete fuzzy matches the query against every agency in the
+jurisdiction on each keystroke.  Instead of loading the agencies from the
+database each time, the names, statuses and request counts of the agencies in
+a jurisdiction are loaded once and cached, along with an index from the
+trigrams of each name to the agencies, so that only the names which share a
+trigram with the query need to be scored.  The index is cleared by signals
+whenever an agency in the jurisdiction is changed, and the request counts are
+refreshed when it expires.
+"""
+
+# Django
+from django.core.cache import cache
+from django.db.models.functions import Coalesce
+
+# Standard Library
+from collections import defaultdict
+
+# Third Party
+from fuzzywuzzy import fuzz, process
+from fuzzywuzzy.utils import full_process
+
+# MuckRock
+from muckrock.agency.models import Agency
+
+TIMEOUT = 60 * 60
+NGRAM = 3
+SCORE_CUTOFF = 83
+
+
+def _key(jurisdiction_id):
+    """The cache key for a jurisdiction's index"""
+    return "agency_index:{}".format(jurisdiction_id)
+
+
+def ngrams(text):
+    """The trigrams of a name, after the same processing the fuzzy matcher uses"""
+    text = full_process(text)
+    return {text[i : i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class AgencyNameIndex:
+    """The approved and pending agencies in a jurisdiction, indexed by trigram"""
+
+    def __init__(self, agencies=()):
+        # a list of (pk, name, status, user id, request count), most popular first
+        self.agencies = []
+        self.ngrams = defaultdict(list)
+        for agency in agencies:
+            self.add(agency)
+
+    def add(self, agency):
+        """Add an agency to the index"""
+        for ngram in ngrams(agency[1]):
+            self.ngrams[ngram].append(len(self.agencies))
+        self.agencies.append(agency)
+
+    def candidates(self, query):
+        """The agencies which may match the query"""
+        query_ngrams = ngrams(query)
+        if not query_ngrams:
+            # the query is too short to narrow down the agencies
+            return self.agencies
+        indices = set()
+        for ngram in query_ngrams:
+            indices.update(self.ngrams.get(ngram, ()))
+        return [self.agencies[i] for i in sorted(indices)]
+
+    def best_match(self, query):
+        """The pk and score of the agency whose name best matches the query"""
+        choices = {agency[0]: agency[1] for agency in self.candidates(query)}
+        matches = self.extract(query, choices, limit=1)
+        return matches[0] if matches else (None, None)
+
+    def search(self, query, user, exclude=(), limit=10):
+        """Fuzzy match the names of the agencies the user may choose
+
+        Returns the pks of the best matches
+        """
+        user_id = user.pk if user.is_authenticated else None
+        exclude = {int(pk) for pk in exclude}
+        choices = {
+            pk: name
+            for pk, name, status, owner_id, _count in self.candidates(query)
+            if pk not in exclude
+            and (status == "approved" or (user_id is not None and owner_id == user_id))
+        }
+        return [pk for pk, _score in self.extract(query, choices, limit)]
+
+    @staticmethod
+    def extract(query, choices, limit):
+        """Fuzzy match the query against a dictionary of names by pk
+
+        Returns the pks and scores of the best matches
+        """
+        return [
+            (pk, score)
+            for _name, score, pk in process.extractBests(
+                query,
+                choices,
+                scorer=fuzz.partial_ratio,
+                score_cutoff=SCORE_CUTOFF,
+                limit=limit,
+            )
+        ]
+
+
+def build(jurisdiction_id):
+    """Build the index for a jurisdiction from the database"""
+    agencies = (
+        Agency.objects.filter(
+            jurisdiction_id=jurisdiction_id, status__in=("approved", "pending")
+        )
+        .annotate(count=Coalesce("request_stats__requests", 0))
+        .order_by("-count", "pk")
+        .values_list("pk", "name", "status", "user_id", "count")
+    )
+    return AgencyNameIndex(list(agencies))
+
+
+def get_index(jurisdiction_id):
+    """Get the index for a jurisdiction, building it if it is not cached"""
+    index = cache.get(_key(jurisdiction_id))
+    if index is None:
+        index = build(jurisdiction_id)
+        cache.set(_key(jurisdiction_id), index, TIMEOUT)
+    return index
+
+
+def clear(*jurisdiction_ids):
+    """Clear the indexes for the given jurisdictions"""
+    cache.delete_many([_key(pk) for pk in jurisdiction_ids if pk is not None])
@@ -22,7 +22,7 @@ from easy_thumbnails.fields import ThumbnailerImageField
 # MuckRock
 from muckrock.accounts.models import Profile
 from muckrock.core.utils import squarelet_post
-from muckrock.jurisdiction.models import Jurisdiction, RequestHelper
+from muckrock.jurisdiction.models import Jurisdiction, RequestHelper, RequestStats
 from muckrock.task.models import NewAgencyTask
 
 logger = logging.getLogger(__name__)
@@ -239,6 +239,10 @@ class Agency(models.Model, RequestHelper):
         """Just returns the foiareqest_set value. Used for compatability with RequestHeper mixin"""
         return self.foiarequest_set
 
+    def request_stats_filter(self):
+        """Filter for this agency's request stats, used by the RequestHelper mixin"""
+        return Q(agency=self)
+
     def get_user(self):
         """Get the agency user for this agency"""
         try:
@@ -332,6 +336,9 @@ class Agency(models.Model, RequestHelper):
     @transaction.atomic
     def merge(self, agency, user):
         """Merge the other agency into this agency"""
+        # pylint: disable=import-outside-toplevel
+        from muckrock.foia.models import FOIAVisibility
+
         replace_relations = [
             "foiarequest_set",
             "foiamachinerequest_set",
@@ -342,6 +349,8 @@ class Agency(models.Model, RequestHelper):
         ]
         for relation in replace_relations:
             getattr(agency, relation).update(agency=self)
+        RequestStats.merge(agency, self)
+        FOIAVisibility.objects.filter(agency=agency).update(agency=self)
 
         replace_self_relations = [
             ("appeal_agency", "appeal_for"),
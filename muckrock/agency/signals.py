@@ -0,0 +1,43 @@
+"""Signals for the agency application"""
+# Django
+from django.db.models.signals import post_delete, post_save, pre_save
+
+# MuckRock
+from muckrock.agency import index
+from muckrock.agency.models import Agency
+
+# pylint: disable=unused-argument
+
+
+def index_pre_save(sender, instance, raw=False, **kwargs):
+    """Remember which jurisdiction the agency was in before it is saved"""
+    # pylint: disable=protected-access
+    instance._old_jurisdiction_id = None
+    if instance.pk is not None and not raw:
+        instance._old_jurisdiction_id = (
+            Agency.objects.filter(pk=instance.pk)
+            .values_list("jurisdiction_id", flat=True)
+            .first()
+        )
+
+
+def clear_index(sender, instance, **kwargs):
+    """Clear the name index for the agency's jurisdictions"""
+    index.clear(
+        instance.jurisdiction_id, getattr(instance, "_old_jurisdiction_id", None)
+    )
+
+
+pre_save.connect(
+    index_pre_save,
+    sender=Agency,
+    dispatch_uid="muckrock.agency.signals.index_pre_save",
+)
+post_save.connect(
+    clear_index, sender=Agency, dispatch_uid="muckrock.agency.signals.clear_index"
+)
+post_delete.connect(
+    clear_index,
+    sender=Agency,
+    dispatch_uid="muckrock.agency.signals.clear_index_delete",
+)
@@ -17,6 +17,7 @@ from smart_open.smart_open_lib import smart_open
 from muckrock.agency.importer import CSVReader, Importer
 from muckrock.core.tasks import AsyncFileDownloadTask
 from muckrock.foia.models import FOIARequest
+from muckrock.jurisdiction.models import RequestStats
 from muckrock.task.models import ReviewAgencyTask
 
 client = Client(os.environ.get("SENTRY_DSN"))
@@ -36,6 +37,15 @@ def stale():
         )
 
 
+@periodic_task(
+    run_every=crontab(hour=3, minute=30),
+    name="muckrock.agency.tasks.rebuild_request_stats",
+)
+def rebuild_request_stats():
+    """Correct any drift in the request stats, such as from bulk updates"""
+    RequestStats.rebuild()
+
+
 class MassImport(AsyncFileDownloadTask):
     """Do a mass import of agency data"""
 
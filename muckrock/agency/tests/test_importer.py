@@ -330,6 +330,37 @@ class TestAgencyImporter(TestCase):
         agency = data[0]["match_agency"]
         eq_(agency.name, "Foobar")
 
+    def test_create_duplicate(self):
+        """Later rows should match an agency created by an earlier row"""
+        reader = PyReader(
+            [
+                {
+                    "agency": "Foobar",
+                    "jurisdiction": "united states of america",
+                    "email": "foia@new.agency.gov",
+                    "fax": "617-555-0001",
+                },
+                {
+                    "agency": "foobar",
+                    "jurisdiction": "USA",
+                    "email": "foia@new.agency.gov",
+                    "fax": "617-555-0002",
+                },
+            ]
+        )
+        importer = Importer(reader)
+        data = list(importer.import_())
+
+        eq_(data[0]["agency_status"], "created")
+        eq_(data[1]["agency_status"], "exact match")
+        agency = data[0]["match_agency"]
+        eq_(data[1]["match_agency"], agency)
+        eq_(data[1]["email_status"], "already set")
+        eq_(data[1]["fax_status"], "set other")
+        eq_(agency.emails.count(), 1)
+        eq_(agency.fax.number, "+1 617-555-0001")
+        eq_(agency.phones.count(), 2)
+
     def test_create_bad_jurisdiction(self):
         """Test creating an agency in a bad jurisdiction"""
         reader = PyReader([{"agency": "Foobar", "jurisdiction": "Foobar",},])
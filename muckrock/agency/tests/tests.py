@@ -4,8 +4,9 @@ Tests for Agency application
 
 # Django
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 from django.http import Http404
-from django.test import RequestFactory, TestCase
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
 
 # Standard Library
@@ -15,6 +16,7 @@ import json
 from nose.tools import assert_in, assert_not_in, eq_, ok_, raises
 
 # MuckRock
+from muckrock.agency import index
 from muckrock.agency.forms import AgencyForm
 from muckrock.agency.models import Agency
 from muckrock.agency.views import AgencyList, boilerplate, contact_info, detail
@@ -211,6 +213,66 @@ class TestAgencyManager(TestCase):
         ok_(self.agency3 not in agencies, "Unapproved agencies shouldn't be siblings.")
 
 
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class TestAgencyNameIndex(TestCase):
+    """Tests for the agency name index used by the composer autocomplete"""
+
+    def setUp(self):
+        self.police = AgencyFactory(name="Boston Police Department")
+        self.jurisdiction = self.police.jurisdiction
+        self.fire = AgencyFactory(
+            name="Boston Fire Department", jurisdiction=self.jurisdiction
+        )
+        self.user = UserFactory()
+        self.pending = AgencyFactory(
+            name="Boston Police Commission",
+            jurisdiction=self.jurisdiction,
+            status="pending",
+            user=self.user,
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_search(self):
+        """Fuzzy matches approved agencies and the user's pending agencies"""
+        agency_index = index.get_index(self.jurisdiction.pk)
+        eq_(agency_index.search("polise department", AnonymousUser()), [self.police.pk])
+        eq_(
+            set(agency_index.search("boston police", self.user)),
+            {self.police.pk, self.pending.pk},
+        )
+        eq_(
+            agency_index.search("boston police", self.user, [str(self.police.pk)]),
+            [self.pending.pk],
+        )
+        eq_(agency_index.search("xyzzy", self.user), [])
+
+    def test_clear(self):
+        """Changing an agency clears the index for its jurisdiction"""
+        jurisdiction_pk = self.jurisdiction.pk
+        index.get_index(jurisdiction_pk)
+        agency = AgencyFactory(name="Boston Parks", jurisdiction=self.jurisdiction)
+        eq_(index.get_index(jurisdiction_pk).search("parks", self.user), [agency.pk])
+        agency.name = "Boston Library"
+        agency.save()
+        eq_(index.get_index(jurisdiction_pk).search("parks", self.user), [])
+
+    def test_autocomplete(self):
+        """The composer autocomplete lists the most requested agencies first"""
+        FOIARequestFactory.create_batch(2, agency=self.fire)
+        FOIARequestFactory(agency=self.police)
+        response = self.client.get(
+            reverse("agency-composer-autocomplete"),
+            {"q": "department, {}".format(self.jurisdiction.abbrev)},
+        )
+        eq_(response.status_code, 200)
+        ids = [result["id"] for result in response.json()["results"]]
+        eq_(ids[:2], [str(self.fire.pk), str(self.police.pk)])
+
+
 class TestAgencyViews(TestCase):
     """Tests for Agency views"""
 
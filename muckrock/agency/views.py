@@ -6,8 +6,8 @@ Views for the Agency application
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import PermissionRequiredMixin
-from django.db.models import Q
-from django.db.models.aggregates import Count
+from django.core.cache import cache
+from django.db.models import F, Q, Sum
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
@@ -24,10 +24,10 @@ from string import capwords
 from time import time
 
 # Third Party
-from fuzzywuzzy import fuzz, process
 from smart_open.smart_open_lib import smart_open
 
 # MuckRock
+from muckrock.agency import index
 from muckrock.agency.filters import AgencyFilterSet
 from muckrock.agency.forms import AgencyMassImportForm, AgencyMergeForm
 from muckrock.agency.importer import CSVReader, Importer
@@ -306,26 +306,26 @@ class AgencyComposerAutocomplete(AgencyAutocomplete):
     def get_queryset(self):
         """Filter by jurisdiction"""
 
+        # order by the materialized request counts instead of counting the
+        # requests for every matching agency on each keystroke
+        popularity = F("request_stats__requests").desc(nulls_last=True)
         queryset = super().get_queryset()
         exclude = self.forwarded.get("self", [])
         queryset = (
             queryset.get_approved_and_pending(self.request.user)
             .exclude(pk__in=exclude)
-            .annotate(count=Count("foiarequest"))
-            .order_by("-count")[:10]
+            .order_by(popularity)[:10]
         )
 
         query, jurisdiction = self._split_jurisdiction(self.q)
-        fuzzy_choices = self._fuzzy_choices(query, jurisdiction, exclude)
-
-        return (
-            self.queryset.filter(
-                pk__in=[a.pk for a in queryset] + [a[2].pk for a in fuzzy_choices]
-            )
-            .annotate(count=Count("foiarequest"))
-            .order_by("-count")
+        fuzzy_choices = index.get_index(jurisdiction.pk).search(
+            query, self.request.user, exclude
         )
 
+        return self.queryset.filter(
+            pk__in=[a.pk for a in queryset] + fuzzy_choices
+        ).order_by(popularity)
+
     def _split_jurisdiction(self, query):
         """Try to pull a jurisdiction out of an unmatched query"""
         comma_split = query.split(",")
@@ -333,55 +333,66 @@ class AgencyComposerAutocomplete(AgencyAutocomplete):
             # at least 2 commas, assume last 2 parts are locality, state
             locality, state = [w.strip() for w in comma_split[-2:]]
             name = ",".join(comma_split[:-2])
-            try:
-                jurisdiction = Jurisdiction.objects.get(
-                    Q(parent__name__iexact=state) | Q(parent__abbrev__iexact=state),
-                    name__iexact=locality,
-                    level="l",
-                )
+            jurisdiction = self._find_jurisdiction(locality, state)
+            if jurisdiction is not None:
                 return name, jurisdiction
-            except Jurisdiction.DoesNotExist:
-                pass
         if len(comma_split) > 1:
             # at least 1 commas, assume the last part is a jurisdiction
             state = comma_split[-1].strip()
             name = ",".join(comma_split[:-1])
-            try:
-                # first see if it matches a state
-                jurisdiction = Jurisdiction.objects.get(
-                    Q(name__iexact=state) | Q(abbrev__iexact=state), level="s"
-                )
+            jurisdiction = self._find_jurisdiction(None, state)
+            if jurisdiction is not None:
                 return name, jurisdiction
-            except Jurisdiction.DoesNotExist:
-                # if not, try matching a locality
-                # order them by popularity
-                jurisdiction = (
-                    Jurisdiction.objects.filter(name__iexact=state, level="l")
-                    .annotate(count=Count("agencies__foiarequest"))
-                    .order_by("-count")
-                    .first()
-                )
-                if jurisdiction is not None:
-                    return name, jurisdiction
 
         # if all else fails, assume they want a federal agency
-        return query, Jurisdiction.objects.get(level="f")
+        return query, self._federal_jurisdiction()
 
-    def _fuzzy_choices(self, query, jurisdiction, exclude):
-        """Do fuzzy matching for additional choices"""
-        choices = (
-            self.queryset.get_approved_and_pending(self.request.user)
-            .filter(jurisdiction=jurisdiction)
-            .exclude(pk__in=exclude)
+    def _find_jurisdiction(self, locality, state):
+        """Look up a jurisdiction by name, caching the result
+
+        The same jurisdiction is looked up on each keystroke while the agency
+        name is typed in front of it
+        """
+        key = "composer_jurisdiction:{}".format(
+            md5("{}|{}".format(locality, state).lower().encode("utf8")).hexdigest()
         )
-        return process.extractBests(
-            query,
-            {a: a.name for a in choices},
-            scorer=fuzz.partial_ratio,
-            score_cutoff=83,
-            limit=10,
+        jurisdiction = cache.get(key)
+        if jurisdiction is None:
+            # cache a missing jurisdiction as False
+            jurisdiction = self._lookup_jurisdiction(locality, state) or False
+            cache.set(key, jurisdiction, 60 * 60)
+        return jurisdiction or None
+
+    def _lookup_jurisdiction(self, locality, state):
+        """Look up a locality in a state, or a state or locality by itself"""
+        if locality is not None:
+            return Jurisdiction.objects.filter(
+                Q(parent__name__iexact=state) | Q(parent__abbrev__iexact=state),
+                name__iexact=locality,
+                level="l",
+            ).first()
+        # first see if it matches a state
+        jurisdiction = Jurisdiction.objects.filter(
+            Q(name__iexact=state) | Q(abbrev__iexact=state), level="s"
+        ).first()
+        if jurisdiction is not None:
+            return jurisdiction
+        # if not, try matching a locality, the most popular first
+        return (
+            Jurisdiction.objects.filter(name__iexact=state, level="l")
+            .annotate(count=Sum("agencies__request_stats__requests"))
+            .order_by(F("count").desc(nulls_last=True))
+            .first()
         )
 
+    def _federal_jurisdiction(self):
+        """The federal jurisdiction, which is looked up on most keystrokes"""
+        jurisdiction = cache.get("federal_jurisdiction")
+        if jurisdiction is None:
+            jurisdiction = Jurisdiction.objects.get(level="f")
+            cache.set("federal_jurisdiction", jurisdiction, 60 * 60)
+        return jurisdiction
+
     def has_add_permission(self, request):
         """Everyone may add a new agency during """
         return True
@@ -102,6 +102,8 @@ class AgencyViewSet(viewsets.ModelViewSet):
         )
     )
     serializer_class = AgencySerializer
+    # allow ?pagination=cursor for paging through all agencies
+    cursor_ordering = ("id",)
     # don't allow ordering by computed fields
     ordering_fields = [
         f
@@ -5,8 +5,10 @@ Models for the Business Days application
 from django.db import models
 
 # Standard Library
+import time
+from bisect import bisect_left, bisect_right
 from calendar import monthrange
-from datetime import timedelta
+from datetime import date, timedelta
 
 # Third Party
 from dateutil.easter import easter
@@ -135,11 +137,23 @@ class Holiday(models.Model):
 
 
 class HolidayCalendar:
-    """A set of holidays"""
+    """A set of holidays
+
+    Business days are compiled into a sorted list of date ordinals, covering
+    whole years around the dates that have been asked about, so that business
+    day arithmetic is a binary search instead of a day by day walk
+    """
+
+    # number of extra years to compile on either side of a requested date
+    padding = 1
 
     def __init__(self, holidays, observe_sat):
         self.holidays = holidays
         self.observe_sat = observe_sat
+        # (first ordinal, last ordinal, sorted business day ordinals)
+        # replaced as a whole when extended, so readers always see a consistent
+        # index
+        self._index = None
 
     def is_holiday(self, date_):
         """Is given date a holiday?"""
@@ -149,8 +163,8 @@ class HolidayCalendar:
                 return holiday
         return None
 
-    def is_business_day(self, date_):
-        """Is the given date a business day?"""
+    def _is_business_day(self, date_):
+        """Compute if the given date is a business day"""
 
         weekday = date_.weekday()
         if weekday in (SAT, SUN):
@@ -158,36 +172,113 @@ class HolidayCalendar:
 
         return not self.is_holiday(date_)
 
+    def _compile(self, start_year, end_year):
+        """Compile the business days for the given years, inclusive"""
+        start = date(start_year, 1, 1).toordinal()
+        end = date(end_year, 12, 31).toordinal()
+        days = [
+            ordinal
+            for ordinal in range(start, end + 1)
+            if self._is_business_day(date.fromordinal(ordinal))
+        ]
+        return (start, end, days)
+
+    def _get_index(self, *dates):
+        """Get the business day index, extending it to cover the given dates"""
+        index = self._index
+        start_year = min(d.year for d in dates) - self.padding
+        end_year = max(d.year for d in dates) + self.padding
+        if index is None:
+            index = self._compile(start_year, end_year)
+        else:
+            start, end, days = index
+            first_year = date.fromordinal(start).year
+            last_year = date.fromordinal(end).year
+            if start_year < first_year:
+                before = self._compile(start_year, first_year - 1)
+                start, days = before[0], before[2] + days
+            if end_year > last_year:
+                after = self._compile(last_year + 1, end_year)
+                end, days = after[1], days + after[2]
+            index = (start, end, days)
+        self._index = index
+        return index
+
+    def is_business_day(self, date_):
+        """Is the given date a business day?"""
+
+        _, _, days = self._get_index(date_)
+        ordinal = date_.toordinal()
+        i = bisect_left(days, ordinal)
+        return i < len(days) and days[i] == ordinal
+
     def business_days_from(self, date_, num):
         """Returns the date n business days from the given date"""
 
-        # could be optimized
-        delta = timedelta(1 if num >= 0 else -1)
-        num = abs(num)
-
-        while num:
-            date_ += delta
-            if self.is_business_day(date_):
-                num -= 1
-        return date_
+        if num == 0:
+            return date_
+        # extend the index until the target day falls within it
+        # business days are at least 1 day and at most 7 days apart, so this
+        # will only loop if there is a very long run of holidays
+        end_date = date_ + timedelta(num * 2)
+        while True:
+            _, _, days = self._get_index(date_, end_date)
+            ordinal = date_.toordinal()
+            if num > 0:
+                i = bisect_right(days, ordinal) + num - 1
+                if i < len(days):
+                    return date.fromordinal(days[i])
+            else:
+                i = bisect_left(days, ordinal) + num
+                if i >= 0:
+                    return date.fromordinal(days[i])
+            end_date += timedelta(num * 2)
 
     def business_days_between(self, date_a, date_b):
         """How many business days are between the given dates?"""
 
-        # could be optimized
         sign = 1
         if date_a > date_b:
             date_a, date_b = date_b, date_a
             sign = -1
 
-        num = 0
-        while date_a < date_b:
-            date_a += timedelta(1)
-            if self.is_business_day(date_a):
-                num += 1
+        _, _, days = self._get_index(date_a, date_b)
+        num = bisect_right(days, date_b.toordinal()) - bisect_right(
+            days, date_a.toordinal()
+        )
         return num * sign
 
 
+class HolidayCalendarCache:
+    """An in-process cache of compiled holiday calendars
+
+    Entries are cleared by signals when holidays or jurisdictions change,
+    and expire after a timeout so that changes made in other processes are
+    eventually picked up
+    """
+
+    timeout = 60 * 60
+
+    def __init__(self):
+        self._calendars = {}
+
+    def get(self, key, create):
+        """Get the calendar for the given key, calling create if it is missing"""
+        now = time.monotonic()
+        entry = self._calendars.get(key)
+        if entry is None or entry[0] < now:
+            entry = (now + self.timeout, create())
+            self._calendars[key] = entry
+        return entry[1]
+
+    def clear(self):
+        """Clear all cached calendars"""
+        self._calendars = {}
+
+
+calendar_cache = HolidayCalendarCache()
+
+
 class Calendar:
     """A set of holidays"""
 
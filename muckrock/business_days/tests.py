@@ -40,7 +40,7 @@ class TestBusinessDayUnit(TestCase):
         self.thanksgiving = Holiday.objects.create(
             name="Thanksgiving", kind="ord_wd", month=11, num=4, weekday=3
         )
-        usa = FederalJurisdictionFactory()
+        self.usa = usa = FederalJurisdictionFactory()
         usa.holidays.set(
             [
                 self.new_years,
@@ -114,3 +114,36 @@ class TestBusinessDayUnit(TestCase):
         nose.tools.eq_(
             self.gen_cal.business_days_between(date(2010, 11, 1), date(2010, 12, 1)), 30
         )
+
+    def test_business_days_from_backwards(self):
+        """Test business_days_from with a negative number of days"""
+
+        nose.tools.eq_(
+            self.usa_cal.business_days_from(date(2010, 12, 15), -30), date(2010, 11, 1)
+        )
+
+    def test_business_days_across_years(self):
+        """Business day arithmetic should work across years"""
+
+        # Dec 31, 2010 is observed for New Year's Day 2011
+        nose.tools.eq_(
+            self.usa_cal.business_days_from(date(2010, 12, 30), 1), date(2011, 1, 3)
+        )
+        nose.tools.eq_(
+            self.usa_cal.business_days_between(date(2010, 12, 30), date(2011, 1, 3)), 1
+        )
+        nose.tools.eq_(
+            self.usa_cal.business_days_between(date(2011, 1, 3), date(2010, 12, 30)),
+            -1,
+        )
+
+    def test_calendar_cache_invalidation(self):
+        """Adding a holiday should update the cached calendar"""
+
+        usa = self.usa
+        nose.tools.assert_true(usa.get_calendar().is_business_day(date(2011, 3, 1)))
+        nose.tools.assert_is(usa.get_calendar(), usa.get_calendar())
+        usa.holidays.add(
+            Holiday.objects.create(name="Test Day", kind="date", month=3, day=1)
+        )
+        nose.tools.assert_false(usa.get_calendar().is_business_day(date(2011, 3, 1)))
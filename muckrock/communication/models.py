@@ -68,6 +68,39 @@ class EmailAddressQuerySet(models.QuerySet):
             addresses.append(email_address)
         return addresses
 
+    def fetch_bulk(self, addresses):
+        """Fetch multiple email address objects at once
+
+        Returns a dictionary of the email address objects, keyed by the email
+        addresses as they were given, leaving out any which are not valid
+        """
+        emails = {}
+        names = {}
+        for name, email in getaddresses(addresses):
+            try:
+                emails[email] = self._normalize_email(email)
+            except ValidationError:
+                continue
+            names[emails[email]] = name
+        existing = {e.email: e for e in self.filter(email__in=names)}
+        changed = []
+        for email, email_address in existing.items():
+            if email_address.name != names[email]:
+                email_address.name = names[email]
+                changed.append(email_address)
+        self.bulk_update(changed, ["name"])
+        if len(existing) < len(names):
+            self.bulk_create(
+                [
+                    self.model(email=email, name=name)
+                    for email, name in names.items()
+                    if email not in existing
+                ],
+                ignore_conflicts=True,
+            )
+            existing = {e.email: e for e in self.filter(email__in=names)}
+        return {email: existing[normalized] for email, normalized in emails.items()}
+
     @staticmethod
     def _normalize_email(email):
         """Username is case sensitive, domain is not"""
@@ -166,6 +199,45 @@ class PhoneNumberQuerySet(models.QuerySet):
         except phonenumbers.NumberParseException:
             return None
 
+    def fetch_bulk(self, numbers):
+        """Fetch multiple numbers at once, creating any which do not exist
+
+        Takes (number, type) pairs, and returns a dictionary of the phone number
+        objects, keyed by the numbers as they were given, leaving out any which
+        are not valid
+        """
+        numbers_e164 = {}
+        types = {}
+        for number, type_ in numbers:
+            try:
+                parsed = phonenumbers.parse(number, "US")
+            except phonenumbers.NumberParseException:
+                continue
+            if not phonenumbers.is_valid_number(parsed):
+                continue
+            numbers_e164[number] = phonenumbers.format_number(
+                parsed, phonenumbers.PhoneNumberFormat.E164
+            )
+            types[numbers_e164[number]] = type_
+        existing = {p.number.as_e164: p for p in self.filter(number__in=types)}
+        changed = []
+        for e164, phone in existing.items():
+            if phone.type != types[e164]:
+                phone.type = types[e164]
+                changed.append(phone)
+        self.bulk_update(changed, ["type"])
+        if len(existing) < len(types):
+            self.bulk_create(
+                [
+                    self.model(number=e164, type=type_)
+                    for e164, type_ in types.items()
+                    if e164 not in existing
+                ],
+                ignore_conflicts=True,
+            )
+            existing = {p.number.as_e164: p for p in self.filter(number__in=types)}
+        return {number: existing[e164] for number, e164 in numbers_e164.items()}
+
 
 class PhoneNumber(models.Model):
     """A phone number"""
@@ -0,0 +1,280 @@
+"""
+A cache backend which keeps a small in-process LRU cache in front of redis
+
+Values are stored compressed in redis, shared between all of the processes.
+Recently used values are also kept in each process for a short time, and
+whenever a value is changed or deleted, the other processes are told to drop
+their local copy over redis pub/sub.  Hits and misses are counted per key
+prefix, and can be shown with the cache_stats management command.
+"""
+
+# Django
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+# Standard Library
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+
+# Third Party
+from django_redis.cache import RedisCache
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+STATS_KEY = "cache_stats"
+
+
+def key_prefix(key):
+    """Group keys for the hit and miss counters
+
+    Template fragments are grouped by fragment name, other keys by the part
+    before the first colon
+    """
+    if key.startswith("template.cache."):
+        return key.rsplit(".", 1)[0]
+    if ":" in key:
+        return key.split(":", 1)[0]
+    return "other"
+
+
+class LocalLRU:
+    """A thread safe, size bounded, least recently used cache with timeouts"""
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns whether the key was found, and its value"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            expires, pickled = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+        # values are pickled so that callers can not modify the cached copy
+        return True, pickle.loads(pickled)
+
+    def set(self, key, value, timeout=None):
+        """Store a value, for at most the local timeout"""
+        if timeout is None or timeout > self.timeout:
+            timeout = self.timeout
+        if timeout <= 0:
+            self.delete(key)
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._data[key] = (time.monotonic() + timeout, pickled)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """Remove a value"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove all values"""
+        with self._lock:
+            self._data.clear()
+
+
+class CacheStats:
+    """Count hits and misses per key prefix, flushing them to redis periodically"""
+
+    flush_interval = 30
+
+    def __init__(self):
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(self, key, result, get_client):
+        """Count a local hit, a hit or a miss for the key"""
+        with self._lock:
+            self._counts["{}|{}".format(key_prefix(key), result)] += 1
+            if time.monotonic() - self._last_flush < self.flush_interval:
+                return
+            counts, self._counts = self._counts, defaultdict(int)
+            self._last_flush = time.monotonic()
+        try:
+            pipe = get_client().pipeline()
+            for field, count in counts.items():
+                pipe.hincrby(STATS_KEY, field, count)
+            pipe.execute()
+        except Exception:  # pylint: disable=broad-except
+            logger.warning("Error saving cache stats", exc_info=True)
+
+
+def get_stats(client):
+    """Get the hit and miss counts, by prefix"""
+    stats = defaultdict(lambda: {"local": 0, "hit": 0, "miss": 0})
+    for field, count in client.hgetall(STATS_KEY).items():
+        prefix, result = field.decode("utf8").rsplit("|", 1)
+        stats[prefix][result] = int(count)
+    return dict(stats)
+
+
+class TieredRedisCache(RedisCache):
+    """A redis cache with a local LRU cache in front of it
+
+    Extra OPTIONS:
+    LOCAL_MAX_ENTRIES - the maximum number of values to keep in each process
+    LOCAL_TIMEOUT - the maximum number of seconds to keep a local value, which
+    bounds how stale it may be if an invalidation message is missed
+    """
+
+    def __init__(self, server, params):
+        params = dict(params)
+        options = dict(params.get("OPTIONS", {}))
+        self.local = LocalLRU(
+            options.pop("LOCAL_MAX_ENTRIES", 1000), options.pop("LOCAL_TIMEOUT", 30)
+        )
+        params["OPTIONS"] = options
+        super().__init__(server, params)
+        self.channel = "{}:invalidate".format(params.get("KEY_PREFIX") or "cache")
+        self.stats = CacheStats()
+        self._listener_pid = None
+        self._instance_id = None
+
+    def _ensure_listener(self):
+        """Start listening for invalidations, once per process"""
+        pid = os.getpid()
+        if self._listener_pid == pid:
+            return
+        # the listener thread does not survive forking, so start one for each
+        # process and drop anything copied from the parent
+        self._listener_pid = pid
+        self._instance_id = uuid.uuid4().hex
+        self.local.clear()
+        thread = threading.Thread(
+            target=self._listen, name="cache-invalidation", daemon=True
+        )
+        thread.start()
+
+    def _listen(self):
+        """Drop local values when another process changes them"""
+        while True:
+            try:
+                pubsub = self.client.get_client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    sender, key = message["data"].decode("utf8").split(":", 1)
+                    if sender == self._instance_id:
+                        continue
+                    if key == "*":
+                        self.local.clear()
+                    else:
+                        self.local.delete(key)
+            except Exception:  # pylint: disable=broad-except
+                logger.warning("Cache invalidation listener error", exc_info=True)
+                # we may have missed invalidations while disconnected
+                self.local.clear()
+                time.sleep(1)
+
+    def _invalidate(self, *keys):
+        """Drop the local values and tell the other processes to do the same"""
+        for key in keys:
+            if key == "*":
+                self.local.clear()
+            else:
+                self.local.delete(key)
+        try:
+            pipe = self.client.get_client().pipeline()
+            for key in keys:
+                pipe.publish(self.channel, "{}:{}".format(self._instance_id, key))
+            pipe.execute()
+        except Exception:  # pylint: disable=broad-except
+            logger.warning("Error publishing cache invalidation", exc_info=True)
+
+    def get(self, key, default=None, version=None, client=None):
+        self._ensure_listener()
+        full_key = self.make_key(key, version=version)
+        found, value = self.local.get(full_key)
+        if found:
+            self.stats.record(key, "local", self.client.get_client)
+            return value
+        value = super().get(key, _MISSING, version=version, client=client)
+        if value is _MISSING:
+            self.stats.record(key, "miss", self.client.get_client)
+            return default
+        self.stats.record(key, "hit", self.client.get_client)
+        self.local.set(full_key, value)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, **kwargs):
+        # pylint: disable=arguments-differ
+        self._ensure_listener()
+        result = super().set(key, value, timeout, version=version, **kwargs)
+        full_key = self.make_key(key, version=version)
+        self._invalidate(full_key)
+        if result and not kwargs.get("nx") and not kwargs.get("xx"):
+            if timeout is DEFAULT_TIMEOUT:
+                timeout = self.default_timeout
+            self.local.set(full_key, value, timeout)
+        return result
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, **kwargs):
+        # pylint: disable=arguments-differ
+        # always checked against redis, as it is used to deduplicate work
+        # between processes
+        self._ensure_listener()
+        result = super().add(key, value, timeout, version=version, **kwargs)
+        if result:
+            self._invalidate(self.make_key(key, version=version))
+        return result
+
+    def delete(self, key, version=None, **kwargs):
+        # pylint: disable=arguments-differ
+        self._ensure_listener()
+        result = super().delete(key, version=version, **kwargs)
+        self._invalidate(self.make_key(key, version=version))
+        return result
+
+    def delete_many(self, keys, version=None, **kwargs):
+        # pylint: disable=arguments-differ
+        self._ensure_listener()
+        result = super().delete_many(keys, version=version, **kwargs)
+        self._invalidate(*[self.make_key(key, version=version) for key in keys])
+        return result
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, **kwargs):
+        # pylint: disable=arguments-differ
+        self._ensure_listener()
+        result = super().set_many(data, timeout, version=version, **kwargs)
+        self._invalidate(*[self.make_key(key, version=version) for key in data])
+        return result
+
+    def incr(self, key, delta=1, version=None, **kwargs):
+        # pylint: disable=arguments-differ
+        self._ensure_listener()
+        result = super().incr(key, delta, version=version, **kwargs)
+        self._invalidate(self.make_key(key, version=version))
+        return result
+
+    def decr(self, key, delta=1, version=None, **kwargs):
+        # pylint: disable=arguments-differ
+        self._ensure_listener()
+        result = super().decr(key, delta, version=version, **kwargs)
+        self._invalidate(self.make_key(key, version=version))
+        return result
+
+    def clear(self):
+        # only delete our own keys, as the redis database is shared with the
+        # locks and the celery broker
+        self._ensure_listener()
+        result = super().delete_pattern("*")
+        self._invalidate("*")
+        return result
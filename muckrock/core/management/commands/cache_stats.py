@@ -0,0 +1,46 @@
+"""
+Show the cache hit rates by key prefix
+"""
+
+# Django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+# MuckRock
+from muckrock.core.cache import STATS_KEY, get_stats
+
+
+class Command(BaseCommand):
+    """Show the cache hit rates"""
+
+    help = "Show the cache hits and misses for each key prefix"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset", action="store_true", help="Reset the counters afterwards"
+        )
+
+    def handle(self, *args, **kwargs):
+        client = cache.client.get_client()
+        stats = get_stats(client)
+        self.stdout.write(
+            "{:<50} {:>10} {:>10} {:>10} {:>8}".format(
+                "prefix", "local", "hit", "miss", "rate"
+            )
+        )
+        for prefix, counts in sorted(
+            stats.items(), key=lambda item: -sum(item[1].values())
+        ):
+            total = sum(counts.values())
+            hits = counts["local"] + counts["hit"]
+            self.stdout.write(
+                "{:<50} {:>10} {:>10} {:>10} {:>7.1f}%".format(
+                    prefix,
+                    counts["local"],
+                    counts["hit"],
+                    counts["miss"],
+                    100.0 * hits / total if total else 0,
+                )
+            )
+        if kwargs["reset"]:
+            client.delete(STATS_KEY)
@@ -1,17 +1,170 @@
 """
-Provides a pagination class for the API
+Provides pagination classes for the API and for HTML lists
 """
 
 # Django
 from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
 # Third Party
-from rest_framework.pagination import PageNumberPagination
+from django_filters import OrderingFilter
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+def estimate_count(queryset):
+    """Estimate the number of rows in a queryset from the planner's statistics"""
+    query = queryset.query.chain()
+    query.clear_ordering(force_empty=True)
+    sql, params = query.get_compiler(using=queryset.db).as_sql()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) {}".format(sql), params)
+        plan = cursor.fetchone()[0]
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    """A paginator which only counts exactly up to a threshold
+
+    Past the threshold the planner's estimate is used, so that large lists do
+    not need to count every row on every page load
+    """
+
+    count_threshold = 10000
+    count_is_estimate = False
+
+    @cached_property
+    def count(self):
+        """Count exactly up to the threshold, and estimate past it"""
+        if not hasattr(self.object_list, "query"):
+            return super().count
+        count = self.object_list[: self.count_threshold + 1].count()
+        if count <= self.count_threshold:
+            return count
+        self.count_is_estimate = True
+        return max(estimate_count(self.object_list), count)
+
+    def validate_number(self, number):
+        """Allow pages past an estimated count, as long as they have results"""
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            number = int(number)
+            if not self.count_is_estimate or number < 1:
+                raise
+            bottom = (number - 1) * self.per_page
+            if not self.object_list[bottom : bottom + 1].exists():
+                raise
+            return number
+
+    def page(self, number):
+        """Do not cut the last page short at an estimated count"""
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if not self.count_is_estimate and top + self.orphans >= self.count:
+            top = self.count
+        return self._get_page(self.object_list[bottom:top], number, self)
+
+
+class StandardCursorPagination(CursorPagination):
+    """Cursor pagination for large API lists
+
+    Views set `cursor_ordering` to the fields to page through the results by.
+    An ordering chosen with an ordering filter backend, or with an
+    OrderingFilter on the view's FilterSet, is used if there is one.  It must
+    be on a non-null field of the model itself, which the cursor can be keyed
+    on.
+    """
+
+    page_size = 50
+    max_page_size = settings.MAX_PAGE_SIZE
+    page_size_query_param = "page_size"
+
+    def get_ordering(self, request, queryset, view):
+        for backend in getattr(view, "filter_backends", []):
+            if hasattr(backend, "get_ordering"):
+                ordering = backend().get_ordering(request, queryset, view)
+                if ordering:
+                    return tuple(ordering)
+        ordering = self.get_filterset_ordering(request, queryset, view)
+        if ordering:
+            return ordering
+        return tuple(view.cursor_ordering)
+
+    def get_filterset_ordering(self, request, queryset, view):
+        """Get the ordering chosen with an OrderingFilter on the view's FilterSet"""
+        filterset_class = getattr(view, "filterset_class", None)
+        if filterset_class is None:
+            return None
+        for name, filter_ in filterset_class.base_filters.items():
+            if not isinstance(filter_, OrderingFilter):
+                continue
+            params = [p.strip() for p in request.query_params.get(name, "").split(",")]
+            ordering = [filter_.get_ordering_value(p) for p in params if p]
+            for field_name in ordering:
+                try:
+                    field = queryset.model._meta.get_field(field_name.lstrip("-"))
+                except FieldDoesNotExist:
+                    field = None
+                if field is None or field.null:
+                    raise ValidationError(
+                        {
+                            name: "Ordering by {} is not supported with cursor "
+                            "pagination".format(field_name.lstrip("-"))
+                        }
+                    )
+            if ordering:
+                # break ties by primary key, in the same direction
+                tie_break = "-pk" if ordering[0].startswith("-") else "pk"
+                return tuple(ordering) + (tie_break,)
+        return None
 
 
 class StandardPagination(PageNumberPagination):
-    """Defines default and maximum page size for pagination"""
+    """Defines default and maximum page size for pagination
+
+    Views which set `cursor_ordering` also allow clients to opt in to cursor
+    pagination with `?pagination=cursor`, which avoids counting the results and
+    does not slow down for later pages
+    """
 
     page_size = 50
     max_page_size = settings.MAX_PAGE_SIZE
     page_size_query_param = "page_size"
+    cursor_class = StandardCursorPagination
+
+    cursor_paginator = None
+
+    def use_cursor(self, request, view):
+        """Should this request use cursor pagination?"""
+        return getattr(view, "cursor_ordering", None) and (
+            request.query_params.get("pagination") == "cursor"
+            or self.cursor_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request, view):
+            self.cursor_paginator = self.cursor_class()
+            page = self.cursor_paginator.paginate_queryset(queryset, request, view)
+            self.display_page_controls = self.cursor_paginator.display_page_controls
+            return page
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_html_context(self):
+        if self.cursor_paginator:
+            return self.cursor_paginator.get_html_context()
+        return super().get_html_context()
+
+    def to_html(self):
+        if self.cursor_paginator:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
@@ -1,5 +1,5 @@
 """
-Cache classes that extend S3, for asset compression
+Storage classes that extend S3, for asset compression and media files
 """
 
 # Django
@@ -43,6 +43,25 @@ class MediaRootS3BotoStorage(S3Boto3Storage):
     querystring_auth = settings.AWS_MEDIA_QUERYSTRING_AUTH
     custom_domain = settings.AWS_MEDIA_CUSTOM_DOMAIN
 
+    def copy(self, name, new_name):
+        """Copy a file within the bucket, without downloading it"""
+        # pylint: disable=protected-access
+        params = self.get_object_parameters(new_name)
+        if "ACL" not in params and self.default_acl:
+            params["ACL"] = self.default_acl
+        source = {
+            "Bucket": self.bucket_name,
+            "Key": self._normalize_name(self._clean_name(name)),
+        }
+        # the managed copy uses a multipart copy for large files
+        self.bucket.meta.client.copy(
+            source,
+            self.bucket_name,
+            self._normalize_name(self._clean_name(new_name)),
+            ExtraArgs=params,
+        )
+        return new_name
+
 
 class PrivateMediaRootS3BotoStorage(MediaRootS3BotoStorage):
     """S3 storage backend that always uploads files as private"""
@@ -50,5 +69,24 @@ class PrivateMediaRootS3BotoStorage(MediaRootS3BotoStorage):
     default_acl = "private"
 
 
+def copy_file(field_file, name):
+    """Copy a stored file to a new name on the same storage
+
+    Storages which support it copy the file server side, others stream it in
+    chunks, so the file is never read into memory all at once.  Returns the name
+    the copy was saved as.  Storages which overwrite files may return the name of
+    the original file, which is then left as it is.
+    """
+    storage = field_file.storage
+    name = storage.get_available_name(name, max_length=field_file.field.max_length)
+    if name == field_file.name:
+        # S3 refuses to copy an object onto itself
+        return name
+    if hasattr(storage, "copy"):
+        return storage.copy(field_file.name, name)
+    with storage.open(field_file.name, "rb") as source:
+        return storage.save(name, source, max_length=field_file.field.max_length)
+
+
 class QueuedS3DietStorage:
     """Left here for old migrations to reference"""
@@ -6,7 +6,10 @@ Tests for site level functionality and helper functions for application tests
 from django.conf import settings
 from django.contrib.sites.models import Site
 from django.core.exceptions import ValidationError
-from django.test import RequestFactory, TestCase
+from django.core.paginator import EmptyPage
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 # Standard Library
@@ -15,12 +18,15 @@ import logging
 # Third Party
 import mock
 import nose.tools
+from actstream.actions import follow
 from actstream.models import Action
 from mock import ANY, Mock, patch
 from nose.tools import eq_, ok_
 
 # MuckRock
 from muckrock.accounts.models import Notification
+from muckrock.agency.models import Agency
+from muckrock.core.cache import LocalLRU, key_prefix
 from muckrock.core.factories import (
     AgencyFactory,
     AnswerFactory,
@@ -30,9 +36,16 @@ from muckrock.core.factories import (
 )
 from muckrock.core.fields import EmailsListField
 from muckrock.core.forms import NewsletterSignupForm, StripeForm
+from muckrock.core.pagination import EstimatedCountPaginator
+from muckrock.core.storage import MediaRootS3BotoStorage, copy_file
 from muckrock.core.templatetags import tags
 from muckrock.core.test_utils import http_get_response, http_post_response
-from muckrock.core.utils import new_action, notify
+from muckrock.core.utils import (
+    cache_get_or_set,
+    new_action,
+    notify,
+    notify_followers,
+)
 from muckrock.core.views import DonationFormView, NewsletterSignupView
 from muckrock.crowdsource.factories import CrowdsourceResponseFactory
 from muckrock.foia.factories import FOIARequestFactory
@@ -186,6 +199,40 @@ class TestUnit(TestCase):
         field.clean("a@example.com,an.email@foo.net", model_instance)
 
 
+class TestEstimatedCountPaginator(TestCase):
+    """Test counting large lists with planner estimates"""
+
+    @patch("muckrock.core.pagination.estimate_count", Mock(return_value=1000))
+    def test_count(self):
+        """Count exactly below the threshold, and estimate above it"""
+        agencies = AgencyFactory.create_batch(3)
+        queryset = Agency.objects.filter(pk__in=[a.pk for a in agencies])
+        paginator = EstimatedCountPaginator(queryset, 2)
+        paginator.count_threshold = 5
+        eq_(paginator.count, 3)
+        ok_(not paginator.count_is_estimate)
+
+        paginator = EstimatedCountPaginator(queryset, 2)
+        paginator.count_threshold = 2
+        eq_(paginator.count, 1000)
+        ok_(paginator.count_is_estimate)
+        eq_(paginator.num_pages, 500)
+
+    @patch("muckrock.core.pagination.estimate_count", Mock(return_value=2))
+    def test_low_estimate(self):
+        """Pages past a low estimate are still served while they have results"""
+        agencies = AgencyFactory.create_batch(5)
+        queryset = Agency.objects.filter(pk__in=[a.pk for a in agencies]).order_by("pk")
+        paginator = EstimatedCountPaginator(queryset, 2)
+        paginator.count_threshold = 2
+        eq_(paginator.num_pages, 2)
+        ok_(paginator.count_is_estimate)
+        eq_(len(paginator.page(2)), 2)
+        eq_(list(paginator.page(3)), [agencies[4]])
+        with nose.tools.assert_raises(EmptyPage):
+            paginator.page(4)
+
+
 class TestNewsletterSignupView(TestCase):
     """By submitting an email, users can subscribe to our MailChimp newsletter list."""
 
@@ -297,6 +344,34 @@ class TestNotify(TestCase):
             )
             ok_(notification_for_user, "Each user in the list should be notified.")
 
+    @patch("muckrock.core.utils.NOTIFY_CHUNK_SIZE", 2)
+    def test_followers(self):
+        """Followers are notified with a constant number of queries"""
+        foia = FOIARequestFactory()
+        users = UserFactory.create_batch(5)
+        for user in users:
+            follow(user, foia)
+        with CaptureQueriesContext(connection) as queries:
+            notify_followers(foia, self.action)
+        # one query for the followers and one insert per chunk
+        eq_(len(queries), 4)
+        for user in users:
+            eq_(user.notifications.count(), 1)
+
+    @patch("muckrock.core.utils.NOTIFY_DEFER_THRESHOLD", 2)
+    def test_followers_deferred(self):
+        """Large fan outs are notified after the transaction commits"""
+        foia = FOIARequestFactory()
+        users = UserFactory.create_batch(3)
+        for user in users:
+            follow(user, foia)
+        with self.captureOnCommitCallbacks() as callbacks:
+            notify_followers(foia, self.action)
+        eq_(Notification.objects.filter(action=self.action).count(), 0)
+        for callback in callbacks:
+            callback()
+        eq_(Notification.objects.filter(action=self.action).count(), 3)
+
 
 @patch("stripe.Charge", Mock())
 @patch("stripe.Customer", Mock())
@@ -348,3 +423,101 @@ class TestTemplatetagsFunctional(TestCase):
 
         nose.tools.eq_(tags.company_title("one\ntwo\nthree"), "one, et al")
         nose.tools.eq_(tags.company_title("company"), "company")
+
+
+class TestCache(SimpleTestCase):
+    """Test the local cache tier and cache helpers"""
+
+    def test_local_lru(self):
+        """The local cache should evict the least recently used values"""
+        local = LocalLRU(max_entries=2, timeout=60)
+        local.set("a", 1)
+        local.set("b", 2)
+        eq_(local.get("a"), (True, 1))
+        local.set("c", 3)
+        eq_(local.get("b"), (False, None))
+        eq_(local.get("a"), (True, 1))
+        local.delete("a")
+        eq_(local.get("a"), (False, None))
+
+    def test_local_lru_timeout(self):
+        """Values should not be kept locally past their timeout"""
+        local = LocalLRU(max_entries=2, timeout=60)
+        local.set("a", 1, timeout=0)
+        eq_(local.get("a"), (False, None))
+        with patch("muckrock.core.cache.time.monotonic", return_value=0):
+            local.set("b", 2)
+        with patch("muckrock.core.cache.time.monotonic", return_value=61):
+            eq_(local.get("b"), (False, None))
+
+    def test_local_lru_copies(self):
+        """Modifying a value from the local cache should not change the cache"""
+        local = LocalLRU(max_entries=2, timeout=60)
+        local.set("a", [1])
+        local.get("a")[1].append(2)
+        eq_(local.get("a"), (True, [1]))
+
+    def test_key_prefix(self):
+        """Keys should be grouped for the stats"""
+        eq_(
+            key_prefix("template.cache.homepage_top.abc123"),
+            "template.cache.homepage_top",
+        )
+        eq_(key_prefix("sb:user:user_org"), "sb")
+        eq_(key_prefix("<message@example.com>"), "other")
+
+    def test_cache_get_or_set(self):
+        """Values should only be computed when missing"""
+        update = Mock(return_value="value")
+        mock_cache = Mock(spec=["get", "set"])
+        mock_cache.get.return_value = "cached"
+        with patch("muckrock.core.utils.cache", mock_cache):
+            eq_(cache_get_or_set("key", update, 60), "cached")
+            update.assert_not_called()
+            mock_cache.get.return_value = None
+            eq_(cache_get_or_set("key", update, 60), "value")
+        mock_cache.set.assert_called_once_with("key", "value", 60)
+
+    def test_cache_get_or_set_lock(self):
+        """Values should be rechecked once the lock is held"""
+        update = Mock(return_value="value")
+        mock_cache = Mock(spec=["get", "set", "lock"])
+        mock_cache.get.side_effect = [None, "cached"]
+        with patch("muckrock.core.utils.cache", mock_cache):
+            eq_(cache_get_or_set("key", update, 60), "cached")
+        update.assert_not_called()
+        mock_cache.lock.return_value.release.assert_called_once_with()
+
+
+@patch.object(MediaRootS3BotoStorage, "exists", Mock(return_value=False))
+@patch.object(MediaRootS3BotoStorage, "bucket")
+class TestCopyFile(SimpleTestCase):
+    """Test copying files on S3"""
+
+    def _field_file(self, name):
+        """A stored file on S3"""
+        field_file = Mock(storage=MediaRootS3BotoStorage(), field=Mock(max_length=255))
+        field_file.name = name
+        return field_file
+
+    def test_copy(self, mock_bucket):
+        """Files are copied server side"""
+        field_file = self._field_file("foia_files/2021/12/01/doc.pdf")
+        name = copy_file(field_file, "foia_files/2021/12/02/doc.pdf")
+        eq_(name, "foia_files/2021/12/02/doc.pdf")
+        mock_bucket.meta.client.copy.assert_called_once_with(
+            {
+                "Bucket": settings.AWS_MEDIA_BUCKET_NAME,
+                "Key": "foia_files/2021/12/01/doc.pdf",
+            },
+            settings.AWS_MEDIA_BUCKET_NAME,
+            "foia_files/2021/12/02/doc.pdf",
+            ExtraArgs=ANY,
+        )
+
+    def test_copy_same_name(self, mock_bucket):
+        """A file is not copied onto itself"""
+        field_file = self._field_file("foia_files/2021/12/01/doc.pdf")
+        name = copy_file(field_file, "foia_files/2021/12/01/doc.pdf")
+        eq_(name, "foia_files/2021/12/01/doc.pdf")
+        mock_bucket.meta.client.copy.assert_not_called()
@@ -6,6 +6,7 @@ Miscellanous utilities
 from django.conf import settings
 from django.contrib.auth.models import Group, User
 from django.core.cache import cache, caches
+from django.db import transaction
 from django.template import Context
 from django.template.loader_tags import BlockNode, ExtendsNode
 
@@ -17,15 +18,24 @@ import string
 import sys
 import time
 import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 
 # Third Party
 import actstream
 import boto3
 import requests
 import stripe
+from redis.exceptions import LockError
 
 logger = logging.getLogger(__name__)
 
+# notifications are inserted this many at a time
+NOTIFY_CHUNK_SIZE = 1000
+# notifying more followers than this is done in a celery task
+NOTIFY_DEFER_THRESHOLD = 1000
+
 # From http://stackoverflow.com/questions/2687173/django-how-can-i-get-a-block-from-a-template
 
 
@@ -82,7 +92,6 @@ def notify(users, action):
     # pylint: disable=import-outside-toplevel
     from muckrock.accounts.models import Notification
 
-    notifications = []
     if isinstance(users, Group):
         # If users is a group, get the queryset of users
         users = users.user_set.all()
@@ -91,10 +100,52 @@ def notify(users, action):
         users = [users]
     if action is None:
         # If no action is provided, don't generate any notifications
-        return notifications
-    for user in users:
-        notification = Notification.objects.create(user=user, action=action)
-        notifications.append(notification)
+        return []
+    return _create_notifications(
+        [Notification(user=user, action=action) for user in users]
+    )
+
+
+def notify_followers(obj, action):
+    """Notify everyone following an object about an action
+
+    Large fan outs are done in a celery task once the current transaction has
+    been committed, so that they do not hold up the request
+    """
+    # pylint: disable=import-outside-toplevel
+    from actstream.models import Follow
+    from muckrock.accounts.tasks import notify_users
+
+    if action is None:
+        return
+    user_pks = list(
+        Follow.objects.followers_qs(obj).order_by().values_list("user_id", flat=True)
+    )
+    if len(user_pks) > NOTIFY_DEFER_THRESHOLD:
+        transaction.on_commit(lambda: notify_users.delay(user_pks, action.pk))
+    else:
+        notify_user_pks(user_pks, action)
+
+
+def notify_user_pks(user_pks, action):
+    """Notify the users with the given primary keys about an action"""
+    # pylint: disable=import-outside-toplevel
+    from muckrock.accounts.models import Notification
+
+    return _create_notifications(
+        [Notification(user_id=user_pk, action=action) for user_pk in user_pks]
+    )
+
+
+def _create_notifications(notifications):
+    """Insert the notifications in chunks"""
+    # pylint: disable=import-outside-toplevel
+    from muckrock.accounts.models import Notification
+
+    for i in range(0, len(notifications), NOTIFY_CHUNK_SIZE):
+        Notification.objects.bulk_create(
+            notifications[i : i + NOTIFY_CHUNK_SIZE]
+        )
     return notifications
 
 
@@ -120,12 +171,40 @@ def get_stripe_token(card_number="4242424242424242"):
     return token.id
 
 
-def cache_get_or_set(key, update, timeout):
-    """Get the value from the cache if present, otherwise update it"""
+def cache_get_or_set(key, update, timeout, lock_timeout=60):
+    """Get the value from the cache if present, otherwise update it
+
+    If the cache supports locks, only one process will update a missing value at
+    a time, and the others will wait for it to be set instead of all
+    recomputing it at once
+    """
     value = cache.get(key)
-    if value is None:
+    if value is not None:
+        return value
+    if not hasattr(cache, "lock"):
         value = update()
         cache.set(key, value, timeout)
+        return value
+
+    lock = cache.lock(
+        "cache_get_or_set:{}".format(key),
+        timeout=lock_timeout,
+        blocking_timeout=lock_timeout,
+    )
+    acquired = lock.acquire()
+    try:
+        # it may have been set while we were waiting for the lock
+        value = cache.get(key)
+        if value is None:
+            value = update()
+            cache.set(key, value, timeout)
+    finally:
+        if acquired:
+            try:
+                lock.release()
+            except LockError:
+                # the lock expired while we were updating
+                pass
     return value
 
 
@@ -182,6 +261,25 @@ def read_in_chunks(file_, size=128):
         yield chunk
 
 
+def read_ahead(items, read, ahead=4):
+    """Yield (item, read(item)) pairs, in order, reading upcoming items in the
+    background
+
+    At most `ahead` items are read ahead of the one currently being consumed, so
+    the results buffered in memory stay bounded
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=ahead) as executor:
+        pending = deque(
+            (item, executor.submit(read, item)) for item in islice(items, ahead)
+        )
+        while pending:
+            item, future = pending.popleft()
+            for next_item in islice(items, 1):
+                pending.append((next_item, executor.submit(read, next_item)))
+            yield item, future.result()
+
+
 def get_squarelet_access_token():
     """Get an access token for squarelet"""
 
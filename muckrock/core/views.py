@@ -38,6 +38,7 @@ from muckrock.accounts.utils import (
 )
 from muckrock.agency.models import Agency
 from muckrock.core.forms import NewsletterSignupForm, SearchForm, StripeForm
+from muckrock.core.pagination import EstimatedCountPaginator
 from muckrock.core.utils import stripe_retry_on_error
 from muckrock.foia.models import FOIAFile, FOIARequest
 from muckrock.jurisdiction.models import Jurisdiction
@@ -132,6 +133,7 @@ class PaginationMixin:
     paginate_by = 25
     min_per_page = 5
     max_per_page = 100
+    paginator_class = EstimatedCountPaginator
 
     def get_paginate_by(self, queryset):
         """Allows paginate_by to be set by a query argument."""
@@ -11,3 +11,8 @@ class CrowdsourceConfig(AppConfig):
     """Crowdsource config"""
 
     name = "muckrock.crowdsource"
+
+    def ready(self):
+        """Connect the signal handlers"""
+        # pylint: disable=import-outside-toplevel, unused-import
+        import muckrock.crowdsource.signals
@@ -24,7 +24,11 @@ from muckrock.crowdsource.models import (
     CrowdsourceData,
     CrowdsourceResponse,
 )
-from muckrock.crowdsource.tasks import datum_per_page, import_doccloud_proj
+from muckrock.crowdsource.tasks import (
+    import_doccloud_proj,
+    import_documents,
+    import_urls,
+)
 from muckrock.project.models import Project
 
 
@@ -121,20 +125,20 @@ class CrowdsourceDataCsvForm(forms.Form):
         if data_csv:
             reader = csv.reader(codecs.iterdecode(data_csv, "utf-8"))
             headers = [h.lower() for h in next(reader)]
+            documents = []
+            data = []
             for line in reader:
-                data = dict(list(zip(headers, line)))
-                url = data.pop("url", "")
+                metadata = dict(list(zip(headers, line)))
+                url = metadata.pop("url", "")
                 doc_match = DOCUMENT_URL_RE.match(url)
                 proj_match = PROJECT_URL_RE.match(url)
                 if doccloud_each_page and doc_match:
-                    datum_per_page.delay(
-                        crowdsource.pk, doc_match.group("doc_id"), data
-                    )
+                    documents.append((doc_match.group("doc_id"), metadata))
                 elif proj_match:
                     import_doccloud_proj.delay(
                         crowdsource.pk,
                         proj_match.group("proj_id"),
-                        data,
+                        metadata,
                         doccloud_each_page,
                     )
                 elif url:
@@ -144,9 +148,14 @@ class CrowdsourceDataCsvForm(forms.Form):
                     except forms.ValidationError:
                         pass
                     else:
-                        crowdsource.data.create(url=url, metadata=data)
+                        data.append((url, metadata))
                 else:
-                    crowdsource.data.create(metadata=data)
+                    # assignments may be metadata only, with no URL
+                    data.append(("", metadata))
+            if documents:
+                import_documents(crowdsource, documents)
+            if data:
+                import_urls(crowdsource, data)
 
 
 class CrowdsourceForm(forms.ModelForm, CrowdsourceDataCsvForm):
@@ -266,11 +275,12 @@ class CrowdsourceDataFormset(CrowdsourceDataFormsetBase):
         """Apply special cases to Document Cloud URLs"""
         instances = super(CrowdsourceDataFormset, self).save(commit=False)
         return_instances = []
+        documents = []
         for instance in instances:
             doc_match = DOCUMENT_URL_RE.match(instance.url)
             proj_match = PROJECT_URL_RE.match(instance.url)
             if doccloud_each_page and doc_match:
-                datum_per_page.delay(self.instance.pk, doc_match.group("doc_id"), {})
+                documents.append((doc_match.group("doc_id"), {}))
             elif proj_match:
                 import_doccloud_proj.delay(
                     self.instance.pk,
@@ -282,6 +292,8 @@ class CrowdsourceDataFormset(CrowdsourceDataFormsetBase):
                 return_instances.append(instance)
                 if commit:
                     instance.save()
+        if documents:
+            import_documents(self.instance, documents)
         return return_instances
 
 
@@ -0,0 +1,31 @@
+"""
+Rebuild the response counters used to hand out crowdsource data
+"""
+
+# Django
+from django.core.management.base import BaseCommand
+
+# MuckRock
+from muckrock.crowdsource.models import CrowdsourceData
+
+
+class Command(BaseCommand):
+    """Rebuild the crowdsource data response counters from scratch"""
+
+    help = (
+        "Recompute the number of responses to each crowdsource datum. They are "
+        "kept up to date as responses are added and removed, but should be "
+        "rebuilt after bulk changes which bypass model signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "crowdsource", nargs="*", type=int, help="Only rebuild these crowdsources"
+        )
+
+    def handle(self, *args, **kwargs):
+        data = CrowdsourceData.objects.all()
+        if kwargs["crowdsource"]:
+            data = data.filter(crowdsource__in=kwargs["crowdsource"])
+        count = data.rebuild_response_counts()
+        self.stdout.write("Rebuilt response counts for {} data".format(count))
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.9 on 2022-01-10 12:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_responses(apps, schema_editor):
+    CrowdsourceData = apps.get_model('crowdsource', 'CrowdsourceData')
+    CrowdsourceResponse = apps.get_model('crowdsource', 'CrowdsourceResponse')
+    counts = (
+        CrowdsourceResponse.objects.filter(data=OuterRef('pk'), number=1)
+        .order_by()
+        .values('data')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    CrowdsourceData.objects.update(response_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crowdsource', '0029_alter_crowdsourcedata_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='crowdsourcedata',
+            name='response_count',
+            field=models.PositiveIntegerField(default=0, help_text='The number of first responses to this datum - kept up to date by signals, used to hand out open data'),
+        ),
+        migrations.AddField(
+            model_name='crowdsourcedata',
+            name='lease_key',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='crowdsourcedata',
+            name='lease_expires',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='crowdsourcedata',
+            index=models.Index(fields=['crowdsource', 'response_count'], name='crowdsource_crowdso_4e2897_idx'),
+        ),
+        migrations.RunPython(count_responses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.9 on 2022-01-12 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crowdsource', '0030_crowdsourcedata_response_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrowdsourceImport',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('each_page', models.BooleanField(default=False, help_text='Create a datum for each page of each document')),
+                ('documents_total', models.PositiveIntegerField(default=0)),
+                ('documents_done', models.PositiveIntegerField(default=0)),
+                ('documents_failed', models.PositiveIntegerField(default=0)),
+                ('data_created', models.PositiveIntegerField(default=0)),
+                ('data_skipped', models.PositiveIntegerField(default=0, help_text='Data which were already part of the crowdsource')),
+                ('datetime_created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('datetime_done', models.DateTimeField(blank=True, null=True)),
+                ('crowdsource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='imports', to='crowdsource.crowdsource')),
+            ],
+            options={
+                'verbose_name': 'assignment data import',
+            },
+        ),
+    ]
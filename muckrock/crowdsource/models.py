@@ -3,12 +3,11 @@
 
 # Django
 from django.conf import settings
-from django.contrib.postgres.aggregates import StringAgg
 from django.core.mail.message import EmailMessage
 from django.core.validators import MinValueValidator
 from django.db import models, transaction
 from django.db.models.aggregates import Count
-from django.db.models.expressions import Case, Value, When
+from django.db.models.expressions import Case, F, Value, When
 from django.db.models.functions import Concat
 from django.db.models.functions.datetime import TruncDay
 from django.urls import reverse
@@ -18,8 +17,8 @@ from django.utils.safestring import mark_safe
 
 # Standard Library
 import json
+from datetime import timedelta
 from html import unescape
-from random import choice
 
 # Third Party
 from bleach.sanitizer import Cleaner
@@ -35,6 +34,7 @@ from muckrock.crowdsource.querysets import (
     CrowdsourceDataQuerySet,
     CrowdsourceQuerySet,
     CrowdsourceResponseQuerySet,
+    CrowdsourceValueQuerySet,
 )
 from muckrock.tags.models import TaggedItemBase
 
@@ -117,11 +117,12 @@ class Crowdsource(models.Model):
 
     def get_data_to_show(self, user, ip_address):
         """Get the crowdsource data to show"""
-        options = self.data.get_choices(self.data_limit, user, ip_address)
-        if options:
-            return choice(options)
-        else:
-            return None
+        return self.data.assign(
+            self.data_limit,
+            user,
+            ip_address,
+            CrowdsourceData.lease_key_for(user, ip_address),
+        )
 
     @transaction.atomic
     def create_form(self, form_json):
@@ -196,7 +197,7 @@ class Crowdsource(models.Model):
         if self.data.exists():
             values.append("datum")
             values.extend(metadata_keys)
-        field_labels = list(
+        header_labels = list(
             self.fields.exclude(type__in=fields.STATIC_FIELDS).values_list(
                 Case(
                     When(deleted=True, then=Concat("label", Value(" (deleted)"))),
@@ -205,7 +206,15 @@ class Crowdsource(models.Model):
                 flat=True,
             )
         )
-        return values + field_labels
+        return values + header_labels
+
+    def get_field_labels(self):
+        """Get the labels of the fields which hold values, in order"""
+        return list(
+            self.fields.exclude(type__in=fields.STATIC_FIELDS).values_list(
+                "label", flat=True
+            )
+        )
 
     def get_metadata_keys(self):
         """Get the metadata keys for this crowdsource's data"""
@@ -280,12 +289,51 @@ class CrowdsourceData(models.Model):
     )
     url = models.URLField(max_length=255, verbose_name="Data URL", blank=True)
     metadata = models.JSONField(default=dict, blank=True)
+    response_count = models.PositiveIntegerField(
+        default=0,
+        help_text="The number of first responses to this datum - "
+        "kept up to date by signals, used to hand out open data",
+    )
+    lease_key = models.CharField(max_length=255, blank=True)
+    lease_expires = models.DateTimeField(blank=True, null=True)
 
     objects = CrowdsourceDataQuerySet.as_manager()
 
+    lease_time = timedelta(minutes=10)
+
     def __str__(self):
         return "Crowdsource Data: {}".format(self.url)
 
+    @staticmethod
+    def lease_key_for(user, ip_address):
+        """Identify the volunteer holding a lease"""
+        if user is not None:
+            return "user:{}".format(user.pk)
+        elif ip_address is not None:
+            return "ip:{}".format(ip_address)
+        else:
+            return ""
+
+    def lease(self, lease_key):
+        """Lease this datum to a volunteer while they fill out the form"""
+        self.lease_key = lease_key
+        self.lease_expires = timezone.now() + self.lease_time
+        CrowdsourceData.objects.filter(pk=self.pk).update(
+            lease_key=self.lease_key, lease_expires=self.lease_expires
+        )
+
+    @classmethod
+    def record_response(cls, data_id, user, ip_address, delta):
+        """Update the counter for a new or deleted response, and release the
+        responder's lease on the datum"""
+        cls.objects.filter(pk=data_id).update(
+            response_count=F("response_count") + delta
+        )
+        if delta > 0:
+            cls.objects.filter(
+                pk=data_id, lease_key=cls.lease_key_for(user, ip_address)
+            ).update(lease_key="", lease_expires=None)
+
     def embed(self):
         """Get the html to embed into the crowdsource"""
         if self.url:
@@ -315,6 +363,98 @@ class CrowdsourceData(models.Model):
 
     class Meta:
         verbose_name = "assignment data"
+        indexes = [models.Index(fields=["crowdsource", "response_count"])]
+
+
+class CrowdsourceImport(models.Model):
+    """Progress of a bulk import of data into a crowdsource"""
+
+    crowdsource = models.ForeignKey(
+        Crowdsource, related_name="imports", on_delete=models.CASCADE
+    )
+    each_page = models.BooleanField(
+        default=False, help_text="Create a datum for each page of each document"
+    )
+    documents_total = models.PositiveIntegerField(default=0)
+    documents_done = models.PositiveIntegerField(default=0)
+    documents_failed = models.PositiveIntegerField(default=0)
+    data_created = models.PositiveIntegerField(default=0)
+    data_skipped = models.PositiveIntegerField(
+        default=0, help_text="Data which were already part of the crowdsource"
+    )
+    datetime_created = models.DateTimeField(default=timezone.now)
+    datetime_done = models.DateTimeField(blank=True, null=True)
+
+    # number of data to create per query
+    chunk_size = 1000
+
+    def __str__(self):
+        return "Import into {}".format(self.crowdsource)
+
+    @property
+    def percent_complete(self):
+        """Percent of documents imported"""
+        if not self.documents_total:
+            return 0
+        finished = self.documents_done + self.documents_failed
+        return int(100 * finished / self.documents_total)
+
+    def add_documents(self, num):
+        """Add to the number of documents to be imported"""
+        CrowdsourceImport.objects.filter(pk=self.pk).update(
+            documents_total=F("documents_total") + num
+        )
+
+    def add_data(self, items):
+        """Create data from (url, metadata) pairs in bulk
+
+        URLs which are already part of the crowdsource are skipped, so that
+        re-importing a document or retrying an import does not duplicate data.
+        Data without a URL is always created.
+        """
+        if not hasattr(self, "_existing_urls"):
+            # pylint: disable=attribute-defined-outside-init
+            self._existing_urls = set(
+                self.crowdsource.data.exclude(url="").values_list("url", flat=True)
+            )
+        created = skipped = 0
+        chunk = []
+        for url, metadata in items:
+            if url and url in self._existing_urls:
+                skipped += 1
+                continue
+            if url:
+                self._existing_urls.add(url)
+            chunk.append(
+                CrowdsourceData(
+                    crowdsource=self.crowdsource, url=url, metadata=metadata
+                )
+            )
+            if len(chunk) >= self.chunk_size:
+                created += len(CrowdsourceData.objects.bulk_create(chunk))
+                chunk = []
+        if chunk:
+            created += len(CrowdsourceData.objects.bulk_create(chunk))
+        CrowdsourceImport.objects.filter(pk=self.pk).update(
+            data_created=F("data_created") + created,
+            data_skipped=F("data_skipped") + skipped,
+        )
+        return created
+
+    def finish_documents(self, done=1, failed=0):
+        """Record that documents have been imported"""
+        CrowdsourceImport.objects.filter(pk=self.pk).update(
+            documents_done=F("documents_done") + done,
+            documents_failed=F("documents_failed") + failed,
+        )
+        CrowdsourceImport.objects.filter(
+            pk=self.pk,
+            datetime_done=None,
+            documents_total__lte=F("documents_done") + F("documents_failed"),
+        ).update(datetime_done=timezone.now())
+
+    class Meta:
+        verbose_name = "assignment data import"
 
 
 class CrowdsourceField(models.Model):
@@ -449,8 +589,15 @@ class CrowdsourceResponse(models.Model):
             from_ = "Anonymous"
         return "Response by {} on {}".format(from_, self.datetime)
 
-    def get_values(self, metadata_keys, include_emails=False):
-        """Get the values for this response for CSV export"""
+    def get_values(
+        self, metadata_keys, include_emails=False, field_labels=None, field_values=None
+    ):
+        """Get the values for this response for CSV export
+
+        The field labels and values may be passed in when exporting many
+        responses, to avoid querying for them once per response
+        """
+        # pylint: disable=too-many-arguments
         values = [
             self.user.username if self.user else "Anonymous",
             self.public,
@@ -458,7 +605,8 @@ class CrowdsourceResponse(models.Model):
             self.skip,
             self.flag,
             self.gallery,
-            ", ".join(self.tags.values_list("name", flat=True)),
+            # use all() so that prefetched tags are used
+            ", ".join(tag.name for tag in self.tags.all()),
         ]
         if include_emails:
             values.insert(1, self.user.email if self.user else "")
@@ -467,10 +615,10 @@ class CrowdsourceResponse(models.Model):
         if self.data:
             values.append(self.data.url)
             values.extend(self.data.metadata.get(k, "") for k in metadata_keys)
-        field_labels = self.crowdsource.fields.exclude(
-            type__in=fields.STATIC_FIELDS
-        ).values_list("label", flat=True)
-        field_values = self.get_field_values()
+        if field_labels is None:
+            field_labels = self.crowdsource.get_field_labels()
+        if field_values is None:
+            field_values = self.get_field_values()
         # ensure exactly one value per field - default to empty string
         # a multivalued field may have no values
         values += [field_values.get(label, "") for label in field_labels]
@@ -481,19 +629,7 @@ class CrowdsourceResponse(models.Model):
         This handle filtering and aggregating of multivalued fields
         """
         return dict(
-            self.values.order_by("field__order")
-            # exclude headers and paragraph fields
-            .exclude(field__type__in=fields.STATIC_FIELDS)
-            # filter out blank values for multivalued fields
-            # there might be blank ones to hold original values,
-            # and we do not want that in the comma separated list
-            .exclude(value="", field__type__in=fields.MULTI_FIELDS)
-            # group by field
-            .values("field")
-            # concat all values for the same field with commas
-            .annotate(agg_value=StringAgg("value", ", "))
-            # select the concated value
-            .values_list("field__label", "agg_value")
+            self.values.get_field_values().values_list("field__label", "agg_value")
         )
 
     def create_values(self, data):
@@ -555,6 +691,8 @@ class CrowdsourceValue(models.Model):
     value = models.CharField(max_length=2000, blank=True)
     original_value = models.CharField(max_length=2000, blank=True)
 
+    objects = CrowdsourceValueQuerySet.as_manager()
+
     def __str__(self):
         return self.value
 
@@ -1,8 +1,14 @@
 """Querysets for the Crowdsource application"""
 
 # Django
-from django.db import models
-from django.db.models import Case, Count, Q, Sum, Value, When
+from django.contrib.postgres.aggregates import StringAgg
+from django.db import models, transaction
+from django.db.models import Case, Count, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+# MuckRock
+from muckrock.crowdsource import fields
 
 
 class CrowdsourceQuerySet(models.QuerySet):
@@ -42,6 +48,54 @@ class CrowdsourceDataQuerySet(models.QuerySet):
             choices = choices.exclude(responses__ip_address=ip_address)
         return choices
 
+    def assign(self, data_limit, user, ip_address, lease_key):
+        """Hand out a datum to a volunteer, leasing it to them for a short time
+
+        Data are handed out using the response counters, so the responses do
+        not need to be counted on every request.  A datum which is leased to
+        another volunteer is only handed out if all open data are leased.
+        """
+        now = timezone.now()
+        choices = self.filter(response_count__lt=data_limit)
+        if user is not None:
+            choices = choices.exclude(responses__user=user)
+        elif ip_address is not None:
+            choices = choices.exclude(responses__ip_address=ip_address)
+
+        # keep showing a volunteer the datum they are already working on
+        datum = choices.filter(lease_key=lease_key, lease_expires__gt=now).first()
+        if datum is None:
+            with transaction.atomic():
+                # skip rows being leased concurrently, so that simultaneous
+                # volunteers are given different data
+                datum = (
+                    choices.filter(Q(lease_expires=None) | Q(lease_expires__lte=now))
+                    .order_by("response_count", "pk")
+                    .select_for_update(skip_locked=True, of=("self",))
+                    .first()
+                )
+                if datum is not None:
+                    datum.lease(lease_key)
+                    return datum
+            datum = choices.order_by("lease_expires").first()
+        if datum is not None:
+            datum.lease(lease_key)
+        return datum
+
+    def rebuild_response_counts(self):
+        """Recompute the response counters from the responses"""
+        # pylint: disable=import-outside-toplevel
+        from muckrock.crowdsource.models import CrowdsourceResponse
+
+        counts = (
+            CrowdsourceResponse.objects.filter(data=OuterRef("pk"), number=1)
+            .order_by()
+            .values("data")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return self.update(response_count=Coalesce(Subquery(counts), 0))
+
 
 class CrowdsourceResponseQuerySet(models.QuerySet):
     """Object manager for crowdsource responses"""
@@ -49,3 +103,27 @@ class CrowdsourceResponseQuerySet(models.QuerySet):
     def get_user_count(self):
         """Get the number of distinct users who have responded"""
         return self.aggregate(Count("user", distinct=True))["user__count"]
+
+
+class CrowdsourceValueQuerySet(models.QuerySet):
+    """Object manager for crowdsource values"""
+
+    def get_field_values(self, *group_by):
+        """Aggregate the values for each field, for CSV export
+
+        Values may additionally be grouped by other fields, such as the
+        response, to aggregate many responses' values in a single query
+        """
+        return (
+            self.order_by("field__order")
+            # exclude headers and paragraph fields
+            .exclude(field__type__in=fields.STATIC_FIELDS)
+            # filter out blank values for multivalued fields
+            # there might be blank ones to hold original values,
+            # and we do not want that in the comma separated list
+            .exclude(value="", field__type__in=fields.MULTI_FIELDS)
+            # group by field
+            .values(*group_by, "field")
+            # concat all values for the same field with commas
+            .annotate(agg_value=StringAgg("value", ", "))
+        )
@@ -0,0 +1,37 @@
+"""Model signal handlers for the crowdsource application"""
+
+# Django
+from django.db.models.signals import post_delete, post_save
+
+# MuckRock
+from muckrock.crowdsource.models import CrowdsourceData, CrowdsourceResponse
+
+# pylint: disable=unused-argument
+
+
+def response_post_save(sender, instance, created, raw=False, **kwargs):
+    """Count a new response towards its datum's data limit"""
+    if created and not raw and instance.data_id is not None and instance.number == 1:
+        CrowdsourceData.record_response(
+            instance.data_id, instance.user, instance.ip_address, 1
+        )
+
+
+def response_post_delete(sender, instance, **kwargs):
+    """Stop counting a deleted response"""
+    if instance.data_id is not None and instance.number == 1:
+        CrowdsourceData.record_response(
+            instance.data_id, instance.user, instance.ip_address, -1
+        )
+
+
+post_save.connect(
+    response_post_save,
+    sender=CrowdsourceResponse,
+    dispatch_uid="muckrock.crowdsource.signals.response_post_save",
+)
+post_delete.connect(
+    response_post_delete,
+    sender=CrowdsourceResponse,
+    dispatch_uid="muckrock.crowdsource.signals.response_post_delete",
+)
@@ -5,22 +5,82 @@ Celery tasks for the crowdsource application
 # Django
 from celery.task import task
 from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 
 # Standard Library
 import csv
 import logging
+from collections import defaultdict
 
 # Third Party
 from documentcloud import DocumentCloud
-from documentcloud.exceptions import DocumentCloudError
+from documentcloud.exceptions import DocumentCloudError, DoesNotExistError
 
 # MuckRock
 from muckrock.core.tasks import AsyncFileDownloadTask
-from muckrock.crowdsource.models import Crowdsource
+from muckrock.crowdsource.models import (
+    Crowdsource,
+    CrowdsourceImport,
+    CrowdsourceValue,
+)
 
 logger = logging.getLogger(__name__)
 
 
+# number of documents to import per task
+DOCUMENT_BATCH_SIZE = 50
+
+
+def get_documentcloud_client():
+    """Get an authenticated DocumentCloud client"""
+    return DocumentCloud(
+        username=settings.DOCUMENTCLOUD_BETA_USERNAME,
+        password=settings.DOCUMENTCLOUD_BETA_PASSWORD,
+        base_uri=f"{settings.DOCCLOUD_API_URL}/api/",
+        auth_uri=f"{settings.SQUARELET_URL}/api/",
+    )
+
+
+def document_urls(document, each_page):
+    """Get the URLs to create data for from a document"""
+    if each_page:
+        return [
+            f"{document.canonical_url}/pages/{i}"
+            for i in range(1, document.pages + 1)
+        ]
+    else:
+        return [document.canonical_url]
+
+
+def import_urls(crowdsource, data):
+    """Import data from a list of (url, metadata) pairs"""
+    data_import = crowdsource.imports.create(
+        documents_total=len(data),
+        documents_done=len(data),
+        datetime_done=timezone.now(),
+    )
+    data_import.add_data(data)
+    return data_import
+
+
+def import_documents(crowdsource, documents, each_page=True):
+    """Import DocumentCloud documents into a crowdsource in batches
+
+    `documents` is a list of (document ID, metadata) pairs
+    """
+    data_import = crowdsource.imports.create(
+        each_page=each_page, documents_total=len(documents)
+    )
+    for i in range(0, len(documents), DOCUMENT_BATCH_SIZE):
+        transaction.on_commit(
+            lambda batch=documents[i : i + DOCUMENT_BATCH_SIZE]: (
+                import_doccloud_docs.delay(data_import.pk, batch)
+            )
+        )
+    return data_import
+
+
 @task(
     name="muckrock.crowdsource.tasks.datum_per_page",
     autoretry_for=(DocumentCloudError,),
@@ -29,19 +89,42 @@ logger = logging.getLogger(__name__)
 )
 def datum_per_page(crowdsource_pk, doc_id, metadata):
     """Create a crowdsource data item for each page of the document"""
-
     crowdsource = Crowdsource.objects.get(pk=crowdsource_pk)
-    dc_client = DocumentCloud(
-        username=settings.DOCUMENTCLOUD_BETA_USERNAME,
-        password=settings.DOCUMENTCLOUD_BETA_PASSWORD,
-        base_uri=f"{settings.DOCCLOUD_API_URL}/api/",
-        auth_uri=f"{settings.SQUARELET_URL}/api/",
+    import_documents(crowdsource, [(doc_id, metadata)])
+
+
+@task(
+    name="muckrock.crowdsource.tasks.import_doccloud_docs",
+    autoretry_for=(DocumentCloudError,),
+    retry_backoff=60,
+    retry_kwargs={"max_retries": 3},
+)
+def import_doccloud_docs(import_pk, documents):
+    """Import a batch of documents, using a single DocumentCloud client
+
+    Data which have already been created are skipped, so it is safe to retry
+    """
+    data_import = CrowdsourceImport.objects.select_related("crowdsource").get(
+        pk=import_pk
     )
-    document = dc_client.documents.get(doc_id)
-    for i in range(1, document.pages + 1):
-        crowdsource.data.create(
-            url=f"{document.canonical_url}/pages/{i}", metadata=metadata
+    dc_client = get_documentcloud_client()
+    for doc_id, metadata in documents:
+        try:
+            document = dc_client.documents.get(doc_id)
+        except DoesNotExistError as exc:
+            # other errors will retry the batch
+            logger.warning(
+                "Could not import document %s into crowdsource %s: %s",
+                doc_id,
+                data_import.crowdsource_id,
+                exc,
+            )
+            data_import.finish_documents(done=0, failed=1)
+            continue
+        data_import.add_data(
+            (url, metadata) for url in document_urls(document, data_import.each_page)
         )
+        data_import.finish_documents()
 
 
 @task(
@@ -53,20 +136,21 @@ def datum_per_page(crowdsource_pk, doc_id, metadata):
 def import_doccloud_proj(crowdsource_pk, proj_id, metadata, doccloud_each_page):
     """Import documents from a document cloud project"""
     crowdsource = Crowdsource.objects.get(pk=crowdsource_pk)
-
-    dc_client = DocumentCloud(
-        username=settings.DOCUMENTCLOUD_BETA_USERNAME,
-        password=settings.DOCUMENTCLOUD_BETA_PASSWORD,
-        base_uri=f"{settings.DOCCLOUD_API_URL}/api/",
-        auth_uri=f"{settings.SQUARELET_URL}/api/",
+    dc_client = get_documentcloud_client()
+    # the project's document list includes the page counts, so the documents
+    # do not need to be fetched individually
+    documents = list(dc_client.projects.get(proj_id).documents)
+    data_import = crowdsource.imports.create(
+        each_page=doccloud_each_page, documents_total=len(documents)
     )
-    project = dc_client.projects.get(proj_id)
-
-    for document in project.documents:
-        if doccloud_each_page:
-            datum_per_page.delay(crowdsource.pk, document.id, metadata)
-        else:
-            crowdsource.data.create(url=document.canonical_url, metadata=metadata)
+    for i in range(0, len(documents), DOCUMENT_BATCH_SIZE):
+        batch = documents[i : i + DOCUMENT_BATCH_SIZE]
+        data_import.add_data(
+            (url, metadata)
+            for document in batch
+            for url in document_urls(document, doccloud_each_page)
+        )
+        data_import.finish_documents(done=len(batch))
 
 
 class ExportCsv(AsyncFileDownloadTask):
@@ -78,6 +162,9 @@ class ExportCsv(AsyncFileDownloadTask):
     html_template = "message/notification/csv_export.html"
     subject = "Your CSV Export"
 
+    # number of responses to load at a time
+    chunk_size = 1000
+
     def __init__(self, user_pk, crowdsource_pk):
         super(ExportCsv, self).__init__(user_pk, crowdsource_pk)
         self.crowdsource = Crowdsource.objects.get(pk=crowdsource_pk)
@@ -91,8 +178,44 @@ class ExportCsv(AsyncFileDownloadTask):
         writer.writerow(
             self.crowdsource.get_header_values(metadata_keys, include_emails)
         )
-        for csr in self.crowdsource.responses.all().iterator():
-            writer.writerow(csr.get_values(metadata_keys, include_emails))
+        field_labels = self.crowdsource.get_field_labels()
+        for responses in self.iter_chunks():
+            # aggregate the values for the whole chunk in a single query
+            field_values = defaultdict(dict)
+            for value in (
+                CrowdsourceValue.objects.filter(response__in=responses)
+                .get_field_values("response")
+                .values_list("response", "field__label", "agg_value")
+            ):
+                field_values[value[0]][value[1]] = value[2]
+            for csr in responses:
+                writer.writerow(
+                    csr.get_values(
+                        metadata_keys,
+                        include_emails,
+                        field_labels=field_labels,
+                        field_values=field_values[csr.pk],
+                    )
+                )
+
+    def iter_chunks(self):
+        """Load the responses a chunk at a time, by primary key
+
+        Each chunk is loaded with a constant number of queries, no matter how
+        many responses it contains
+        """
+        responses = (
+            self.crowdsource.responses.select_related("user", "data")
+            .prefetch_related("tags")
+            .order_by("pk")
+        )
+        last_pk = 0
+        while True:
+            chunk = list(responses.filter(pk__gt=last_pk)[: self.chunk_size])
+            if not chunk:
+                return
+            yield chunk
+            last_pk = chunk[-1].pk
 
 
 @task(time_limit=1800, name="muckrock.crowdsource.tasks.export_csv")
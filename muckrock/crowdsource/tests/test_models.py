@@ -25,7 +25,7 @@ from muckrock.crowdsource.factories import (
     CrowdsourceTextFieldFactory,
     CrowdsourceValueFactory,
 )
-from muckrock.crowdsource.models import Crowdsource
+from muckrock.crowdsource.models import Crowdsource, CrowdsourceData
 
 
 class TestCrowdsource(TestCase):
@@ -39,6 +39,29 @@ class TestCrowdsource(TestCase):
         data = CrowdsourceDataFactory(crowdsource=crowdsource)
         eq_(data, crowdsource.get_data_to_show(crowdsource.user, ip_address))
 
+    def test_get_data_to_show_leases(self):
+        """Concurrent volunteers should be given different data"""
+        crowdsource = CrowdsourceFactory(data_limit=1)
+        data = CrowdsourceDataFactory.create_batch(2, crowdsource=crowdsource)
+        user1, user2 = UserFactory.create_batch(2)
+
+        first = crowdsource.get_data_to_show(user1, None)
+        eq_(first, data[0])
+        # the same volunteer keeps their datum
+        eq_(crowdsource.get_data_to_show(user1, None), first)
+        # another volunteer gets a different one
+        eq_(crowdsource.get_data_to_show(user2, None), data[1])
+
+        # responding releases the lease and fills up the datum
+        CrowdsourceResponseFactory(crowdsource=crowdsource, user=user1, data=first)
+        first.refresh_from_db()
+        eq_(first.response_count, 1)
+        eq_(first.lease_key, "")
+        eq_(crowdsource.get_data_to_show(user1, None), data[1])
+        # once everything is filled, there is nothing left to show
+        CrowdsourceResponseFactory(crowdsource=crowdsource, user=user2, data=data[1])
+        assert_is_none(crowdsource.get_data_to_show(UserFactory(), None))
+
     def test_create_form(self):
         """Create form should create fields from the JSON"""
         crowdsource = CrowdsourceFactory()
@@ -260,6 +283,27 @@ class TestCrowdsourceData(TestCase):
             set([data[0], data[2]]),
         )
 
+    def test_response_counts(self):
+        """Response counters should match the responses"""
+        crowdsource = CrowdsourceFactory()
+        datum = CrowdsourceDataFactory(crowdsource=crowdsource)
+        user = UserFactory()
+        CrowdsourceResponseFactory(crowdsource=crowdsource, user=user, data=datum)
+        response = CrowdsourceResponseFactory(
+            crowdsource=crowdsource, user=user, data=datum, number=2
+        )
+        CrowdsourceResponseFactory(crowdsource=crowdsource, data=datum, skip=True)
+        datum.refresh_from_db()
+        eq_(datum.response_count, 2)
+        response.delete()
+        datum.refresh_from_db()
+        eq_(datum.response_count, 2)
+
+        CrowdsourceData.objects.update(response_count=0)
+        CrowdsourceData.objects.rebuild_response_counts()
+        datum.refresh_from_db()
+        eq_(datum.response_count, 2)
+
 
 class TestCrowdsourceResponse(TestCase):
     """Test the Crowdsource Response model"""
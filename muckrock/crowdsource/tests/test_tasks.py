@@ -0,0 +1,123 @@
+"""
+Tests for the crowdsource application's tasks
+"""
+
+# Django
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+# Standard Library
+import csv
+from io import StringIO
+
+# Third Party
+from mock import Mock, patch
+from nose.tools import assert_is_not_none, eq_
+
+# MuckRock
+from muckrock.core.factories import UserFactory
+from muckrock.crowdsource.factories import (
+    CrowdsourceDataFactory,
+    CrowdsourceFactory,
+    CrowdsourceResponseFactory,
+    CrowdsourceTextFieldFactory,
+    CrowdsourceValueFactory,
+)
+from muckrock.crowdsource.tasks import ExportCsv, import_doccloud_docs, import_urls
+
+
+class TestExportCsv(TestCase):
+    """Test exporting crowdsource responses to a CSV"""
+
+    def setUp(self):
+        self.user = UserFactory(is_staff=True)
+
+    def _export(self, crowdsource):
+        """Export the responses, returning the rows and the number of queries"""
+        export = ExportCsv(self.user.pk, crowdsource.pk)
+        out_file = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            export.generate_file(out_file)
+        out_file.seek(0)
+        return list(csv.reader(out_file)), len(queries)
+
+    def _create_responses(self, num):
+        """Create a crowdsource with the given number of tagged responses"""
+        crowdsource = CrowdsourceFactory()
+        field = CrowdsourceTextFieldFactory(crowdsource=crowdsource, order=0)
+        datum = CrowdsourceDataFactory(crowdsource=crowdsource, metadata={"a": "1"})
+        for i in range(num):
+            response = CrowdsourceResponseFactory(
+                crowdsource=crowdsource, data=datum, number=i + 1
+            )
+            response.tags.add("tag")
+            CrowdsourceValueFactory(
+                response=response, field=field, value="value {}".format(i)
+            )
+        return crowdsource
+
+    def test_export(self):
+        """The export should include a row per response with its values"""
+        crowdsource = self._create_responses(3)
+        rows, _ = self._export(crowdsource)
+        eq_(len(rows), 4)
+        eq_(rows[0][-1], crowdsource.fields.get().label)
+        eq_([row[-1] for row in rows[1:]], ["value 0", "value 1", "value 2"])
+        tags_col = rows[0].index("tags")
+        eq_([row[tags_col] for row in rows[1:]], ["tag", "tag", "tag"])
+        metadata_col = rows[0].index("a")
+        eq_([row[metadata_col] for row in rows[1:]], ["1", "1", "1"])
+
+    def test_constant_queries(self):
+        """The number of queries should not depend on the number of responses"""
+        _, small_queries = self._export(self._create_responses(2))
+        _, large_queries = self._export(self._create_responses(20))
+        eq_(small_queries, large_queries)
+
+
+class TestImportDocuments(TestCase):
+    """Test importing DocumentCloud documents into a crowdsource"""
+
+    @patch("muckrock.crowdsource.tasks.DocumentCloud")
+    def test_import_pages(self, mock_dc):
+        """Create a datum per page, skipping data already imported"""
+        url = "https://www.documentcloud.org/documents/{}-doc"
+        mock_dc.return_value.documents.get.side_effect = lambda doc_id: Mock(
+            canonical_url=url.format(doc_id), pages=3
+        )
+        crowdsource = CrowdsourceFactory()
+        CrowdsourceDataFactory(crowdsource=crowdsource, url=url.format(1) + "/pages/1")
+        data_import = crowdsource.imports.create(each_page=True, documents_total=2)
+
+        with CaptureQueriesContext(connection) as queries:
+            import_doccloud_docs(data_import.pk, [(1, {"a": "1"}), (2, {"a": "2"})])
+
+        # one client for the batch
+        eq_(mock_dc.call_count, 1)
+        eq_(crowdsource.data.count(), 6)
+        eq_(crowdsource.data.filter(metadata={"a": "2"}).count(), 3)
+        data_import.refresh_from_db()
+        eq_(data_import.data_created, 5)
+        eq_(data_import.data_skipped, 1)
+        eq_(data_import.percent_complete, 100)
+        assert_is_not_none(data_import.datetime_done)
+        # data is created in bulk, not once per page
+        inserts = [q for q in queries if q["sql"].startswith("INSERT")]
+        eq_(len(inserts), 2)
+
+    def test_import_urls(self):
+        """Skip URLs already imported, but keep every datum without a URL"""
+        crowdsource = CrowdsourceFactory()
+        CrowdsourceDataFactory(crowdsource=crowdsource, url="https://www.example.com/1")
+        import_urls(
+            crowdsource,
+            [
+                ("https://www.example.com/1", {}),
+                ("https://www.example.com/2", {}),
+                ("", {"a": "1"}),
+                ("", {"a": "2"}),
+            ],
+        )
+        eq_(crowdsource.data.count(), 4)
+        eq_(crowdsource.data.filter(url="").count(), 2)
@@ -158,6 +158,7 @@ class CrowdsourceDetailView(DetailView):
         )
         context["message_form"] = CrowdsourceMessageResponseForm()
         context["data_form"] = CrowdsourceDataCsvForm()
+        context["data_imports"] = self.object.imports.filter(datetime_done=None)
         context["edit_access"] = self.request.user.has_perm(
             "crowdsource.change_crowdsource", self.object
         )
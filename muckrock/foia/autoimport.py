@@ -0,0 +1,345 @@
+"""
+Automatically import scanned documents from S3
+
+The nightly autoimport task lists the scans waiting in the autoimport bucket and
+fans out one task per scan.  Progress is tracked in redis, so that scans which
+have already been imported for a request are not imported again if a run is
+interrupted and the scan is picked up again by a later run.
+"""
+
+# Django
+from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.mail.message import EmailMessage
+from django.db import transaction
+from django.utils import timezone
+
+# Standard Library
+import hashlib
+import logging
+import os
+import re
+import sys
+from datetime import datetime, time
+
+# Third Party
+from django_redis import get_redis_connection
+
+# MuckRock
+from muckrock.communication.models import MailCommunication
+from muckrock.foia.exceptions import SizeError
+from muckrock.foia.models import FOIACommunication, FOIAFile, FOIARequest
+
+logger = logging.getLogger(__name__)
+
+p_name = re.compile(
+    r"(?P<month>\d\d?)-(?P<day>\d\d?)-(?P<year>\d\d) "
+    r"(?P<docs>(?:mr\d+(?: |$))+)",
+    re.I,
+)
+
+
+class AutoImportManifest:
+    """Tracks the progress of an autoimport run in redis"""
+
+    prefix = "autoimport"
+    # how long a scan stays claimed by a run before another run may retry it
+    claim_timeout = 2 * 60 * 60
+    # how long to remember which requests a scan has been imported into
+    done_timeout = 30 * 24 * 60 * 60
+    # how long to keep the log and counters for a run
+    run_timeout = 24 * 60 * 60
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self.redis = get_redis_connection("lock")
+
+    @classmethod
+    def start(cls):
+        """Start a new run"""
+        return cls(timezone.now().strftime("%Y%m%d%H%M%S"))
+
+    def _key(self, *parts):
+        """Build a redis key"""
+        return ":".join((self.prefix,) + parts)
+
+    def claim(self, key):
+        """Claim a scan for this run, returns False if another run holds it"""
+        return bool(
+            self.redis.set(
+                self._key("claim", key), self.run_id, nx=True, ex=self.claim_timeout
+            )
+        )
+
+    def release(self, key):
+        """Release the claim on a scan"""
+        self.redis.delete(self._key("claim", key))
+
+    def is_done(self, scan_id, foia_pk):
+        """Has this scan already been imported into this request?"""
+        return self.redis.sismember(self._key("done", scan_id), foia_pk)
+
+    def mark_done(self, scan_id, foia_pk):
+        """Record that this scan has been imported into this request"""
+        key = self._key("done", scan_id)
+        pipe = self.redis.pipeline()
+        pipe.sadd(key, foia_pk)
+        pipe.expire(key, self.done_timeout)
+        pipe.execute()
+
+    def set_pending(self, num):
+        """Set the number of scans which have been queued for this run"""
+        self.redis.set(self._key(self.run_id, "pending"), num, ex=self.run_timeout)
+
+    def finish_scan(self):
+        """Mark one scan as finished, returns True if it was the last one"""
+        return self.redis.decr(self._key(self.run_id, "pending")) <= 0
+
+    def log(self, line):
+        """Add a line to the log for this run"""
+        key = self._key(self.run_id, "log")
+        pipe = self.redis.pipeline()
+        pipe.rpush(key, line)
+        pipe.expire(key, self.run_timeout)
+        pipe.execute()
+
+    def get_log(self):
+        """Get all of the log lines for this run"""
+        return [
+            line.decode("utf8")
+            for line in self.redis.lrange(self._key(self.run_id, "log"), 0, -1)
+        ]
+
+    def clear(self):
+        """Clear the counters and log for this run"""
+        self.redis.delete(
+            self._key(self.run_id, "pending"), self._key(self.run_id, "log")
+        )
+
+
+def list_scans(bucket):
+    """List the top level files and folders waiting to be imported
+
+    Yields the key and the ETag for files, or None for folders
+    """
+    paginator = bucket.meta.client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(
+        Bucket=bucket.name, Prefix=settings.AWS_AUTOIMPORT_PATH, Delimiter="/"
+    ):
+        for prefix in page.get("CommonPrefixes", []):
+            yield prefix["Prefix"], None
+        for obj in page.get("Contents", []):
+            if obj["Key"] != settings.AWS_AUTOIMPORT_PATH:
+                yield obj["Key"], obj["ETag"]
+
+
+def s3_copy(bucket, key_or_pre, dest_name):
+    """Copy an s3 key or prefix"""
+    if key_or_pre.endswith("/"):
+        for obj in bucket.objects.filter(Prefix=key_or_pre):
+            bucket.Object(dest_name + obj.key[len(key_or_pre) :]).copy_from(
+                CopySource={"Bucket": bucket.name, "Key": obj.key}
+            )
+    else:
+        bucket.Object(dest_name).copy_from(
+            CopySource={"Bucket": bucket.name, "Key": key_or_pre}
+        )
+
+
+def s3_delete(bucket, key_or_pre):
+    """Delete an s3 key or prefix
+
+    Prefixes are deleted using batched delete_objects calls
+    """
+    if key_or_pre.endswith("/"):
+        bucket.objects.filter(Prefix=key_or_pre).delete()
+    else:
+        bucket.delete_objects(Delete={"Objects": [{"Key": key_or_pre}], "Quiet": True})
+
+
+def parse_name(name):
+    """Parse a file name"""
+    # strip off trailing / and file extension
+    name = os.path.normpath(name)
+    name = os.path.splitext(name)[0]
+
+    m_name = p_name.match(name)
+    if not m_name:
+        raise ValueError("ERROR: %s does not match the file name format" % name)
+    foia_pks = [pk[2:] for pk in m_name.group("docs").split()]
+    file_datetime = datetime.combine(
+        datetime(
+            int(m_name.group("year")) + 2000,
+            int(m_name.group("month")),
+            int(m_name.group("day")),
+        ),
+        time(tzinfo=timezone.get_current_timezone()),
+    )
+
+    return foia_pks, file_datetime
+
+
+def scan_id(objects):
+    """Idempotency key for a scan, based on the keys and ETags of its files
+
+    If a scan is replaced with a new version under the same name, it will have
+    a new ID and will be imported again
+    """
+    digest = hashlib.sha1()
+    for key, etag in sorted(objects):
+        digest.update("{}:{}\n".format(key, etag).encode("utf8"))
+    return digest.hexdigest()
+
+
+def import_key(key, bucket, storage_bucket, comm, manifest):
+    """Import a key"""
+    foia = comm.foia
+    file_name = os.path.split(key)[1]
+
+    # first parameter is instance, but we do not have one yet
+    # luckily, it is only used if the upload_to for the field is
+    # a callable, which it is not, so it is safe to pass in None
+    full_file_name = FOIAFile.ffile.field.generate_filename(None, file_name)
+    full_file_name = default_storage.get_available_name(full_file_name)
+
+    new_obj = storage_bucket.Object(full_file_name)
+    new_obj.copy_from(
+        CopySource={"Bucket": bucket.name, "Key": key}, ACL=settings.AWS_DEFAULT_ACL
+    )
+
+    foia_file = comm.attach_file(path=full_file_name, name=file_name, now=False)
+
+    oldfile = bucket.Object(key)
+    if oldfile.content_length != foia_file.ffile.size:
+        raise SizeError(oldfile.content_length, foia_file.ffile.size, foia_file)
+
+    manifest.log(
+        "SUCCESS: %s uploaded to FOIA Request %s with a status of %s"
+        % (file_name, foia.pk, foia.status)
+    )
+
+
+def import_prefix(keys, prefix, bucket, storage_bucket, comm, manifest):
+    """Import a prefix (folder) full of documents"""
+    for key in keys:
+        if key.endswith("/"):
+            manifest.log(
+                "ERROR: nested directories not allowed: %s in %s" % (key, prefix)
+            )
+            continue
+        try:
+            import_key(key, bucket, storage_bucket, comm, manifest)
+        except SizeError as exc:
+            s3_copy(
+                bucket, key, "review/%s" % key.replace(settings.AWS_AUTOIMPORT_PATH, "")
+            )
+            exc.args[2].delete()  # delete the foia file
+            comm.delete()
+            manifest.log(
+                "ERROR: %s was %s bytes and after uploaded was %s bytes - retry"
+                % (
+                    key.replace(settings.AWS_AUTOIMPORT_PATH, ""),
+                    exc.args[0],
+                    exc.args[1],
+                )
+            )
+            # the communication is gone, so stop importing into it
+            return
+
+
+def import_scan(key, etag, bucket, storage_bucket, manifest):
+    """Import a single scan, which may be a file or a folder of files"""
+    # pylint: disable=broad-except
+    # pylint: disable=too-many-arguments
+    # strip off 'scans/'
+    file_name = key.replace(settings.AWS_AUTOIMPORT_PATH, "")
+
+    try:
+        foia_pks, file_datetime = parse_name(file_name)
+    except ValueError as exc:
+        s3_copy(bucket, key, "review/%s" % file_name)
+        s3_delete(bucket, key)
+        manifest.log(str(exc))
+        return
+
+    if key.endswith("/"):
+        objects = [
+            (obj.key, obj.e_tag)
+            for obj in bucket.objects.filter(Prefix=key)
+            if obj.key != key
+        ]
+    else:
+        objects = [(key, etag)]
+    scan = scan_id(objects)
+
+    for foia_pk in foia_pks:
+        if manifest.is_done(scan, foia_pk):
+            manifest.log(
+                "SKIPPED: %s was already uploaded to FOIA Request %s"
+                % (file_name, foia_pk)
+            )
+            continue
+        try:
+            with transaction.atomic():
+                foia = FOIARequest.objects.get(pk=foia_pk)
+                from_user = foia.agency.get_user() if foia.agency else None
+
+                comm = FOIACommunication.objects.create(
+                    foia=foia,
+                    from_user=from_user,
+                    to_user=foia.user,
+                    response=True,
+                    datetime=file_datetime,
+                    communication="",
+                    hidden=True,
+                )
+                comm.responsetask_set.create(scan=True)
+                MailCommunication.objects.create(
+                    communication=comm, sent_datetime=file_datetime
+                )
+
+                if key.endswith("/"):
+                    import_prefix(
+                        [k for k, _ in objects],
+                        key,
+                        bucket,
+                        storage_bucket,
+                        comm,
+                        manifest,
+                    )
+                else:
+                    import_key(key, bucket, storage_bucket, comm, manifest)
+            manifest.mark_done(scan, foia_pk)
+
+        except FOIARequest.DoesNotExist:
+            s3_copy(bucket, key, "review/%s" % file_name)
+            manifest.log(
+                "ERROR: %s references FOIA Request %s, but it does not exist"
+                % (file_name, foia_pk)
+            )
+        except SoftTimeLimitExceeded:
+            # if we reach the soft time limit,
+            # re-raise so we can catch and clean up
+            raise
+        except Exception as exc:
+            s3_copy(bucket, key, "review/%s" % file_name)
+            manifest.log(
+                "ERROR: %s has caused an unknown error. %s" % (file_name, exc)
+            )
+            logger.error("Autoimport error: %s", exc, exc_info=sys.exc_info())
+    # delete key after processing all requests for it
+    s3_delete(bucket, key)
+
+
+def send_report(manifest):
+    """Email the log for the run"""
+    manifest.log("End Time: %s" % timezone.now())
+    EmailMessage(
+        subject="[AUTOIMPORT] %s Logs" % timezone.now(),
+        body="\n".join(manifest.get_log()),
+        from_email=settings.SCANS_EMAIL,
+        to=[settings.SCANS_SLACK_EMAIL],
+        bcc=[settings.DIAGNOSTIC_EMAIL],
+    ).send(fail_silently=False)
+    manifest.clear()
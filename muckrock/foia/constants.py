@@ -8,6 +8,9 @@ COMPOSER_SUBMIT_DELAY = 35 * 60
 # allow a composer to be edited 30 minutes after it has been submitted
 COMPOSER_EDIT_DELAY = 30 * 60
 
+# create the requests for a multi-request this many agencies at a time
+COMPOSER_CHUNK_SIZE = 25
+
 # elements allowed in html email, from:
 # https://www.pinpointe.com/blog/email-campaign-html-and-css-support
 EMAIL_TAGS = [
@@ -0,0 +1,153 @@
+"""
+Send the daily automatic follow ups
+
+The nightly followup_requests task groups the requests which are due for a
+follow up by how they will be sent, and fans them out in chunks, spacing out
+the chunks for each channel to respect its rate limit.  Progress is tracked in
+redis, so that the last chunk to finish can log a summary of the run.
+"""
+
+# Django
+from django.utils import timezone
+
+# Standard Library
+import logging
+from collections import defaultdict
+
+# Third Party
+from django_mailgun import MailgunAPIError
+from django_redis import get_redis_connection
+
+# MuckRock
+from muckrock.foia.models import FOIARequest
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 25
+# maximum number of follow ups to send per minute for each channel
+RATE_LIMITS = {"portal": 30, "email": 120, "fax": 15, "mail": 60}
+
+
+class FollowupRun:
+    """Tracks the progress of a follow up run in redis"""
+
+    prefix = "followup"
+    # how long to keep the counters and log for a run
+    run_timeout = 24 * 60 * 60
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self.redis = get_redis_connection("lock")
+
+    @classmethod
+    def start(cls):
+        """Start a new run"""
+        return cls(timezone.now().strftime("%Y%m%d%H%M%S"))
+
+    def _key(self, name):
+        """Build a redis key"""
+        return ":".join((self.prefix, self.run_id, name))
+
+    def add_pending(self, num):
+        """Add to the number of chunks which have been queued for this run"""
+        key = self._key("pending")
+        pipe = self.redis.pipeline()
+        pipe.incrby(key, num)
+        pipe.expire(key, self.run_timeout)
+        pipe.execute()
+
+    def finish_chunk(self):
+        """Mark one chunk as finished, returns True if it was the last one"""
+        return self.redis.decr(self._key("pending")) <= 0
+
+    def record(self, result, line):
+        """Record the result of following up on a request"""
+        pipe = self.redis.pipeline()
+        pipe.hincrby(self._key("counts"), result, 1)
+        pipe.rpush(self._key("log"), line)
+        pipe.expire(self._key("counts"), self.run_timeout)
+        pipe.expire(self._key("log"), self.run_timeout)
+        pipe.execute()
+
+    def get_counts(self):
+        """Get the number of follow ups for each result"""
+        return {
+            result.decode("utf8"): int(count)
+            for result, count in self.redis.hgetall(self._key("counts")).items()
+        }
+
+    def get_log(self):
+        """Get all of the log lines for this run"""
+        return [
+            line.decode("utf8") for line in self.redis.lrange(self._key("log"), 0, -1)
+        ]
+
+    def clear(self):
+        """Clear the counters and log for this run"""
+        self.redis.delete(self._key("pending"), self._key("counts"), self._key("log"))
+
+
+def get_channel(foia):
+    """Get how a follow up for this request will be sent"""
+    channel, _ = foia.get_contact_info()
+    # requests without any good contact info fall back to snail mail
+    return channel or "mail"
+
+
+def plan_chunks(foias):
+    """Group the requests by channel and split them into chunks
+
+    Yields the channel, the request IDs and how many seconds to wait before
+    sending each chunk, so that each channel stays under its rate limit
+    """
+    channels = defaultdict(list)
+    for foia in foias:
+        channels[get_channel(foia)].append(foia.pk)
+    for channel, pks in channels.items():
+        seconds_per_chunk = 60.0 * CHUNK_SIZE / RATE_LIMITS[channel]
+        for i in range(0, len(pks), CHUNK_SIZE):
+            yield channel, pks[i : i + CHUNK_SIZE], int(
+                (i // CHUNK_SIZE) * seconds_per_chunk
+            )
+
+
+def get_due_requests():
+    """Get the requests which are due for a follow up, with their contact info"""
+    return FOIARequest.objects.get_followup().select_related(
+        "portal", "email", "fax", "address"
+    )
+
+
+def send_followups(run, foia_pks, done):
+    """Send the follow ups for a chunk of requests
+
+    Requests which are no longer due, for example because they were already
+    followed up on by an earlier attempt at this chunk, are skipped.  The IDs of
+    the requests which have been handled are added to `done`, so that the rest
+    may be retried if the chunk runs out of time.
+    """
+    foias = get_due_requests().filter(pk__in=foia_pks).order_by("pk")
+    for foia in foias:
+        try:
+            channel = get_channel(foia)
+            foia.followup()
+            run.record(channel, "%s - %d - %s" % (foia.status, foia.pk, foia.title))
+        except MailgunAPIError as exc:
+            logger.error("Mailgun error during followups: %s", exc, exc_info=True)
+            run.record("error", "ERROR - %d - %s" % (foia.pk, exc))
+        done.add(foia.pk)
+
+
+def log_report(run):
+    """Log a summary of the run"""
+    counts = run.get_counts()
+    summary = ", ".join(
+        "%s: %d" % (result, count) for result, count in sorted(counts.items())
+    )
+    logger.info(
+        "Follow Ups: %d sent (%s)\n%s",
+        sum(count for result, count in counts.items() if result != "error"),
+        summary or "none",
+        "\n".join(run.get_log()),
+    )
+    run.clear()
@@ -0,0 +1,74 @@
+"""
+Rebuild and verify the index of who may view embargoed requests
+"""
+
+# Django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+# Standard Library
+import time
+
+# MuckRock
+from muckrock.foia.models import FOIARequest, FOIAVisibility
+
+
+class Command(BaseCommand):
+    """Rebuild the FOIA visibility index from scratch, and check it"""
+
+    help = (
+        "Recompute the index used to find the requests each user may view. It is "
+        "kept up to date as requests change, but should be rebuilt after bulk "
+        "updates which bypass model signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Check the index against the direct visibility query, "
+            "instead of rebuilding it",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=100,
+            help="The number of random users to check when verifying",
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["verify"]:
+            self.verify(kwargs["users"])
+        else:
+            start = time.monotonic()
+            count = FOIAVisibility.rebuild()
+            self.stdout.write(
+                "Rebuilt FOIA visibility with {} rows in {:.1f}s".format(
+                    count, time.monotonic() - start
+                )
+            )
+
+    def verify(self, num_users):
+        """Compare the index with the direct query for a sample of users"""
+        users = User.objects.filter(is_active=True, is_staff=False).order_by("?")
+        errors = 0
+        for user in users.select_related("profile")[:num_users]:
+            # non-embargoed requests are visible either way, so only compare
+            # the embargoed ones
+            foias = FOIARequest.objects.filter(embargo=True)
+            indexed = set(foias.get_viewable(user).values_list("pk", flat=True))
+            direct = set(foias.get_viewable_direct(user).values_list("pk", flat=True))
+            if indexed != direct:
+                errors += 1
+                self.stdout.write(
+                    "{}: missing {}, extra {}".format(
+                        user.username,
+                        sorted(direct - indexed),
+                        sorted(indexed - direct),
+                    )
+                )
+        self.stdout.write(
+            "Checked {} users, {} mismatched".format(
+                min(num_users, users.count()), errors
+            )
+        )
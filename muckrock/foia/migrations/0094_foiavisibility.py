@@ -0,0 +1,83 @@
+# Generated by Django 3.2.9 on 2022-01-14 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# the rows follow the rules in FOIAVisibility.get_rows
+POPULATE_SQL = """
+INSERT INTO foia_foiavisibility (foia_id, user_id)
+SELECT foia.id, composer.user_id
+FROM foia_foiarequest foia
+JOIN foia_foiacomposer composer ON composer.id = foia.composer_id
+WHERE foia.embargo
+UNION
+SELECT foia.id, foia.proxy_id
+FROM foia_foiarequest foia
+WHERE foia.embargo AND foia.proxy_id IS NOT NULL
+UNION
+SELECT collab.foiarequest_id, collab.user_id
+FROM foia_foiarequest_edit_collaborators collab
+JOIN foia_foiarequest foia ON foia.id = collab.foiarequest_id
+WHERE foia.embargo
+UNION
+SELECT collab.foiarequest_id, collab.user_id
+FROM foia_foiarequest_read_collaborators collab
+JOIN foia_foiarequest foia ON foia.id = collab.foiarequest_id
+WHERE foia.embargo;
+
+INSERT INTO foia_foiavisibility (foia_id, organization_id)
+SELECT foia.id, composer.organization_id
+FROM foia_foiarequest foia
+JOIN foia_foiacomposer composer ON composer.id = foia.composer_id
+JOIN accounts_profile profile ON profile.user_id = composer.user_id
+WHERE foia.embargo AND profile.org_share
+AND composer.organization_id IS NOT NULL;
+
+INSERT INTO foia_foiavisibility (foia_id, agency_id)
+SELECT foia.id, foia.agency_id
+FROM foia_foiarequest foia
+WHERE foia.embargo AND foia.agency_id IS NOT NULL;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0056_auto_20210325_1432'),
+        ('agency', '0030_merge_20210427_1152'),
+        ('organization', '0033_alter_entitlement_resources'),
+        ('foia', '0093_auto_20211202_1032'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FOIAVisibility',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('agency', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='agency.agency')),
+                ('foia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visibility', to='foia.foiarequest')),
+                ('organization', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='organization.organization')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'FOIA visibility',
+                'verbose_name_plural': 'FOIA visibility',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='foiavisibility',
+            index=models.Index(fields=['user', 'foia'], name='foia_foiavi_user_id_b07447_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='foiavisibility',
+            index=models.Index(fields=['organization', 'foia'], name='foia_foiavi_organiz_7abc0e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='foiavisibility',
+            index=models.Index(fields=['agency', 'foia'], name='foia_foiavi_agency__b75225_idx'),
+        ),
+        migrations.RunSQL(POPULATE_SQL, migrations.RunSQL.noop),
+    ]
@@ -11,3 +11,4 @@ from muckrock.foia.models.multirequest import *
 from muckrock.foia.models.request import *
 from muckrock.foia.models.search import *
 from muckrock.foia.models.templates import *
+from muckrock.foia.models.visibility import *
@@ -21,6 +21,7 @@ from django.utils import timezone
 from django.utils.text import slugify
 
 # Standard Library
+import logging
 from datetime import timedelta
 from itertools import zip_longest
 
@@ -35,6 +36,8 @@ from muckrock.foia.models.file import FOIAFile
 from muckrock.foia.querysets import FOIAComposerQuerySet
 from muckrock.tags.models import TaggedItemBase
 
+logger = logging.getLogger(__name__)
+
 STATUS = [("started", "Draft"), ("submitted", "Processing"), ("filed", "Filed")]
 
 
@@ -139,6 +142,41 @@ class FOIAComposer(models.Model):
         self.delayed_id = result.id
         self.save()
 
+    def create_foias(self, agency_pks, contact_info, no_proxy):
+        """Create the requests for the given agencies
+
+        Each request is created in its own transaction, and agencies which
+        already have a request from this composer are skipped, so this is safe
+        to retry
+        """
+        # pylint: disable=import-outside-toplevel
+        from muckrock.foia.models.request import FOIARequest
+        from muckrock.foia.querysets import RequestCreationContext
+
+        context = RequestCreationContext(self, no_proxy)
+        agencies = (
+            self.agencies.filter(pk__in=agency_pks)
+            .exclude(foiarequest__composer=self)
+            .select_related("jurisdiction__law", "jurisdiction__parent__law")
+        )
+        for agency in agencies.iterator():
+            logger.info("Creating the foia for agency (%s, %s)", agency.pk, agency.name)
+            with transaction.atomic():
+                FOIARequest.objects.create_new(
+                    self, agency, no_proxy, contact_info, context=context
+                )
+        created, total = self.get_progress()
+        if created >= total:
+            # mark all attachments as sent here, after all requests have been
+            # created
+            self.pending_attachments.filter(user=self.user, sent=False).update(
+                sent=True
+            )
+
+    def get_progress(self):
+        """How many of the requests have been created, out of the total"""
+        return self.foias.count(), self.agencies.count()
+
     def needs_moderation(self):
         """Check for moderated keywords"""
         for keyword in config.MODERATION_KEYWORDS.split("\n"):
@@ -5,7 +5,6 @@ Models for the FOIA application
 
 # Django
 from django.conf import settings
-from django.core.files.base import ContentFile
 from django.db import models, transaction
 
 # Standard Library
@@ -13,6 +12,7 @@ import logging
 import os
 
 # MuckRock
+from muckrock.core.storage import copy_file
 from muckrock.foia.querysets import FOIAFileQuerySet
 
 logger = logging.getLogger(__name__)
@@ -116,18 +116,17 @@ class FOIAFile(models.Model):
         self.pk = None
         self.comm = new_comm
         self.source = new_comm.get_source()
-        # make a copy of the file on the storage backend
-        try:
-            new_ffile = ContentFile(self.ffile.read())
-        except ValueError:
+        if not self.ffile:
             error_msg = (
                 "FOIAFile #%s has no data in its ffile field. "
                 "It has not been cloned."
             )
             logger.error(error_msg, original_id)
             return
-        new_ffile.name = self.name()
-        self.ffile = new_ffile
+        # make a copy of the file on the storage backend, without downloading it
+        self.ffile.name = copy_file(
+            self.ffile, self.ffile.field.generate_filename(self, self.name())
+        )
         self.save()
         transaction.on_commit(lambda: upload_document_cloud.delay(self.pk))
 
@@ -436,18 +436,12 @@ class FOIARequest(models.Model):
         Mark any existing notifications with the same message as read,
         to avoid notifying users with duplicated information.
         """
-        identical_notifications = (
-            Notification.objects.for_object(self)
-            .get_unread()
-            .filter(
-                action__actor_object_id=action.actor_object_id, action__verb=action.verb
-            )
-        )
-        for notification in identical_notifications:
-            notification.mark_read()
+        Notification.objects.for_object(self).get_unread().filter(
+            action__actor_object_id=action.actor_object_id, action__verb=action.verb
+        ).update(read=True)
         utils.notify(self.composer.user, action)
         if self.is_public():
-            utils.notify(followers(self), action)
+            utils.notify_followers(self, action)
 
     def submit(self, appeal=False, **kwargs):
         """
@@ -621,13 +615,14 @@ class FOIARequest(models.Model):
             "address": agency.get_addresses("appeal").first(),
         }
 
-    def process_attachments(self, user, composer=False):
+    def process_attachments(self, user, composer=False, attachments=None):
         """Attach all outbound attachments to the last communication"""
         if composer:
             attm_source = self.composer
         else:
             attm_source = self
-        attachments = attm_source.pending_attachments.filter(user=user, sent=False)
+        if attachments is None:
+            attachments = attm_source.pending_attachments.filter(user=user, sent=False)
         comm = self.communications.last()
         for attachment in attachments:
             file_ = comm.files.create(
@@ -1270,15 +1265,16 @@ class FOIARequest(models.Model):
         )
         return comm
 
-    def create_initial_communication(self, from_user, proxy):
+    def create_initial_communication(self, from_user, proxy, text=None):
         """Create the initial request communication"""
-        text = FOIATemplate.objects.render(
-            [self.agency],
-            from_user,
-            self.composer.requested_docs,
-            edited_boilerplate=self.composer.edited_boilerplate,
-            proxy=proxy,
-        )
+        if text is None:
+            text = FOIATemplate.objects.render(
+                [self.agency],
+                from_user,
+                self.composer.requested_docs,
+                edited_boilerplate=self.composer.edited_boilerplate,
+                proxy=proxy,
+            )
         comm = self.communications.create(
             from_user=from_user,
             to_user=self.get_to_user(),
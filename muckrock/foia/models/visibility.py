@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+A denormalized index of who may view embargoed FOIA requests
+"""
+
+# Django
+from django.db import models, transaction
+
+# MuckRock
+from muckrock.foia.models.request import FOIARequest
+
+
+class FOIAVisibility(models.Model):
+    """A principal who may view an embargoed request
+
+    Requests which are not embargoed are visible to everyone, so only embargoed
+    requests have rows here.  Each row names exactly one of a user (the owner,
+    the proxy or a collaborator), an organization (the owner's organization,
+    if they share requests with it) or an agency (whose users may view its
+    requests).  The rows are kept up to date by signals, and may be rebuilt
+    and checked with the rebuild_foia_visibility command.
+    """
+
+    foia = models.ForeignKey(
+        FOIARequest, related_name="visibility", on_delete=models.CASCADE
+    )
+    user = models.ForeignKey(
+        "auth.User",
+        related_name="+",
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+    )
+    organization = models.ForeignKey(
+        "organization.Organization",
+        related_name="+",
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+    )
+    agency = models.ForeignKey(
+        "agency.Agency",
+        related_name="+",
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+    )
+
+    # number of requests to rebuild at a time
+    chunk_size = 1000
+
+    def __str__(self):
+        principal = self.user or self.organization or self.agency
+        return "{} may view {}".format(principal, self.foia)
+
+    @classmethod
+    def get_rows(cls, foias):
+        """Build the rows for the given requests"""
+        rows = []
+        for foia in foias:
+            if not foia.embargo:
+                continue
+            user_ids = {foia.composer.user_id, foia.proxy_id}
+            user_ids.update(u.pk for u in foia.edit_collaborators.all())
+            user_ids.update(u.pk for u in foia.read_collaborators.all())
+            rows.extend(
+                cls(foia=foia, user_id=user_id)
+                for user_id in user_ids
+                if user_id is not None
+            )
+            organization_id = foia.composer.organization_id
+            if foia.composer.user.profile.org_share and organization_id is not None:
+                rows.append(cls(foia=foia, organization_id=organization_id))
+            if foia.agency_id is not None:
+                rows.append(cls(foia=foia, agency_id=foia.agency_id))
+        return rows
+
+    @classmethod
+    def update_requests(cls, foia_pks):
+        """Recompute the rows for the given requests"""
+        foia_pks = list(foia_pks)
+        for i in range(0, len(foia_pks), cls.chunk_size):
+            chunk = foia_pks[i : i + cls.chunk_size]
+            foias = (
+                FOIARequest.objects.filter(pk__in=chunk, embargo=True)
+                .select_related("composer__user__profile")
+                .prefetch_related("edit_collaborators", "read_collaborators")
+            )
+            with transaction.atomic():
+                cls.objects.filter(foia__in=chunk).delete()
+                cls.objects.bulk_create(cls.get_rows(foias))
+
+    @classmethod
+    def rebuild(cls):
+        """Rebuild the rows for every request"""
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.update_requests(
+                FOIARequest.objects.filter(embargo=True).values_list("pk", flat=True)
+            )
+        return cls.objects.count()
+
+    class Meta:
+        app_label = "foia"
+        verbose_name = "FOIA visibility"
+        verbose_name_plural = "FOIA visibility"
+        indexes = [
+            models.Index(fields=["user", "foia"]),
+            models.Index(fields=["organization", "foia"]),
+            models.Index(fields=["agency", "foia"]),
+        ]
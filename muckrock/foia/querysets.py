@@ -74,6 +74,69 @@ class PreloadFileQuerysetMixin:
             self._do_preload_files()
 
 
+class RequestCreationContext:
+    """Work shared between the requests created for a composer
+
+    Many of a multi-request's agencies share a jurisdiction, so the due date,
+    proxy and request text are only computed once per jurisdiction
+    """
+
+    def __init__(self, composer, no_proxy):
+        self.composer = composer
+        self.no_proxy = no_proxy
+        self.multiple = composer.agencies.count() > 1
+        self.tags = list(composer.tags.all())
+        self.attachments = list(
+            composer.pending_attachments.filter(user=composer.user, sent=False)
+        )
+        self._date_due = {}
+        self._proxy = {}
+        self._text = {}
+
+    def get_date_due(self, jurisdiction):
+        """The due date for a request in the jurisdiction"""
+        pk = jurisdiction.pk
+        if pk not in self._date_due:
+            if jurisdiction.days:
+                calendar = jurisdiction.get_calendar()
+                self._date_due[pk] = calendar.business_days_from(
+                    date.today(), jurisdiction.days
+                )
+            else:
+                self._date_due[pk] = None
+        return self._date_due[pk]
+
+    def get_proxy(self, agency):
+        """The proxy user, and whether one was needed but is missing"""
+        if self.no_proxy:
+            return None, False
+        # the proxy only depends on these, so share it between agencies
+        key = (agency.requires_proxy, agency.jurisdiction_id)
+        if key not in self._proxy:
+            proxy_info = agency.get_proxy_info()
+            proxy_user = proxy_info.get("from_user")
+            self._proxy[key] = (proxy_user, proxy_info["missing_proxy"])
+        return self._proxy[key]
+
+    def get_text(self, agency, proxy):
+        """The text of the initial communication for a request to the agency"""
+        # pylint: disable=import-outside-toplevel
+        from muckrock.foia.models import FOIATemplate
+
+        key = (agency.jurisdiction_id, proxy.pk if proxy else None)
+        if key not in self._text:
+            # render without an agency, leaving the agency name to fill in
+            self._text[key] = FOIATemplate.objects.render(
+                [],
+                self.composer.user,
+                self.composer.requested_docs,
+                edited_boilerplate=self.composer.edited_boilerplate,
+                proxy=proxy,
+                jurisdiction=agency.jurisdiction,
+            )
+        return self._text[key].replace("{ agency name }", agency.name)
+
+
 class FOIARequestQuerySet(models.QuerySet):
     """Object manager for FOIA requests"""
 
@@ -85,6 +148,32 @@ class FOIARequestQuerySet(models.QuerySet):
 
     def get_viewable(self, user):
         """Get all viewable FOIA requests for given user"""
+        # pylint: disable=import-outside-toplevel
+        from muckrock.foia.models import FOIAVisibility
+
+        if user.is_staff:
+            return self.all()
+
+        if user.is_authenticated:
+            # Requests are visible if they are not embargoed, or if the user
+            # may see them according to the visibility index - see
+            # get_viewable_direct for the rules the index follows
+            principals = Q(user=user) | Q(organization__in=user.organizations.all())
+            if user.profile.is_agency_user:
+                principals |= Q(agency=user.profile.agency)
+            visible = FOIAVisibility.objects.filter(principals).values("foia_id")
+            return self.exclude(deleted=True).filter(
+                Q(embargo=False) | Q(pk__in=visible)
+            )
+        else:
+            return self.get_viewable_direct(user)
+
+    def get_viewable_direct(self, user):
+        """Get all viewable FOIA requests for given user, without using the
+        visibility index
+
+        This is slow for authenticated users, and is used to verify the index
+        """
 
         if user.is_staff:
             return self.all()
@@ -213,29 +302,22 @@ class FOIARequestQuerySet(models.QuerySet):
         """Exclude requests made by org users"""
         return self.filter(composer__organization__individual=True)
 
-    def create_new(self, composer, agency, no_proxy, contact_info):
-        """Create a new request and submit it"""
-        # pylint: disable=import-outside-toplevel
+    def create_new(self, composer, agency, no_proxy, contact_info, context=None):
+        """Create a new request and submit it
+
+        Pass in a RequestCreationContext to share work between the requests
+        created for a multi-request
+        """
+        # pylint: disable=too-many-arguments, import-outside-toplevel
         from muckrock.foia.message import notify_proxy_user
 
-        if composer.agencies.count() > 1:
+        if context is None:
+            context = RequestCreationContext(composer, no_proxy)
+        if context.multiple:
             title = "%s (%s)" % (composer.title, agency.name)
         else:
             title = composer.title
-        if agency.jurisdiction.days:
-            calendar = agency.jurisdiction.get_calendar()
-            date_due = calendar.business_days_from(
-                date.today(), agency.jurisdiction.days
-            )
-        else:
-            date_due = None
-        if no_proxy:
-            proxy_user = None
-            missing_proxy = False
-        else:
-            proxy_info = agency.get_proxy_info()
-            proxy_user = proxy_info.get("from_user")
-            missing_proxy = proxy_info["missing_proxy"]
+        proxy_user, missing_proxy = context.get_proxy(agency)
         foia = self.create(
             status="submitted",
             title=title,
@@ -244,16 +326,21 @@ class FOIARequestQuerySet(models.QuerySet):
             embargo=composer.embargo,
             permanent_embargo=composer.permanent_embargo,
             composer=composer,
-            date_due=date_due,
+            date_due=context.get_date_due(agency.jurisdiction),
             proxy=proxy_user,
             missing_proxy=missing_proxy,
         )
-        foia.tags.set(composer.tags.all())
-        foia.create_initial_communication(composer.user, proxy=proxy_user)
+        foia.tags.set(context.tags)
+        foia.create_initial_communication(
+            composer.user, proxy=proxy_user, text=context.get_text(agency, proxy_user)
+        )
         if proxy_user:
             notify_proxy_user(foia)
-        foia.process_attachments(composer.user, composer=True)
+        foia.process_attachments(
+            composer.user, composer=True, attachments=context.attachments
+        )
         foia.set_address(agency, appeal=False, contact_info=contact_info, clear=False)
+        return foia
 
     def get_stale(self):
         """Get stale requests"""
@@ -141,8 +141,24 @@ class FOIANoteSerializer(serializers.ModelSerializer):
         exclude = ("id", "foia")
 
 
+def query_list(request, name):
+    """Get a comma separated list from a query parameter"""
+    return {
+        value.strip()
+        for value in request.query_params.get(name, "").split(",")
+        if value.strip()
+    }
+
+
 class FOIARequestSerializer(TaggitSerializer, serializers.ModelSerializer):
-    """Serializer for FOIA Request model"""
+    """Serializer for FOIA Request model
+
+    When reading, the connected models listed in `expandable_fields` are only
+    included if they are asked for with `?expand=`, and `?fields=` may limit the
+    representation to the given fields
+    """
+
+    expandable_fields = ("communications", "notes")
 
     username = serializers.StringRelatedField(source="composer.user")
     user = serializers.PrimaryKeyRelatedField(
@@ -177,18 +193,31 @@ class FOIARequestSerializer(TaggitSerializer, serializers.ModelSerializer):
             self.fields.pop("email", None)
             self.fields.pop("notes")
             return
+        if request.method in permissions.SAFE_METHODS:
+            self._set_read_fields(request)
         if not request.user.is_staff:
-            self.fields.pop("mail_id")
+            self.fields.pop("mail_id", None)
             self.fields.pop("email", None)
             if not foia:
-                self.fields.pop("notes")
+                self.fields.pop("notes", None)
             else:
                 has_change = foia.has_perm(request.user, "change")
                 if not has_change:
-                    self.fields.pop("notes")
+                    self.fields.pop("notes", None)
                 if request.method == "PATCH":
                     self._set_patch_fields(request.user, foia)
 
+    def _set_read_fields(self, request):
+        """Set which fields to include based on `?fields=` and `?expand=`"""
+        fields = query_list(request, "fields")
+        expand = query_list(request, "expand")
+        for field in list(self.fields.keys()):
+            if field in self.expandable_fields:
+                if field not in expand:
+                    self.fields.pop(field)
+            elif fields and field not in fields:
+                self.fields.pop(field)
+
     def _set_patch_fields(self, user, foia):
         """Set which fields the user may PATCH"""
         has_change = foia.has_perm(user, "change")
@@ -3,14 +3,21 @@
 # Django
 from django.conf import settings
 from django.db import transaction
-from django.db.models.signals import post_delete, pre_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 
 # Third Party
 from documentcloud import DocumentCloud
 
 # MuckRock
+from muckrock.accounts.models import Profile
 from muckrock.core.utils import clear_cloudfront_cache, get_s3_storage_bucket
-from muckrock.foia.models import FOIAFile, FOIARequest, OutboundRequestAttachment
+from muckrock.foia.models import (
+    FOIAComposer,
+    FOIAFile,
+    FOIARequest,
+    FOIAVisibility,
+    OutboundRequestAttachment,
+)
 from muckrock.foia.tasks import upload_document_cloud
 
 
@@ -26,6 +33,63 @@ def foia_update_embargo(sender, **kwargs):
             transaction.on_commit(lambda doc=doc: upload_document_cloud.delay(doc.pk))
 
 
+# fields which determine who may view a model's requests
+VISIBILITY_FIELDS = {
+    FOIARequest: ("embargo", "agency_id", "proxy_id", "composer_id"),
+    FOIAComposer: ("user_id", "organization_id"),
+    Profile: ("org_share",),
+}
+
+
+def visibility_pre_save(sender, instance, raw=False, **kwargs):
+    """Remember the fields which determine who may view the requests"""
+    # pylint: disable=unused-argument, protected-access
+    instance._visibility_old = None
+    if instance.pk is not None and not raw:
+        instance._visibility_old = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list(*VISIBILITY_FIELDS[sender])
+            .first()
+        )
+
+
+def visibility_post_save(sender, instance, created, raw=False, **kwargs):
+    """Update the visibility index if who may view the requests has changed"""
+    # pylint: disable=unused-argument, protected-access
+    if raw:
+        return
+    new = tuple(getattr(instance, field) for field in VISIBILITY_FIELDS[sender])
+    if not created and instance._visibility_old == new:
+        return
+    if sender is FOIARequest:
+        foias = FOIARequest.objects.filter(pk=instance.pk)
+    elif sender is FOIAComposer:
+        foias = instance.foias.all()
+    else:
+        foias = FOIARequest.objects.filter(composer__user_id=instance.user_id)
+    FOIAVisibility.update_requests(
+        foias.filter(embargo=True).values_list("pk", flat=True)
+    )
+
+
+def collaborators_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Update the visibility index when collaborators are added or removed"""
+    # pylint: disable=unused-argument, too-many-arguments
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        foia_pks = [instance.pk]
+    elif action == "post_clear":
+        # the cleared requests are no longer known, so update every request
+        # the user could see
+        foia_pks = FOIAVisibility.objects.filter(user=instance).values_list(
+            "foia_id", flat=True
+        )
+    else:
+        foia_pks = pk_set
+    FOIAVisibility.update_requests(foia_pks)
+
+
 def foia_file_delete_s3(sender, **kwargs):
     """Delete file from S3 after the model is deleted"""
     # pylint: disable=unused-argument
@@ -73,6 +137,34 @@ pre_save.connect(
     dispatch_uid="muckrock.foia.signals.embargo",
 )
 
+for model in VISIBILITY_FIELDS:
+    pre_save.connect(
+        visibility_pre_save,
+        sender=model,
+        dispatch_uid="muckrock.foia.signals.visibility_pre_save_{}".format(
+            model.__name__
+        ),
+    )
+    post_save.connect(
+        visibility_post_save,
+        sender=model,
+        dispatch_uid="muckrock.foia.signals.visibility_post_save_{}".format(
+            model.__name__
+        ),
+    )
+
+for through in (
+    FOIARequest.edit_collaborators.through,
+    FOIARequest.read_collaborators.through,
+):
+    m2m_changed.connect(
+        collaborators_changed,
+        sender=through,
+        dispatch_uid="muckrock.foia.signals.collaborators_changed_{}".format(
+            through.__name__
+        ),
+    )
+
 post_delete.connect(
     foia_file_delete_s3,
     sender=FOIAFile,
@@ -9,9 +9,8 @@ from celery.task import periodic_task, task
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.postgres.aggregates.general import StringAgg
-from django.core.files.storage import default_storage
 from django.core.mail.message import EmailMessage
-from django.db import transaction
+from django.db import DatabaseError, transaction
 from django.db.models import DurationField, F
 from django.db.models.functions import Cast, Now
 from django.template.loader import render_to_string
@@ -23,10 +22,12 @@ import csv
 import logging
 import os
 import os.path
-import re
+import shutil
 import sys
-from datetime import date, datetime, time
+from datetime import date
 from random import randint
+from tempfile import SpooledTemporaryFile
+from timeit import default_timer as timer
 
 # Third Party
 import boto3
@@ -35,7 +36,6 @@ import lob
 import numpy as np
 import requests
 from constance import config
-from django_mailgun import MailgunAPIError
 from documentcloud import DocumentCloud
 from documentcloud.exceptions import DocumentCloudError
 from phaxio import PhaxioApi
@@ -43,7 +43,7 @@ from phaxio.exceptions import PhaxioError
 from raven import Client
 from raven.contrib.celery import register_logger_signal, register_signal
 from scipy.sparse import hstack
-from zipstream import ZIP_DEFLATED, ZipFile
+from zipstream import ZIP_DEFLATED, ZIP_STORED, ZipFile
 
 # MuckRock
 from muckrock.communication.models import (
@@ -51,20 +51,28 @@ from muckrock.communication.models import (
     EmailCommunication,
     FaxCommunication,
     FaxError,
-    MailCommunication,
 )
 from muckrock.core.models import ExtractDay
 from muckrock.core.tasks import AsyncFileDownloadTask
-from muckrock.core.utils import read_in_chunks
-from muckrock.foia.exceptions import SizeError
+from muckrock.core.utils import read_ahead, read_in_chunks
+from muckrock.foia import followup
+from muckrock.foia.autoimport import (
+    AutoImportManifest,
+    import_scan,
+    list_scans,
+    send_report as send_autoimport_report,
+)
+from muckrock.foia.constants import COMPOSER_CHUNK_SIZE
 from muckrock.foia.models import (
     FOIACommunication,
     FOIAComposer,
     FOIAFile,
     FOIARequest,
     RawEmail,
+    TrackingNumber,
 )
 from muckrock.task.models import (
+    FlaggedTask,
     PaymentInfoTask,
     ResponseTask,
     ReviewAgencyTask,
@@ -218,24 +226,52 @@ def retry_stuck_documents():
     ignore_result=True, max_retries=10, name="muckrock.foia.tasks.composer_create_foias"
 )
 def composer_create_foias(composer_pk, contact_info, no_proxy, **kwargs):
-    """Create all the foias for a composer"""
+    """Create all the foias for a composer
+
+    Large multi-requests are split into chunks of agencies, which are created in
+    parallel
+    """
     # pylint: disable=unused-argument
     composer = FOIAComposer.objects.get(pk=composer_pk)
+    agency_pks = list(composer.agencies.order_by("pk").values_list("pk", flat=True))
     logger.info(
         "Starting composer_create_foias: (%s, %s, %s)",
         composer_pk,
         contact_info,
-        composer.agencies.count(),
+        len(agency_pks),
     )
-    with transaction.atomic():
-        for agency in composer.agencies.select_related(
-            "jurisdiction__law", "jurisdiction__parent__law"
-        ).iterator():
-            logger.info("Creating the foia for agency (%s, %s)", agency.pk, agency.name)
-            FOIARequest.objects.create_new(composer, agency, no_proxy, contact_info)
-        # mark all attachments as sent here, after all requests have been sent
-        composer.pending_attachments.filter(user=composer.user, sent=False).update(
-            sent=True
+    if len(agency_pks) <= COMPOSER_CHUNK_SIZE:
+        composer.create_foias(agency_pks, contact_info, no_proxy)
+        return
+    for i in range(0, len(agency_pks), COMPOSER_CHUNK_SIZE):
+        composer_create_foias_chunk.delay(
+            composer_pk,
+            agency_pks[i : i + COMPOSER_CHUNK_SIZE],
+            contact_info,
+            no_proxy,
+        )
+
+
+@task(
+    ignore_result=True,
+    max_retries=10,
+    name="muckrock.foia.tasks.composer_create_foias_chunk",
+)
+def composer_create_foias_chunk(
+    composer_pk, agency_pks, contact_info, no_proxy, **kwargs
+):
+    """Create the foias for a chunk of a composer's agencies"""
+    # pylint: disable=unused-argument
+    composer = FOIAComposer.objects.get(pk=composer_pk)
+    try:
+        composer.create_foias(agency_pks, contact_info, no_proxy)
+    except DatabaseError as exc:
+        # the requests which were created are skipped when retrying
+        composer_create_foias_chunk.retry(
+            countdown=60,
+            args=[composer_pk, agency_pks, contact_info, no_proxy],
+            kwargs=kwargs,
+            exc=exc,
         )
 
 
@@ -263,6 +299,39 @@ def composer_delayed_submit(composer_pk, approve, contact_info, **kwargs):
     composer.delayed_id = ""
     composer.save()
     logger.info("Saved the composer")
+    created, total = composer.get_progress()
+    retries = composer_delayed_submit.request.retries
+    if created < total and retries < composer_delayed_submit.max_retries:
+        # the requests for a large multi-request may still be being created
+        logger.info("Only %s of %s requests created, retrying", created, total)
+        composer_delayed_submit.retry(
+            countdown=300,
+            args=[composer_pk, approve, contact_info],
+            kwargs=kwargs,
+        )
+    elif created < total:
+        # give up waiting, submit the requests which were created and flag the
+        # agencies which are missing one for staff to file by hand
+        missing = composer.agencies.exclude(foiarequest__composer=composer).order_by(
+            "name"
+        )
+        logger.error(
+            "Only %s of %s requests created for composer %s, submitting anyway",
+            created,
+            total,
+            composer_pk,
+        )
+        FlaggedTask.objects.create(
+            user=composer.user,
+            text="Requests could not be created for {} of the {} agencies on "
+            "multirequest {} (#{}): {}".format(
+                total - created,
+                total,
+                composer.title,
+                composer.pk,
+                ", ".join("{} (#{})".format(a.name, a.pk) for a in missing),
+            ),
+        )
     if approve:
         logger.info("Approving")
         composer.approved(contact_info)
@@ -437,31 +506,53 @@ def send_fax(comm_id, subject, body, error_count, **kwargs):
     name="muckrock.foia.tasks.followup_requests",
 )
 def followup_requests():
-    """Follow up on any requests that need following up on"""
-    log = []
+    """Queue follow ups for any requests that need following up on"""
     # weekday returns 5 for sat and 6 for sun
     is_weekday = date.today().weekday() < 5
     if config.ENABLE_FOLLOWUP and (config.ENABLE_WEEKEND_FOLLOWUP or is_weekday):
-        try:
-            num_requests = FOIARequest.objects.get_followup().count()
-            for foia in FOIARequest.objects.get_followup():
-                try:
-                    foia.followup()
-                    log.append("%s - %d - %s" % (foia.status, foia.pk, foia.title))
-                except MailgunAPIError as exc:
-                    logger.error(
-                        "Mailgun error during followups: %s",
-                        exc,
-                        exc_info=sys.exc_info(),
-                    )
-        except SoftTimeLimitExceeded:
-            logger.warning(
-                "Follow ups did not complete in time. " "Completed %d out of %d",
-                num_requests - FOIARequest.objects.get_followup().count(),
-                num_requests,
+        run = followup.FollowupRun.start()
+        chunks = list(followup.plan_chunks(followup.get_due_requests()))
+        if not chunks:
+            logger.info("Follow Ups: none due")
+            return
+        run.add_pending(len(chunks))
+        for _, foia_pks, countdown in chunks:
+            followup_request_chunk.apply_async(
+                args=(run.run_id, foia_pks), countdown=countdown
             )
+        logger.info(
+            "Follow Ups: queued %d requests in %d chunks",
+            sum(len(foia_pks) for _, foia_pks, _ in chunks),
+            len(chunks),
+        )
 
-        logger.info("Follow Ups:\n%s", "\n".join(log))
+
+@task(
+    ignore_result=True,
+    time_limit=10 * 60,
+    soft_time_limit=570,
+    name="muckrock.foia.tasks.followup_request_chunk",
+)
+def followup_request_chunk(run_id, foia_pks):
+    """Send the follow ups for a chunk of requests"""
+    run = followup.FollowupRun(run_id)
+    done = set()
+    try:
+        followup.send_followups(run, foia_pks, done)
+    except SoftTimeLimitExceeded:
+        remaining = [pk for pk in foia_pks if pk not in done]
+        logger.warning(
+            "Follow up chunk did not complete in time, "
+            "requeueing %d out of %d requests",
+            len(remaining),
+            len(foia_pks),
+        )
+        # queue the rest before marking this chunk finished,
+        # so that the run is not reported as done early
+        run.add_pending(1)
+        followup_request_chunk.delay(run_id, remaining)
+    if run.finish_chunk():
+        followup.log_report(run)
 
 
 @periodic_task(
@@ -506,216 +597,58 @@ def embargo_expire():
         ).send(fail_silently=False)
 
 
-# Increase the time limit for autoimport to 10 hours, and a soft time limit to
-# 5 minutes before that
 @periodic_task(
     run_every=crontab(hour=2, minute=0),
     name="muckrock.foia.tasks.autoimport",
-    time_limit=36000,
-    soft_time_limit=35700,
+    time_limit=600,
+    soft_time_limit=570,
 )
 def autoimport():
-    """Auto import documents from S3"""
-    # pylint: disable=broad-except
-    # pylint: disable=too-many-locals
-    # pylint: disable=too-many-branches
-    # pylint: disable=too-many-statements
-    p_name = re.compile(
-        r"(?P<month>\d\d?)-(?P<day>\d\d?)-(?P<year>\d\d) "
-        r"(?P<docs>(?:mr\d+(?: |$))+)",
-        re.I,
-    )
+    """Auto import documents from S3
 
-    def s3_copy(bucket, key_or_pre, dest_name):
-        """Copy an s3 key or prefix"""
-        if key_or_pre.endswith("/"):
-            for obj in bucket.objects.filter(Prefix=key_or_pre):
-                if obj.key == key_or_pre:
-                    bucket.Object(dest_name).copy_from(
-                        CopySource={"Bucket": bucket.name, "Key": obj.key}
-                    )
-                    continue
-                s3_copy(
-                    bucket,
-                    obj.key,
-                    "%s/%s" % (dest_name, os.path.basename(os.path.normpath(obj.key))),
-                )
-        else:
-            bucket.Object(dest_name).copy_from(
-                CopySource={"Bucket": bucket.name, "Key": key_or_pre}
-            )
-
-    def s3_delete(bucket, key_or_pre):
-        """Delete an s3 key or prefix"""
-        if key_or_pre.endswith("/"):
-            for obj in bucket.objects.filter(Prefix=key_or_pre):
-                if obj.key == key_or_pre:
-                    obj.delete()
-                    continue
-                s3_delete(bucket, obj.key)
-        else:
-            bucket.Object(key_or_pre).delete()
-
-    def parse_name(name):
-        """Parse a file name"""
-        # strip off trailing / and file extension
-        name = os.path.normpath(name)
-        name = os.path.splitext(name)[0]
-
-        m_name = p_name.match(name)
-        if not m_name:
-            raise ValueError("ERROR: %s does not match the file name format" % name)
-        foia_pks = [pk[2:] for pk in m_name.group("docs").split()]
-        file_datetime = datetime.combine(
-            datetime(
-                int(m_name.group("year")) + 2000,
-                int(m_name.group("month")),
-                int(m_name.group("day")),
-            ),
-            time(tzinfo=timezone.get_current_timezone()),
-        )
-
-        return foia_pks, file_datetime
-
-    @transaction.atomic
-    def import_key(key, bucket, storage_bucket, comm, log):
-        """Import a key"""
-        foia = comm.foia
-        file_name = os.path.split(key)[1]
-
-        # first parameter is instance, but we do not have one yet
-        # luckily, it is only used if the upload_to for the field is
-        # a callable, which it is not, so it is safe to pass in None
-        full_file_name = FOIAFile.ffile.field.generate_filename(None, file_name)
-        full_file_name = default_storage.get_available_name(full_file_name)
-
-        new_obj = storage_bucket.Object(full_file_name)
-        new_obj.copy_from(
-            CopySource={"Bucket": bucket.name, "Key": key}, ACL=settings.AWS_DEFAULT_ACL
-        )
-
-        foia_file = comm.attach_file(path=full_file_name, name=file_name, now=False)
-
-        oldfile = bucket.Object(key)
-        if oldfile.content_length != foia_file.ffile.size:
-            raise SizeError(key.size, foia_file.ffile.size, foia_file)
-
-        log.append(
-            "SUCCESS: %s uploaded to FOIA Request %s with a status of %s"
-            % (file_name, foia.pk, foia.status)
-        )
-
-    def import_prefix(prefix, bucket, storage_bucket, comm, log):
-        """Import a prefix (folder) full of documents"""
-        for obj in bucket.objects.filter(Prefix=prefix):
-            if obj.key == prefix:
-                continue
-            if obj.key.endswith("/"):
-                log.append(
-                    "ERROR: nested directories not allowed: %s in %s"
-                    % (obj.key, prefix)
-                )
-                continue
-            try:
-                import_key(obj.key, bucket, storage_bucket, comm, log)
-            except SizeError as exc:
-                s3_copy(
-                    bucket,
-                    obj.key,
-                    "review/%s" % obj.key.replace(settings.AWS_AUTOIMPORT_PATH, ""),
-                )
-                exc.args[2].delete()  # delete the foia file
-                comm.delete()
-                log.append(
-                    "ERROR: %s was %s bytes and after uploaded was %s bytes - retry"
-                    % (
-                        obj.key.replace(settings.AWS_AUTOIMPORT_PATH, ""),
-                        exc.args[0],
-                        exc.args[1],
-                    )
-                )
-
-    def process(log):
-        """Process the files"""
-        log.append("Start Time: %s" % timezone.now())
-        s3 = boto3.resource("s3")
-        bucket = s3.Bucket(settings.AWS_AUTOIMPORT_BUCKET_NAME)
-        storage_bucket = s3.Bucket(settings.AWS_MEDIA_BUCKET_NAME)
-        for obj in bucket.objects.filter(Prefix=settings.AWS_AUTOIMPORT_PATH):
-            if obj.key == settings.AWS_AUTOIMPORT_PATH:
-                continue
-            # strip off 'scans/'
-            file_name = obj.key.replace(settings.AWS_AUTOIMPORT_PATH, "")
-
-            try:
-                foia_pks, file_datetime = parse_name(file_name)
-            except ValueError as exc:
-                s3_copy(bucket, obj.key, "review/%s" % file_name)
-                s3_delete(bucket, obj.key)
-                log.append(str(exc))
-                continue
-
-            for foia_pk in foia_pks:
-                try:
-                    foia = FOIARequest.objects.get(pk=foia_pk)
-                    from_user = foia.agency.get_user() if foia.agency else None
-
-                    comm = FOIACommunication.objects.create(
-                        foia=foia,
-                        from_user=from_user,
-                        to_user=foia.user,
-                        response=True,
-                        datetime=file_datetime,
-                        communication="",
-                        hidden=True,
-                    )
-                    comm.responsetask_set.create(scan=True)
-                    MailCommunication.objects.create(
-                        communication=comm, sent_datetime=file_datetime
-                    )
-
-                    if obj.key.endswith("/"):
-                        import_prefix(obj.key, bucket, storage_bucket, comm, log)
-                    else:
-                        import_key(obj.key, bucket, storage_bucket, comm, log)
+    This lists the scans waiting to be imported and queues a task to import each
+    one.  Scans still claimed by a previous unfinished run are left alone.
+    """
+    manifest = AutoImportManifest.start()
+    manifest.log("Start Time: %s" % timezone.now())
+    s3 = boto3.resource("s3")
+    bucket = s3.Bucket(settings.AWS_AUTOIMPORT_BUCKET_NAME)
+    scans = [(key, etag) for key, etag in list_scans(bucket) if manifest.claim(key)]
+    manifest.log("Importing %d scans" % len(scans))
+    if not scans:
+        send_autoimport_report(manifest)
+        return
+    # set the pending count before queueing any tasks so the last task
+    # to finish knows to send the report
+    manifest.set_pending(len(scans))
+    for key, etag in scans:
+        autoimport_scan.delay(manifest.run_id, key, etag)
 
-                except FOIARequest.DoesNotExist:
-                    s3_copy(bucket, obj.key, "review/%s" % file_name)
-                    log.append(
-                        "ERROR: %s references FOIA Request %s, but it does not exist"
-                        % (file_name, foia_pk)
-                    )
-                except SoftTimeLimitExceeded:
-                    # if we reach the soft time limit,
-                    # re-raise so we can catch and clean up
-                    raise
-                except Exception as exc:
-                    s3_copy(bucket, obj.key, "review/%s" % file_name)
-                    log.append(
-                        "ERROR: %s has caused an unknown error. %s" % (file_name, exc)
-                    )
-                    logger.error("Autoimport error: %s", exc, exc_info=sys.exc_info())
-            # delete key after processing all requests for it
-            s3_delete(bucket, obj.key)
-        log.append("End Time: %s" % timezone.now())
 
+@task(
+    ignore_result=True,
+    time_limit=1800,
+    soft_time_limit=1740,
+    name="muckrock.foia.tasks.autoimport_scan",
+)
+def autoimport_scan(run_id, key, etag):
+    """Import a single scan from S3"""
+    manifest = AutoImportManifest(run_id)
+    s3 = boto3.resource("s3")
+    bucket = s3.Bucket(settings.AWS_AUTOIMPORT_BUCKET_NAME)
+    storage_bucket = s3.Bucket(settings.AWS_MEDIA_BUCKET_NAME)
     try:
-        log = []
-        process(log)
+        import_scan(key, etag, bucket, storage_bucket, manifest)
     except SoftTimeLimitExceeded:
-        log.append(
-            "ERROR: Time limit exceeded, please check folder for "
-            "undeleted uploads.  How big of a file did you put in there?"
+        manifest.log(
+            "ERROR: Time limit exceeded importing %s, it will be resumed on the "
+            "next run.  How big of a file did you put in there?"
+            % key.replace(settings.AWS_AUTOIMPORT_PATH, "")
         )
-        log.append("End Time: %s" % timezone.now())
     finally:
-        EmailMessage(
-            subject="[AUTOIMPORT] %s Logs" % timezone.now(),
-            body="\n".join(log),
-            from_email=settings.SCANS_EMAIL,
-            to=[settings.SCANS_SLACK_EMAIL],
-            bcc=[settings.DIAGNOSTIC_EMAIL],
-        ).send(fail_silently=False)
+        manifest.release(key)
+        if manifest.finish_scan():
+            send_autoimport_report(manifest)
 
 
 class ExportCsv(AsyncFileDownloadTask):
@@ -757,15 +690,22 @@ class ExportCsv(AsyncFileDownloadTask):
         (lambda f: f.datetime_done, "Date Done"),
     )
 
+    # number of requests to load at a time
+    chunk_size = 1000
+
     def __init__(self, user_pk, foia_pks):
         super(ExportCsv, self).__init__(
             user_pk, "".join(str(pk) for pk in foia_pks[:100])
         )
         if self.user.is_staff:
             self.fields += ((lambda f: f.get_request_email(), "Request Email"),)
+        self.foia_pks = foia_pks
+        # every field used in self.fields must be loaded here, or it will cause
+        # an extra query per row
         self.foias = (
-            FOIARequest.objects.filter(pk__in=foia_pks)
-            .select_related("composer__user", "agency__jurisdiction__parent")
+            FOIARequest.objects.select_related(
+                "composer__user", "agency__jurisdiction__parent"
+            )
             .only(
                 "composer__user__username",
                 "title",
@@ -774,6 +714,7 @@ class ExportCsv(AsyncFileDownloadTask):
                 "agency__jurisdiction__name",
                 "agency__jurisdiction__slug",
                 "agency__jurisdiction__id",
+                "agency__jurisdiction__level",
                 "agency__jurisdiction__parent__name",
                 "agency__jurisdiction__parent__id",
                 "agency__name",
@@ -782,6 +723,11 @@ class ExportCsv(AsyncFileDownloadTask):
                 "date_estimate",
                 "embargo",
                 "composer__requested_docs",
+                "composer__datetime_submitted",
+                "price",
+                "date_due",
+                "datetime_done",
+                "mail_id",
             )
             .annotate(
                 days_since_submitted=ExtractDay(
@@ -795,12 +741,35 @@ class ExportCsv(AsyncFileDownloadTask):
             )
         )
 
+    def get_tracking_ids(self, foia_pks):
+        """Get the current tracking ID for each request, keyed by the request's pk"""
+        return dict(
+            TrackingNumber.objects.filter(foia__in=foia_pks)
+            .order_by("foia_id", "-datetime")
+            .distinct("foia_id")
+            .values_list("foia_id", "tracking_id")
+        )
+
     def generate_file(self, out_file):
-        """Export selected foia requests as a CSV file"""
+        """Export selected foia requests as a CSV file
+
+        Requests are loaded in chunks, with a constant number of queries per chunk,
+        and written out in the order they were selected in
+        """
+        # pylint: disable=protected-access
         writer = csv.writer(out_file)
         writer.writerow(f[1] for f in self.fields)
-        for foia in self.foias.iterator():
-            writer.writerow(f[0](foia) for f in self.fields)
+        for i in range(0, len(self.foia_pks), self.chunk_size):
+            foia_pks = self.foia_pks[i : i + self.chunk_size]
+            foias = self.foias.filter(pk__in=foia_pks).in_bulk()
+            tracking_ids = self.get_tracking_ids(foia_pks)
+            for foia_pk in foia_pks:
+                foia = foias.get(foia_pk)
+                if foia is None:
+                    continue
+                # pre-populate the cache used by current_tracking_id
+                foia._tracking_id = tracking_ids.get(foia_pk, "")
+                writer.writerow(f[0](foia) for f in self.fields)
 
 
 @task(ignore_result=True, time_limit=1800, name="muckrock.foia.tasks.export_csv")
@@ -819,6 +788,29 @@ class ZipRequest(AsyncFileDownloadTask):
     subject = "Your zip archive of your request"
     mode = "wb"
 
+    # file types which are already compressed, and are stored instead of deflated
+    compressed_extensions = {
+        ".pdf",
+        ".jpg",
+        ".jpeg",
+        ".png",
+        ".gif",
+        ".zip",
+        ".gz",
+        ".docx",
+        ".xlsx",
+        ".pptx",
+        ".mp3",
+        ".mp4",
+        ".m4a",
+        ".mov",
+    }
+    # number of files to download ahead of the one being compressed
+    read_ahead = 4
+    # files larger than this are buffered on disk instead of in memory
+    max_memory_size = 5 * 1024 * 1024
+    chunk_size = 5 * 1024 * 1024
+
     def __init__(self, user_pk, foia_pk):
         super(ZipRequest, self).__init__(user_pk, foia_pk)
         self.foia = FOIARequest.objects.get(pk=foia_pk)
@@ -829,21 +821,77 @@ class ZipRequest(AsyncFileDownloadTask):
         context.update({"foia": self.foia.title})
         return context
 
+    def download(self, ffile):
+        """Download a file to a temporary file"""
+        temp_file = SpooledTemporaryFile(max_size=self.max_memory_size)
+        with ffile.ffile.storage.open(ffile.ffile.name, "rb") as in_file:
+            shutil.copyfileobj(in_file, temp_file, self.chunk_size)
+        temp_file.seek(0)
+        return temp_file
+
+    def get_compress_type(self, ffile):
+        """Do not waste time compressing files which are already compressed"""
+        _, ext = os.path.splitext(ffile.ffile.name)
+        if ext.lower() in self.compressed_extensions:
+            return ZIP_STORED
+        return ZIP_DEFLATED
+
     def generate_file(self, out_file):
-        """Zip all of the communications and files"""
+        """Zip all of the communications and files
+
+        Files are downloaded in the background while earlier files are being
+        compressed and written out
+        """
+        start = timer()
+        comms = list(self.foia.communications.prefetch_related("files"))
+        files = read_ahead(
+            [ffile for comm in comms for ffile in comm.files.all()],
+            self.download,
+            self.read_ahead,
+        )
+
+        def file_data(ffile):
+            """Get the data for the next file, which must be `ffile`"""
+            next_file, temp_file = next(files)
+            try:
+                if next_file is not ffile:
+                    raise RuntimeError("Files must be zipped in order")
+                yield from read_in_chunks(temp_file, size=self.chunk_size)
+            finally:
+                # remove the file from disk if it was too large for memory
+                temp_file.close()
+
+        num_files = 0
         with ZipFile(mode="w", compression=ZIP_DEFLATED, allowZip64=True) as zip_file:
-            for i, comm in enumerate(self.foia.communications.all()):
+            for i, comm in enumerate(comms):
                 file_name = "{:03d}_{}_comm.txt".format(i, comm.datetime)
                 zip_file.writestr(file_name, comm.communication.encode("utf8"))
                 for ffile in comm.files.all():
+                    # the zip file consumes these iterators in the order they
+                    # are added, which matches the order the files are read
                     zip_file.write_iter(
                         ffile.name(),
-                        # read in 5MB chunks at a time
-                        read_in_chunks(ffile.ffile, size=5 * 1024 * 1024),
+                        file_data(ffile),
+                        compress_type=self.get_compress_type(ffile),
                     )
+                    num_files += 1
+            size = 0
             for data in zip_file:
+                size += len(data)
                 out_file.write(data)
 
+        elapsed = timer() - start
+        logger.info(
+            "Zipped request %d: %d communications, %d files, %d bytes in %.1fs "
+            "(%.2f MB/s)",
+            self.foia.pk,
+            len(comms),
+            num_files,
+            size,
+            elapsed,
+            size / (1024 * 1024) / elapsed if elapsed else 0,
+        )
+
 
 @task(ignore_result=True, time_limit=1800, name="muckrock.foia.tasks.zip_request")
 def zip_request(foia_pk, user_pk):
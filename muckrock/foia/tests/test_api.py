@@ -4,7 +4,9 @@ Test the FOIA API viewset
 
 # Django
 from django.conf import settings
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 # Standard Library
@@ -24,7 +26,11 @@ from muckrock.core.factories import (
     UserFactory,
 )
 from muckrock.core.test_utils import mock_squarelet
-from muckrock.foia.factories import FOIATemplateFactory
+from muckrock.foia.factories import (
+    FOIACommunicationFactory,
+    FOIARequestFactory,
+    FOIATemplateFactory,
+)
 from muckrock.foia.models import FOIAComposer
 
 
@@ -264,3 +270,63 @@ class TestFOIAViewsetCreate(TestCase):
             code=402,
             status="Out of requests.  FOI Request has been saved.",
         )
+
+
+class TestFOIAViewsetList(TestCase):
+    """Unit Tests for listing FOIAs through the API"""
+
+    def setUp(self):
+        self.foia = FOIARequestFactory(title="Listed")
+        FOIACommunicationFactory.create_batch(2, foia=self.foia)
+
+    def test_compact(self):
+        """Communications and notes are left out unless expanded"""
+        response = self.client.get(reverse("api-foia-list"))
+        eq_(response.status_code, 200)
+        result = response.json()["results"][0]
+        eq_(result["title"], "Listed")
+        ok_("communications" not in result)
+        ok_("notes" not in result)
+
+    def test_expand(self):
+        """Communications are included when expanded"""
+        response = self.client.get(
+            reverse("api-foia-list"), {"expand": "communications"}
+        )
+        eq_(response.status_code, 200)
+        eq_(len(response.json()["results"][0]["communications"]), 2)
+
+    def test_fields(self):
+        """Only the requested fields are included"""
+        response = self.client.get(reverse("api-foia-list"), {"fields": "id,title"})
+        eq_(response.status_code, 200)
+        eq_(response.json()["results"][0], {"id": self.foia.pk, "title": "Listed"})
+
+    def test_fields_queries(self):
+        """Metadata only listings do not prefetch the connected models"""
+        FOIARequestFactory.create_batch(3)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("api-foia-list"), {"fields": "id,title,status"})
+        ok_(not any("foia_foiacommunication" in q["sql"] for q in queries))
+
+    def test_cursor_ordering(self):
+        """Cursor pagination follows the ordering filter"""
+        FOIARequestFactory(title="Another")
+        FOIARequestFactory(title="Zebra")
+        response = self.client.get(
+            reverse("api-foia-list"),
+            {"pagination": "cursor", "page_size": 2, "ordering": "-title"},
+        )
+        eq_(response.status_code, 200)
+        titles = [r["title"] for r in response.json()["results"]]
+        while response.json()["next"]:
+            response = self.client.get(response.json()["next"])
+            titles.extend(r["title"] for r in response.json()["results"])
+        eq_(titles, ["Zebra", "Listed", "Another"])
+
+    def test_cursor_ordering_related(self):
+        """Cursor pagination may not be ordered by a related field"""
+        response = self.client.get(
+            reverse("api-foia-list"), {"pagination": "cursor", "ordering": "agency"}
+        )
+        eq_(response.status_code, 400)
@@ -0,0 +1,181 @@
+"""
+Tests for automatically importing scans
+"""
+
+# Django
+from django.test import SimpleTestCase, TestCase
+
+# Standard Library
+from collections import defaultdict
+
+# Third Party
+from mock import Mock, patch
+from nose.tools import eq_, ok_, raises
+
+# MuckRock
+from muckrock.foia.autoimport import (
+    AutoImportManifest,
+    import_scan,
+    parse_name,
+    scan_id,
+)
+from muckrock.foia.factories import FOIARequestFactory
+from muckrock.foia.tasks import autoimport, autoimport_scan
+
+
+class FakeRedis:
+    """Just enough of a redis connection to track an autoimport run"""
+
+    # pylint: disable=unused-argument
+
+    def __init__(self):
+        self.values = {}
+        self.sets = defaultdict(set)
+        self.lists = defaultdict(list)
+
+    def pipeline(self):
+        """Commands are run right away instead of in a pipeline"""
+        return self
+
+    def execute(self):
+        """Nothing to do, the commands have already run"""
+
+    def expire(self, key, timeout):
+        """Keys do not expire"""
+
+    def set(self, key, value, nx=False, ex=None):
+        """Set a value, unless it is already set and nx is given"""
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def delete(self, *keys):
+        """Delete keys"""
+        for key in keys:
+            self.values.pop(key, None)
+            self.sets.pop(key, None)
+            self.lists.pop(key, None)
+
+    def decr(self, key):
+        """Decrement a counter"""
+        self.values[key] = int(self.values.get(key, 0)) - 1
+        return self.values[key]
+
+    def sadd(self, key, *values):
+        """Add to a set"""
+        self.sets[key].update(str(v) for v in values)
+
+    def sismember(self, key, value):
+        """Check if a value is in a set"""
+        return str(value) in self.sets[key]
+
+    def rpush(self, key, *values):
+        """Append to a list"""
+        self.lists[key].extend(v.encode("utf8") for v in values)
+
+    def lrange(self, key, start, end):
+        """Get a list, which is always read in full here"""
+        return self.lists[key]
+
+
+class TestAutoImportHelpers(SimpleTestCase):
+    """Test the helpers for parsing and identifying scans"""
+
+    def test_parse_name(self):
+        """File names should give the requests and date of the scan"""
+        foia_pks, file_datetime = parse_name("3-14-21 MR123 MR456.pdf")
+        eq_(foia_pks, ["123", "456"])
+        eq_(
+            (file_datetime.year, file_datetime.month, file_datetime.day),
+            (2021, 3, 14),
+        )
+
+    def test_parse_folder_name(self):
+        """Folder names should parse the same as file names"""
+        foia_pks, _ = parse_name("12-1-20 MR789/")
+        eq_(foia_pks, ["789"])
+
+    @raises(ValueError)
+    def test_parse_bad_name(self):
+        """Badly formatted names should raise an error"""
+        parse_name("scan of request 123.pdf")
+
+    def test_scan_id(self):
+        """The scan ID should depend on the contents, not the order"""
+        objects = [("scans/a/1.pdf", '"abc"'), ("scans/a/2.pdf", '"def"')]
+        eq_(scan_id(objects), scan_id(list(reversed(objects))))
+        ok_(scan_id(objects) != scan_id([("scans/a/1.pdf", '"xyz"')]))
+
+
+class TestAutoImportManifest(TestCase):
+    """Test tracking autoimport runs, so interrupted runs may be resumed"""
+
+    def setUp(self):
+        # each test gets a fresh redis
+        self.redis = FakeRedis()
+        patcher = patch(
+            "muckrock.foia.autoimport.get_redis_connection",
+            Mock(return_value=self.redis),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("muckrock.foia.tasks.send_autoimport_report")
+    @patch("muckrock.foia.tasks.autoimport_scan.delay")
+    @patch("muckrock.foia.tasks.boto3", Mock())
+    @patch("muckrock.foia.tasks.list_scans")
+    def test_claimed_scan(self, mock_list_scans, mock_delay, mock_report):
+        """Scans claimed by an unfinished run are skipped"""
+        mock_list_scans.return_value = [
+            ("scans/3-14-21 MR1.pdf", '"abc"'),
+            ("scans/3-14-21 MR2.pdf", '"def"'),
+        ]
+        ok_(AutoImportManifest("earlier").claim("scans/3-14-21 MR1.pdf"))
+        autoimport()
+        run_id = mock_delay.call_args[0][0]
+        mock_delay.assert_called_once_with(run_id, "scans/3-14-21 MR2.pdf", '"def"')
+        eq_(self.redis.values["autoimport:{}:pending".format(run_id)], 1)
+        mock_report.assert_not_called()
+
+    @patch("muckrock.foia.autoimport.import_key")
+    def test_done_scan(self, mock_import_key):
+        """Scans are not imported again into requests they were imported into"""
+        done_foia, foia = FOIARequestFactory.create_batch(2)
+        done_count = done_foia.communications.count()
+        count = foia.communications.count()
+        key = "scans/3-14-21 MR{} MR{}.pdf".format(done_foia.pk, foia.pk)
+        manifest = AutoImportManifest("run")
+        # a previous run imported the scan into the first request, then stopped
+        manifest.mark_done(scan_id([(key, '"abc"')]), done_foia.pk)
+        import_scan(key, '"abc"', Mock(), Mock(), manifest)
+        eq_(done_foia.communications.count(), done_count)
+        eq_(foia.communications.count(), count + 1)
+        mock_import_key.assert_called_once()
+        ok_(manifest.is_done(scan_id([(key, '"abc"')]), foia.pk))
+        ok_(any(line.startswith("SKIPPED") for line in manifest.get_log()))
+
+        # a new version of the scan is imported again
+        mock_import_key.reset_mock()
+        import_scan(key, '"xyz"', Mock(), Mock(), manifest)
+        eq_(mock_import_key.call_count, 2)
+
+    @patch("muckrock.foia.tasks.send_autoimport_report")
+    @patch("muckrock.foia.tasks.boto3", Mock())
+    @patch("muckrock.foia.tasks.import_scan")
+    def test_pending(self, mock_import_scan, mock_report):
+        """The report is sent once every scan is finished, even if one fails"""
+        mock_import_scan.side_effect = [ValueError, None]
+        manifest = AutoImportManifest("run")
+        keys = ["scans/3-14-21 MR1.pdf", "scans/3-14-21 MR2.pdf"]
+        for key in keys:
+            manifest.claim(key)
+        manifest.set_pending(len(keys))
+        with self.assertRaises(ValueError):
+            autoimport_scan("run", keys[0], '"abc"')
+        mock_report.assert_not_called()
+        autoimport_scan("run", keys[1], '"def"')
+        eq_(mock_report.call_count, 1)
+        # the claims are released so the next run may retry the scans
+        ok_(manifest.claim(keys[0]))
+        ok_(manifest.claim(keys[1]))
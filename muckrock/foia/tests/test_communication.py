@@ -294,6 +294,9 @@ class TestCommunicationClone(RunCommitHooksMixin, test.TestCase):
                 file_count,
                 "Each clone should have its own set of files.",
             )
+            clone_file = each_clone.files.first()
+            self.file.ffile.open()
+            eq_(clone_file.ffile.read(), self.file.ffile.read())
         self.run_commit_hooks()
         mock_upload.assert_called()
 
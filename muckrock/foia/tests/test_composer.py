@@ -14,7 +14,11 @@ from nose.tools import assert_false, assert_true, eq_, ok_
 
 # MuckRock
 from muckrock.core.factories import AgencyFactory, UserFactory
-from muckrock.foia.factories import FOIAComposerFactory, FOIARequestFactory
+from muckrock.foia.factories import (
+    FOIAComposerFactory,
+    FOIARequestFactory,
+    FOIATemplateFactory,
+)
 from muckrock.foia.forms.composers import BaseComposerForm
 from muckrock.foia.models import FOIAComposer
 from muckrock.organization.factories import MembershipFactory, OrganizationFactory
@@ -53,6 +57,25 @@ class TestFOIAComposer(TestCase):
                 {"regular": reg, "monthly": monthly},
             )
 
+    def test_create_foias(self):
+        """Test creating the requests in chunks"""
+        FOIATemplateFactory()
+        agencies = AgencyFactory.create_batch(3)
+        composer = FOIAComposerFactory(
+            status="submitted",
+            agencies=agencies,
+            requested_docs="Records held by { agency name }",
+        )
+        composer.create_foias([a.pk for a in agencies[:2]], None, False)
+        eq_(composer.get_progress(), (2, 3))
+        # creating the requests again skips the ones which already exist
+        composer.create_foias([a.pk for a in agencies], None, False)
+        eq_(composer.get_progress(), (3, 3))
+        for agency in agencies:
+            foia = composer.foias.get(agency=agency)
+            ok_(agency.name in foia.title)
+            ok_(agency.name in foia.communications.first().communication)
+
 
 class TestFOIAComposerQueryset(TestCase):
     """Test the foia composer queryset"""
@@ -37,7 +37,12 @@ from muckrock.foia.factories import (
     FOIARequestFactory,
     FOIATemplateFactory,
 )
-from muckrock.foia.models import FOIACommunication, FOIARequest, RawEmail
+from muckrock.foia.models import (
+    FOIACommunication,
+    FOIARequest,
+    FOIAVisibility,
+    RawEmail,
+)
 from muckrock.task.models import PaymentInfoTask, SnailMailTask
 
 
@@ -134,6 +139,43 @@ class TestFOIARequestUnit(RunCommitHooksMixin, TestCase):
         foias = FOIARequest.objects.get_viewable(user)
         nose.tools.assert_in(foia, foias)
 
+    def test_foia_visibility_index(self):
+        """The visibility index should match the direct visibility rules"""
+        owner = UserFactory()
+        collaborator = UserFactory()
+        agency_user = UserFactory()
+        other = UserFactory()
+        foia = FOIARequestFactory(embargo=True, composer__user=owner)
+        agency_user.profile.agency = foia.agency
+        agency_user.profile.save()
+
+        def check():
+            """Compare the indexed and direct queries for each user"""
+            for user in (owner, collaborator, agency_user, other):
+                eq_(
+                    set(FOIARequest.objects.get_viewable(user)),
+                    set(FOIARequest.objects.get_viewable_direct(user)),
+                )
+
+        check()
+        ok_(foia in FOIARequest.objects.get_viewable(agency_user))
+        foia.add_viewer(collaborator)
+        check()
+        ok_(foia in FOIARequest.objects.get_viewable(collaborator))
+        foia.remove_viewer(collaborator)
+        check()
+        ok_(foia not in FOIARequest.objects.get_viewable(collaborator))
+
+        foia.add_editor(collaborator)
+        FOIARequest.objects.filter(pk=foia.pk).update(embargo=False)
+        FOIAVisibility.update_requests([foia.pk])
+        eq_(FOIAVisibility.objects.filter(foia=foia).count(), 0)
+        check()
+        FOIARequest.objects.filter(pk=foia.pk).update(embargo=True)
+        FOIAVisibility.rebuild()
+        check()
+        ok_(foia not in FOIARequest.objects.get_viewable(other))
+
     def test_foia_set_mail_id(self):
         """Test the set_mail_id function"""
         foia = FOIARequestFactory()
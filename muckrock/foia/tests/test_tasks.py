@@ -0,0 +1,161 @@
+"""
+Tests for the FOIA application's tasks
+"""
+
+# Django
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+# Standard Library
+import csv
+import zipfile
+from io import BytesIO, StringIO
+
+# Third Party
+from mock import Mock, patch
+from nose.tools import eq_, ok_
+
+# MuckRock
+from muckrock.core.factories import AgencyFactory, UserFactory
+from muckrock.foia import followup
+from muckrock.foia.factories import (
+    FOIACommunicationFactory,
+    FOIAComposerFactory,
+    FOIAFileFactory,
+    FOIARequestFactory,
+    FOIATemplateFactory,
+)
+from muckrock.foia.tasks import ExportCsv, ZipRequest, composer_delayed_submit
+from muckrock.task.models import FlaggedTask
+
+
+class TestExportCsv(TestCase):
+    """Test exporting requests to a CSV"""
+
+    def setUp(self):
+        self.user = UserFactory(is_staff=True)
+
+    def _export(self, foias):
+        """Export the requests, returning the rows and the number of queries"""
+        export = ExportCsv(self.user.pk, [f.pk for f in foias])
+        out_file = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            export.generate_file(out_file)
+        out_file.seek(0)
+        return list(csv.reader(out_file)), len(queries)
+
+    def test_export(self):
+        """The export should include a row per request, in the given order"""
+        foias = FOIARequestFactory.create_batch(3)
+        foias[1].add_tracking_id("ABC123")
+        foias.reverse()
+        rows, _ = self._export(foias)
+        eq_(len(rows), 4)
+        eq_([row[1] for row in rows[1:]], [f.title for f in foias])
+        tracking_col = rows[0].index("Tracking Number")
+        eq_([row[tracking_col] for row in rows[1:]], ["", "ABC123", ""])
+
+    def test_constant_queries(self):
+        """The number of queries should not depend on the number of requests"""
+        small = FOIARequestFactory.create_batch(2)
+        large = FOIARequestFactory.create_batch(20)
+        for foia in small + large:
+            foia.add_tracking_id("tracking-%d" % foia.pk)
+        _, small_queries = self._export(small)
+        _, large_queries = self._export(large)
+        eq_(small_queries, large_queries)
+
+
+class TestZipRequest(TestCase):
+    """Test zipping up a request's communications and files"""
+
+    def test_zip(self):
+        """All communications and files should be zipped, in order"""
+        foia = FOIARequestFactory()
+        comms = FOIACommunicationFactory.create_batch(2, foia=foia)
+        pdf = FOIAFileFactory(
+            comm=comms[0], ffile__filename="doc.pdf", ffile__data=b"pdf" * 100
+        )
+        txt = FOIAFileFactory(
+            comm=comms[1], ffile__filename="notes.txt", ffile__data=b"text" * 100
+        )
+        zip_request = ZipRequest(foia.composer.user.pk, foia.pk)
+        out_file = BytesIO()
+        zip_request.generate_file(out_file)
+        out_file.seek(0)
+        with zipfile.ZipFile(out_file) as zip_file:
+            infos = zip_file.infolist()
+            eq_(
+                [info.filename for info in infos],
+                [
+                    "000_{}_comm.txt".format(comms[0].datetime),
+                    pdf.name(),
+                    "001_{}_comm.txt".format(comms[1].datetime),
+                    txt.name(),
+                ],
+            )
+            eq_(infos[1].compress_type, zipfile.ZIP_STORED)
+            eq_(infos[3].compress_type, zipfile.ZIP_DEFLATED)
+            eq_(zip_file.read(infos[1]), b"pdf" * 100)
+            eq_(zip_file.read(infos[3]), b"text" * 100)
+
+    def test_zip_closes_files(self):
+        """The downloaded files are closed once they are zipped"""
+        foia = FOIARequestFactory()
+        FOIAFileFactory.create_batch(2, comm__foia=foia)
+        zip_request = ZipRequest(foia.composer.user.pk, foia.pk)
+        temp_files = []
+        download = zip_request.download
+
+        def record_download(ffile):
+            """Keep the downloaded files to check them afterwards"""
+            temp_file = download(ffile)
+            temp_files.append(temp_file)
+            return temp_file
+
+        zip_request.download = record_download
+        zip_request.generate_file(BytesIO())
+        eq_(len(temp_files), 2)
+        ok_(all(temp_file.closed for temp_file in temp_files))
+
+
+class TestComposerDelayedSubmit(TestCase):
+    """Test submitting a composer after its requests are created"""
+
+    @patch.object(composer_delayed_submit, "max_retries", 0)
+    def test_missing_requests(self):
+        """Once out of retries, submit the created requests and flag the rest"""
+        FOIATemplateFactory()
+        agencies = AgencyFactory.create_batch(2)
+        composer = FOIAComposerFactory(status="submitted", agencies=agencies)
+        composer.create_foias([agencies[0].pk], None, False)
+        composer_delayed_submit(composer.pk, False, None)
+        eq_(composer.multirequesttask_set.count(), 1)
+        flag = FlaggedTask.objects.get()
+        eq_(flag.user, composer.user)
+        created, missing = ["{} (#{})".format(a.name, a.pk) for a in agencies]
+        ok_(missing in flag.text)
+        ok_(created not in flag.text)
+
+
+class TestFollowupChunks(SimpleTestCase):
+    """Test splitting the follow ups into chunks"""
+
+    def test_plan_chunks(self):
+        """Chunks should be grouped by channel and spaced by its rate limit"""
+        foias = [
+            Mock(pk=i, get_contact_info=Mock(return_value=(channel, None)))
+            for i, channel in enumerate(["email"] * 30 + ["fax"] * 30 + [None] * 2)
+        ]
+        chunks = list(followup.plan_chunks(foias))
+        eq_(
+            [(channel, len(pks)) for channel, pks, _ in chunks],
+            [("email", 25), ("email", 5), ("fax", 25), ("fax", 5), ("mail", 2)],
+        )
+        eq_(chunks[0][1], list(range(25)))
+        countdowns = {(channel, countdown) for channel, _, countdown in chunks}
+        eq_(
+            countdowns,
+            {("email", 0), ("email", 12), ("fax", 0), ("fax", 100), ("mail", 0)},
+        )
@@ -453,9 +453,11 @@ class ComposerDetail(DetailView):
         context["sidebar_admin_url"] = reverse(
             "admin:foia_foiacomposer_change", args=(composer.pk,)
         )
-        context["processing"] = composer.status == "submitted" and (
-            composer.foias.count() != composer.agencies.count()
-        )
+        if composer.status == "submitted":
+            created, total = composer.get_progress()
+            context["processing"] = created != total
+            context["num_created"] = created
+            context["num_agencies"] = total
         if composer.status == "submitted" and composer.datetime_submitted is not None:
             context["edit_deadline"] = composer.datetime_submitted + timedelta(
                 seconds=COMPOSER_EDIT_DELAY
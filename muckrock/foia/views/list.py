@@ -25,7 +25,7 @@ from muckrock.agency.models import Agency
 from muckrock.core.forms import TagManagerForm
 from muckrock.core.views import MRListView, MRSearchFilterListView, class_view_decorator
 from muckrock.crowdsource.forms import CrowdsourceChoiceForm
-from muckrock.crowdsource.tasks import datum_per_page
+from muckrock.crowdsource.tasks import import_documents, import_urls
 from muckrock.foia.filters import (
     AgencyFOIARequestFilterSet,
     FOIARequestFilterSet,
@@ -38,7 +38,13 @@ from muckrock.foia.forms import (
     SaveSearchForm,
     SaveSearchFormHandler,
 )
-from muckrock.foia.models import END_STATUS, FOIAComposer, FOIARequest, FOIASavedSearch
+from muckrock.foia.models import (
+    END_STATUS,
+    FOIAComposer,
+    FOIARequest,
+    FOIASavedSearch,
+    FOIAVisibility,
+)
 from muckrock.foia.rules import can_embargo, can_embargo_permananently
 from muckrock.foia.tasks import export_csv
 from muckrock.news.models import Article
@@ -288,16 +294,23 @@ class RequestList(MRSearchFilterListView):
             crowdsource = form.cleaned_data["crowdsource"]
             if crowdsource is None:
                 return "No crowdsource selected"
-            for foia in foias:
-                for comm in foia.communications.all():
-                    for file_ in comm.files.all():
-                        if file_.doc_id and split:
-                            datum_per_page.delay(crowdsource.pk, file_.doc_id, {})
-                        elif file_.doc_id and not split:
-                            crowdsource.data.create(
-                                url="https://beta.documentcloud.org/documents/"
-                                f"{file_.doc_id}/"
-                            )
+            doc_ids = [
+                file_.doc_id
+                for foia in foias
+                for comm in foia.communications.all()
+                for file_ in comm.files.all()
+                if file_.doc_id
+            ]
+            if doc_ids and split:
+                import_documents(crowdsource, [(doc_id, {}) for doc_id in doc_ids])
+            elif doc_ids:
+                import_urls(
+                    crowdsource,
+                    [
+                        (f"https://beta.documentcloud.org/documents/{doc_id}/", {})
+                        for doc_id in doc_ids
+                    ],
+                )
         return "Files added to assignment"
 
     def _review_agency(self, foias, user, _post):
@@ -388,6 +401,7 @@ class MyRequestList(RequestList):
         end_date = date.today() + timedelta(30)
         foias = [f.pk for f in foias if f.has_perm(user, "embargo")]
         FOIARequest.objects.filter(pk__in=foias).update(embargo=True)
+        FOIAVisibility.update_requests(foias)
         # only set date if in end state
         FOIARequest.objects.filter(pk__in=foias, status__in=END_STATUS).update(
             date_embargo=end_date
@@ -398,12 +412,14 @@ class MyRequestList(RequestList):
         """Remove the embargo on the selected requests"""
         foias = [f.pk for f in foias if f.has_perm(user, "embargo")]
         FOIARequest.objects.filter(pk__in=foias).update(embargo=False)
+        FOIAVisibility.update_requests(foias)
         return "Embargoes removed"
 
     def _perm_embargo(self, foias, user, _post):
         """Permanently embargo the selected requests"""
         foias = [f.pk for f in foias if f.has_perm(user, "embargo_perm")]
         FOIARequest.objects.filter(pk__in=foias).update(embargo=True)
+        FOIAVisibility.update_requests(foias)
         # only set permanent
         FOIARequest.objects.filter(pk__in=foias, status__in=END_STATUS).update(
             permanent_embargo=True
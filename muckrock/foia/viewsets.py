@@ -49,6 +49,10 @@ class FOIARequestViewSet(viewsets.ModelViewSet):
     * jurisdiction, by id
     * agency, by id
     * tags, by name
+
+    Communications and notes are only included when requested with
+    `?expand=communications,notes`, and `?fields=id,title,status` limits the
+    other fields returned
     """
 
     # pylint: disable=too-many-public-methods
@@ -57,6 +61,8 @@ class FOIARequestViewSet(viewsets.ModelViewSet):
     # remove default ordering backend as it does not work well with fields stored
     # on related models
     filter_backends = (DjangoFilterBackend, SearchFilter)
+    # allow ?pagination=cursor for paging through all requests
+    cursor_ordering = ("id",)
 
     class Filter(django_filters.FilterSet):
         """API Filter for FOIA Requests"""
@@ -104,27 +110,32 @@ class FOIARequestViewSet(viewsets.ModelViewSet):
     filterset_class = Filter
 
     def get_queryset(self):
-        return (
-            FOIARequest.objects.get_viewable(self.request.user)
-            .select_related("composer__user", "agency__jurisdiction")
-            .prefetch_related(
+        queryset = FOIARequest.objects.get_viewable(
+            self.request.user
+        ).select_related("composer__user", "agency__jurisdiction")
+        # only prefetch the connected models which will be serialized
+        fields = self.get_serializer().fields
+        if "communications" in fields:
+            queryset = queryset.prefetch_related(
                 "communications__files",
                 "communications__emails",
                 "communications__faxes",
                 "communications__mails",
                 "communications__web_comms",
                 "communications__portals",
-                "notes",
-                "tags",
-                "edit_collaborators",
-                "read_collaborators",
-                "tracking_ids",
                 Prefetch(
                     "communications__responsetask_set",
                     queryset=ResponseTask.objects.select_related("resolved_by"),
                 ),
             )
-        )
+        for field, lookup in [
+            ("notes", "notes"),
+            ("tags", "tags"),
+            ("tracking_id", "tracking_ids"),
+        ]:
+            if field in fields:
+                queryset = queryset.prefetch_related(lookup)
+        return queryset
 
     def _validate_create(self, user, data):
         """Do all of the data validation for request creation"""
@@ -372,6 +383,8 @@ class FOIACommunicationViewSet(viewsets.ModelViewSet):
     # pylint: disable=too-many-public-methods
     serializer_class = FOIACommunicationSerializer
     permission_classes = (DjangoModelPermissions,)
+    # allow ?pagination=cursor for paging through all communications
+    cursor_ordering = ("datetime", "id")
 
     class Filter(django_filters.FilterSet):
         """API Filter for FOIA Communications"""
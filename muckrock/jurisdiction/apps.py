@@ -15,6 +15,7 @@ class JurisdictionConfig(AppConfig):
         """Registers exemptions with watson"""
         # pylint: disable=invalid-name, import-outside-toplevel
         from watson import search
+        import muckrock.jurisdiction.signals  # pylint: disable=unused-import
 
         Exemption = self.get_model("Exemption")
         search.register(Exemption)
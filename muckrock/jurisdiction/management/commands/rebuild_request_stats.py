@@ -0,0 +1,31 @@
+"""
+Rebuild the materialized request statistics for every agency
+"""
+
+# Django
+from django.core.management.base import BaseCommand
+
+# Standard Library
+import time
+
+# MuckRock
+from muckrock.jurisdiction.models import RequestStats
+
+
+class Command(BaseCommand):
+    """Rebuild the request stats from scratch"""
+
+    help = (
+        "Recompute the request stats served on the agency and jurisdiction pages. "
+        "They are kept up to date as requests change, but should be rebuilt after "
+        "bulk updates which bypass model signals."
+    )
+
+    def handle(self, *args, **kwargs):
+        start = time.monotonic()
+        count = RequestStats.rebuild()
+        self.stdout.write(
+            "Rebuilt request stats for {} agencies in {:.1f}s".format(
+                count, time.monotonic() - start
+            )
+        )
@@ -0,0 +1,90 @@
+# Generated by Django 3.2.9 on 2026-10-18 12:00
+
+import datetime
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+import django.db.models.deletion
+
+
+# follows RequestStats.rebuild
+def populate_request_stats(apps, schema_editor):
+    FOIARequest = apps.get_model('foia', 'FOIARequest')
+    FOIAFile = apps.get_model('foia', 'FOIAFile')
+    RequestStats = apps.get_model('jurisdiction', 'RequestStats')
+    with_fee = Q(price__gt=0)
+    responded = Q(
+        datetime_done__isnull=False, composer__datetime_submitted__isnull=False
+    )
+    rows = (
+        FOIARequest.objects.order_by()
+        .values('agency_id')
+        .annotate(
+            requests=Count('pk'),
+            requests_done=Count(
+                'pk',
+                filter=Q(status__in=('partial', 'done'), datetime_done__isnull=False),
+            ),
+            requests_with_fee=Count('pk', filter=with_fee),
+            total_fees=Sum('price', filter=with_fee),
+            requests_responded=Count('pk', filter=responded),
+            total_response_time=Sum(
+                F('datetime_done') - F('composer__datetime_submitted'),
+                filter=responded,
+            ),
+        )
+    )
+    pages = dict(
+        FOIAFile.objects.exclude(comm__foia=None)
+        .order_by()
+        .values_list('comm__foia__agency_id')
+        .annotate(Sum('pages'))
+    )
+    zero = {
+        'total_fees': Decimal('0.00'),
+        'total_response_time': datetime.timedelta(0),
+    }
+    stats = []
+    for row in rows:
+        agency_id = row.pop('agency_id')
+        row['pages'] = pages.get(agency_id) or 0
+        stats.append(
+            RequestStats(
+                agency_id=agency_id,
+                **{
+                    key: value if value is not None else zero.get(key, 0)
+                    for key, value in row.items()
+                }
+            )
+        )
+    RequestStats.objects.bulk_create(stats, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agency', '0030_merge_20210427_1152'),
+        ('foia', '0093_auto_20211202_1032'),
+        ('jurisdiction', '0025_alter_invokedexemption_properly_invoked'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('requests', models.IntegerField(default=0)),
+                ('requests_done', models.IntegerField(default=0)),
+                ('requests_with_fee', models.IntegerField(default=0)),
+                ('total_fees', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('requests_responded', models.IntegerField(default=0)),
+                ('total_response_time', models.DurationField(default=datetime.timedelta)),
+                ('pages', models.BigIntegerField(default=0)),
+                ('agency', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='request_stats', to='agency.agency')),
+            ],
+            options={
+                'verbose_name_plural': 'request stats',
+            },
+        ),
+        migrations.RunPython(populate_request_stats, migrations.RunPython.noop),
+    ]
@@ -3,69 +3,262 @@ Models for the Jurisdiction application
 """
 # Django
 from django.contrib.auth.models import User
-from django.db import models
-from django.db.models import Avg, Count, F, Q, Sum
-from django.db.models.expressions import Value
-from django.db.models.functions import Coalesce
+from django.db import models, transaction
+from django.db.models import Count, F, Q, Sum
 from django.template.defaultfilters import slugify
 from django.urls import reverse
 
+# Standard Library
+from datetime import timedelta
+from decimal import Decimal
+
 # Third Party
 from easy_thumbnails.fields import ThumbnailerImageField
 from taggit.managers import TaggableManager
 
 # MuckRock
-from muckrock.business_days.models import Calendar, Holiday, HolidayCalendar
-from muckrock.core.models import ExtractDay
-from muckrock.foia.models import END_STATUS, FOIARequest
+from muckrock.business_days.models import (
+    Calendar,
+    Holiday,
+    HolidayCalendar,
+    calendar_cache,
+)
+from muckrock.foia.models import END_STATUS, FOIAFile, FOIARequest
 from muckrock.tags.models import TaggedItemBase
 
 
 class RequestHelper:
-    """Helper methods for classes that have a get_requests() method"""
+    """Helper methods for classes that have a get_requests() method
+
+    The statistics are served from the materialized RequestStats rows for the
+    agencies selected by request_stats_filter()
+    """
+
+    def request_stats_filter(self):
+        """Filter selecting the RequestStats rows to sum over"""
+        raise NotImplementedError
+
+    def get_request_stats(self):
+        """Sum the materialized request statistics, cached on the instance"""
+        if not hasattr(self, "_request_stats"):
+            stats = RequestStats.objects.filter(self.request_stats_filter()).aggregate(
+                requests=Sum("requests"),
+                requests_done=Sum("requests_done"),
+                requests_with_fee=Sum("requests_with_fee"),
+                total_fees=Sum("total_fees"),
+                requests_responded=Sum("requests_responded"),
+                total_response_time=Sum("total_response_time"),
+                pages=Sum("pages"),
+            )
+            self._request_stats = {
+                key: value if value is not None else RequestStats.zero[key]
+                for key, value in stats.items()
+            }
+        return self._request_stats
 
     def average_response_time(self):
         """Get the average response time from a submitted to completed request"""
-        requests = self.get_requests()
-        avg = requests.aggregate(
-            avg=Coalesce(
-                ExtractDay(Avg(F("datetime_done") - F("composer__datetime_submitted"))),
-                Value(0),
-            )
-        )["avg"]
-        return avg
+        stats = self.get_request_stats()
+        if stats["requests_responded"] > 0:
+            return (stats["total_response_time"] / stats["requests_responded"]).days
+        return 0
 
     def average_fee(self):
         """Get the average fees required on requests that have a price."""
-        requests = self.get_requests()
-        avg = requests.filter(price__gt=0).aggregate(price=Avg("price"))["price"]
-        return avg if avg else 0
+        stats = self.get_request_stats()
+        if stats["requests_with_fee"] > 0:
+            return stats["total_fees"] / stats["requests_with_fee"]
+        return 0
 
     def fee_rate(self):
         """Get the percentage of requests that have a fee."""
-        requests = self.get_requests()
-        filed = float(requests.count())
-        fee = float(requests.filter(price__gt=0).count())
+        stats = self.get_request_stats()
         rate = 0
-        if filed > 0:
-            rate = fee / filed * 100
+        if stats["requests"] > 0:
+            rate = float(stats["requests_with_fee"]) / stats["requests"] * 100
         return rate
 
     def success_rate(self):
         """Get the percentage of requests that are successful."""
-        requests = self.get_requests()
-        filed = float(requests.count())
-        completed = float(requests.get_done().count())
+        stats = self.get_request_stats()
         rate = 0
-        if filed > 0:
-            rate = completed / filed * 100
+        if stats["requests"] > 0:
+            rate = float(stats["requests_done"]) / stats["requests"] * 100
         return rate
 
     def total_pages(self):
         """Total pages released"""
-        requests = self.get_requests()
-        pages = requests.aggregate(pages=Sum("communications__files__pages"))["pages"]
-        return pages if pages else 0
+        return self.get_request_stats()["pages"]
+
+
+class RequestStats(models.Model):
+    """Materialized request statistics for an agency
+
+    Kept up to date incrementally by the signal handlers in
+    jurisdiction.signals, and rebuilt from scratch nightly and by the
+    rebuild_request_stats management command.  Jurisdiction statistics are
+    summed over the rows for their agencies.
+    """
+
+    # the fields of a request that its statistics depend on
+    request_fields = (
+        "agency_id",
+        "status",
+        "price",
+        "datetime_done",
+        "composer__datetime_submitted",
+    )
+    # statuses counted as successful, matching FOIARequestQuerySet.get_done
+    done_status = ("partial", "done")
+    zero = {
+        "requests": 0,
+        "requests_done": 0,
+        "requests_with_fee": 0,
+        "total_fees": Decimal("0.00"),
+        "requests_responded": 0,
+        "total_response_time": timedelta(0),
+        "pages": 0,
+    }
+
+    agency = models.OneToOneField(
+        "agency.Agency", on_delete=models.CASCADE, related_name="request_stats"
+    )
+    requests = models.IntegerField(default=0)
+    requests_done = models.IntegerField(default=0)
+    requests_with_fee = models.IntegerField(default=0)
+    total_fees = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    requests_responded = models.IntegerField(default=0)
+    total_response_time = models.DurationField(default=timedelta)
+    pages = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "request stats"
+
+    def __str__(self):
+        return "Request stats for %s" % self.agency
+
+    @staticmethod
+    def request_values(foia):
+        """Get the values of request_fields from a request instance"""
+        submitted = None
+        if foia.datetime_done is not None and foia.composer_id is not None:
+            submitted = foia.composer.datetime_submitted
+        return {
+            "agency_id": foia.agency_id,
+            "status": foia.status,
+            "price": foia.price,
+            "datetime_done": foia.datetime_done,
+            "composer__datetime_submitted": submitted,
+        }
+
+    @classmethod
+    def contribution(cls, values):
+        """What a single request adds to its agency's statistics
+
+        `values` are the request's request_fields, or None for no request
+        """
+        if values is None:
+            return {key: value for key, value in cls.zero.items() if key != "pages"}
+        price = Decimal(str(values["price"] or 0))
+        done = values["datetime_done"]
+        submitted = values["composer__datetime_submitted"]
+        responded = done is not None and submitted is not None
+        return {
+            "requests": 1,
+            "requests_done": int(values["status"] in cls.done_status and bool(done)),
+            "requests_with_fee": int(price > 0),
+            "total_fees": price if price > 0 else Decimal("0.00"),
+            "requests_responded": int(responded),
+            "total_response_time": done - submitted if responded else timedelta(0),
+        }
+
+    @classmethod
+    def add(cls, agency_id, deltas):
+        """Add the deltas to an agency's statistics"""
+        deltas = {key: value for key, value in deltas.items() if value}
+        if agency_id is None or not deltas:
+            return
+        cls.objects.get_or_create(agency_id=agency_id)
+        cls.objects.filter(agency_id=agency_id).update(
+            **{key: F(key) + value for key, value in deltas.items()}
+        )
+
+    @classmethod
+    def record_request(cls, old, new):
+        """Update the statistics for a request which was changed
+
+        `old` and `new` are the request_fields before and after the change, or
+        None if the request was created or deleted
+        """
+        old_agency = old["agency_id"] if old else None
+        new_agency = new["agency_id"] if new else None
+        old_stats = cls.contribution(old)
+        new_stats = cls.contribution(new)
+        if old_agency == new_agency:
+            cls.add(new_agency, {k: new_stats[k] - old_stats[k] for k in new_stats})
+        else:
+            cls.add(old_agency, {k: -v for k, v in old_stats.items()})
+            cls.add(new_agency, new_stats)
+
+    @classmethod
+    def merge(cls, from_agency, to_agency):
+        """Move the statistics when one agency is merged into another"""
+        stats = cls.objects.filter(agency=from_agency).first()
+        if stats is not None:
+            cls.add(to_agency.pk, {key: getattr(stats, key) for key in cls.zero})
+            stats.delete()
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute the statistics for every agency from scratch
+
+        Returns the number of agencies with statistics
+        """
+        with_fee = Q(price__gt=0)
+        responded = Q(
+            datetime_done__isnull=False, composer__datetime_submitted__isnull=False
+        )
+        rows = (
+            FOIARequest.objects.order_by()
+            .values("agency_id")
+            .annotate(
+                requests=Count("pk"),
+                requests_done=Count(
+                    "pk",
+                    filter=Q(status__in=cls.done_status, datetime_done__isnull=False),
+                ),
+                requests_with_fee=Count("pk", filter=with_fee),
+                total_fees=Sum("price", filter=with_fee),
+                requests_responded=Count("pk", filter=responded),
+                total_response_time=Sum(
+                    F("datetime_done") - F("composer__datetime_submitted"),
+                    filter=responded,
+                ),
+            )
+        )
+        pages = dict(
+            FOIAFile.objects.exclude(comm__foia=None)
+            .order_by()
+            .values_list("comm__foia__agency_id")
+            .annotate(Sum("pages"))
+        )
+        stats = []
+        for row in rows:
+            agency_id = row.pop("agency_id")
+            row["pages"] = pages.get(agency_id)
+            stats.append(
+                cls(
+                    agency_id=agency_id,
+                    **{
+                        key: value if value is not None else cls.zero[key]
+                        for key, value in row.items()
+                    },
+                )
+            )
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(stats, batch_size=1000)
+        return len(stats)
 
 
 class Jurisdiction(models.Model, RequestHelper):
@@ -185,7 +378,11 @@ class Jurisdiction(models.Model, RequestHelper):
     def get_calendar(self):
         """Get a calendar of business days for the jurisdiction"""
         if self.legal.law.use_business_days:
-            return HolidayCalendar(self.legal.holidays.all(), self.legal.observe_sat)
+            legal = self.legal
+            return calendar_cache.get(
+                legal.pk,
+                lambda: HolidayCalendar(list(legal.holidays.all()), legal.observe_sat),
+            )
         else:
             return Calendar()
 
@@ -195,6 +392,12 @@ class Jurisdiction(models.Model, RequestHelper):
             profile__proxy=True, profile__state=self.legal.abbrev
         ).first()
 
+    def request_stats_filter(self):
+        """State level jurisdictions include stats from their localities as well."""
+        if self.level == "s":
+            return Q(agency__jurisdiction=self) | Q(agency__jurisdiction__parent=self)
+        return Q(agency__jurisdiction=self)
+
     def get_requests(self):
         """State level jurisdictions should return requests from their localities as well."""
         if self.level == "s":
@@ -0,0 +1,200 @@
+"""Model signal handlers for the jurisdiction application"""
+
+# Django
+from django.db.models import Sum
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+
+# MuckRock
+from muckrock.business_days.models import Holiday, calendar_cache
+from muckrock.foia.models import FOIACommunication, FOIAFile, FOIARequest
+from muckrock.jurisdiction.models import Jurisdiction, RequestStats
+
+# pylint: disable=unused-argument, protected-access
+
+
+def clear_calendar_cache(sender, **kwargs):
+    """Clear the compiled holiday calendars when holidays may have changed"""
+    calendar_cache.clear()
+
+
+def request_stats_pre_save(sender, instance, raw=False, **kwargs):
+    """Remember the request's old values, to update the stats after saving"""
+    instance._request_stats_old = None
+    if instance.pk is not None and not raw:
+        instance._request_stats_old = (
+            FOIARequest.objects.filter(pk=instance.pk)
+            .values(*RequestStats.request_fields)
+            .first()
+        )
+
+
+def request_stats_post_save(sender, instance, raw=False, **kwargs):
+    """Update the request stats for the request's agency"""
+    if raw:
+        return
+    old = instance._request_stats_old
+    RequestStats.record_request(old, RequestStats.request_values(instance))
+    if old and old["agency_id"] != instance.agency_id:
+        move_pages(
+            FOIAFile.objects.filter(comm__foia=instance),
+            old["agency_id"],
+            instance.agency_id,
+        )
+
+
+def request_stats_post_delete(sender, instance, **kwargs):
+    """Remove a deleted request from the request stats"""
+    RequestStats.record_request(RequestStats.request_values(instance), None)
+
+
+def move_pages(files, old_agency_id, new_agency_id):
+    """Move the pages of the files from one agency's stats to another's"""
+    pages = files.aggregate(pages=Sum("pages"))["pages"] or 0
+    RequestStats.add(old_agency_id, {"pages": -pages})
+    RequestStats.add(new_agency_id, {"pages": pages})
+
+
+def comm_stats_pre_save(sender, instance, raw=False, **kwargs):
+    """Remember the communication's old request, to move its pages after saving"""
+    instance._request_stats_old = None
+    if instance.pk is not None and not raw:
+        instance._request_stats_old = (
+            FOIACommunication.objects.filter(pk=instance.pk)
+            .values("foia_id", "foia__agency_id")
+            .first()
+        )
+
+
+def comm_stats_post_save(sender, instance, raw=False, **kwargs):
+    """Move the communication's pages if it was moved to another agency"""
+    old = instance._request_stats_old
+    if raw or not old or old["foia_id"] == instance.foia_id:
+        return
+    new_agency_id = (
+        FOIARequest.objects.filter(pk=instance.foia_id)
+        .values_list("agency_id", flat=True)
+        .first()
+    )
+    if old["foia__agency_id"] != new_agency_id:
+        move_pages(instance.files.all(), old["foia__agency_id"], new_agency_id)
+
+
+def comm_agency_id(comm_id):
+    """Get the ID of the agency a communication's request was filed with"""
+    return (
+        FOIACommunication.objects.filter(pk=comm_id)
+        .values_list("foia__agency_id", flat=True)
+        .first()
+    )
+
+
+def file_stats_pre_save(sender, instance, raw=False, **kwargs):
+    """Remember the file's old pages, to update the stats after saving"""
+    instance._request_stats_old = None
+    if instance.pk is not None and not raw:
+        instance._request_stats_old = (
+            FOIAFile.objects.filter(pk=instance.pk)
+            .values("comm_id", "comm__foia__agency_id", "pages")
+            .first()
+        )
+
+
+def file_stats_post_save(sender, instance, raw=False, **kwargs):
+    """Update the pages in the request stats"""
+    if raw:
+        return
+    old = instance._request_stats_old
+    if old and old["comm_id"] == instance.comm_id:
+        RequestStats.add(
+            old["comm__foia__agency_id"], {"pages": instance.pages - old["pages"]}
+        )
+        return
+    if old:
+        RequestStats.add(old["comm__foia__agency_id"], {"pages": -old["pages"]})
+    if instance.pages:
+        RequestStats.add(comm_agency_id(instance.comm_id), {"pages": instance.pages})
+
+
+def file_stats_post_delete(sender, instance, **kwargs):
+    """Remove a deleted file's pages from the request stats"""
+    if instance.pages:
+        RequestStats.add(comm_agency_id(instance.comm_id), {"pages": -instance.pages})
+
+
+post_save.connect(
+    clear_calendar_cache,
+    sender=Holiday,
+    dispatch_uid="muckrock.jurisdiction.signals.holiday_save",
+)
+
+post_delete.connect(
+    clear_calendar_cache,
+    sender=Holiday,
+    dispatch_uid="muckrock.jurisdiction.signals.holiday_delete",
+)
+
+post_save.connect(
+    clear_calendar_cache,
+    sender=Jurisdiction,
+    dispatch_uid="muckrock.jurisdiction.signals.jurisdiction_save",
+)
+
+post_delete.connect(
+    clear_calendar_cache,
+    sender=Jurisdiction,
+    dispatch_uid="muckrock.jurisdiction.signals.jurisdiction_delete",
+)
+
+m2m_changed.connect(
+    clear_calendar_cache,
+    sender=Jurisdiction.holidays.through,
+    dispatch_uid="muckrock.jurisdiction.signals.holidays_changed",
+)
+
+pre_save.connect(
+    request_stats_pre_save,
+    sender=FOIARequest,
+    dispatch_uid="muckrock.jurisdiction.signals.request_stats_pre_save",
+)
+
+post_save.connect(
+    request_stats_post_save,
+    sender=FOIARequest,
+    dispatch_uid="muckrock.jurisdiction.signals.request_stats_post_save",
+)
+
+post_delete.connect(
+    request_stats_post_delete,
+    sender=FOIARequest,
+    dispatch_uid="muckrock.jurisdiction.signals.request_stats_post_delete",
+)
+
+pre_save.connect(
+    comm_stats_pre_save,
+    sender=FOIACommunication,
+    dispatch_uid="muckrock.jurisdiction.signals.comm_stats_pre_save",
+)
+
+post_save.connect(
+    comm_stats_post_save,
+    sender=FOIACommunication,
+    dispatch_uid="muckrock.jurisdiction.signals.comm_stats_post_save",
+)
+
+pre_save.connect(
+    file_stats_pre_save,
+    sender=FOIAFile,
+    dispatch_uid="muckrock.jurisdiction.signals.file_stats_pre_save",
+)
+
+post_save.connect(
+    file_stats_post_save,
+    sender=FOIAFile,
+    dispatch_uid="muckrock.jurisdiction.signals.file_stats_post_save",
+)
+
+post_delete.connect(
+    file_stats_post_delete,
+    sender=FOIAFile,
+    dispatch_uid="muckrock.jurisdiction.signals.file_stats_post_delete",
+)
@@ -14,13 +14,14 @@ from datetime import timedelta
 from nose.tools import eq_
 
 # MuckRock
-from muckrock.core.factories import UserFactory
+from muckrock.core.factories import AgencyFactory, UserFactory
 from muckrock.foia.factories import (
     FOIACommunicationFactory,
     FOIAFileFactory,
     FOIARequestFactory,
 )
 from muckrock.jurisdiction import factories
+from muckrock.jurisdiction.models import RequestStats
 
 
 class TestJurisdictionUnit(TestCase):
@@ -147,11 +148,77 @@ class TestJurisdictionUnit(TestCase):
         page_count = 10
         local_comm = FOIACommunicationFactory(foia__agency__jurisdiction=self.local)
         state_comm = FOIACommunicationFactory(foia__agency__jurisdiction=self.state)
-        local_comm.files.add(FOIAFileFactory(pages=page_count))
-        state_comm.files.add(FOIAFileFactory(pages=page_count))
+        FOIAFileFactory(comm=local_comm, pages=page_count)
+        FOIAFileFactory(comm=state_comm, pages=page_count)
         eq_(self.local.total_pages(), page_count)
         eq_(self.state.total_pages(), 2 * page_count)
 
+    def test_request_stats_updates(self):
+        """Request stats should be kept up to date as requests and files change"""
+        agency = AgencyFactory(jurisdiction=self.local)
+        other_agency = AgencyFactory(jurisdiction=self.state)
+        foia = FOIARequestFactory(agency=agency, status="ack")
+        comm = FOIACommunicationFactory(foia=foia)
+        foia_file = FOIAFileFactory(comm=comm, pages=0)
+
+        stats = RequestStats.objects.get(agency=agency)
+        eq_((stats.requests, stats.requests_done, stats.pages), (1, 0, 0))
+
+        foia.status = "done"
+        foia.datetime_done = timezone.now()
+        foia.price = 10
+        foia.save()
+        foia_file.pages = 5
+        foia_file.save()
+        stats.refresh_from_db()
+        eq_((stats.requests, stats.requests_done, stats.pages), (1, 1, 5))
+        eq_((stats.requests_with_fee, stats.total_fees), (1, 10))
+
+        foia.agency = other_agency
+        foia.save()
+        stats.refresh_from_db()
+        eq_((stats.requests, stats.requests_done, stats.total_fees), (0, 0, 0))
+        other_stats = RequestStats.objects.get(agency=other_agency)
+        eq_((other_stats.requests, other_stats.requests_done), (1, 1))
+
+        foia_file.delete()
+        other_stats.refresh_from_db()
+        eq_(other_stats.pages, 0)
+
+    def test_request_stats_move_comm(self):
+        """Moving a communication should move its pages to the new agency"""
+        foia = FOIARequestFactory(agency__jurisdiction=self.local)
+        other_foia = FOIARequestFactory(agency__jurisdiction=self.state)
+        comm = FOIACommunicationFactory(foia=foia)
+        FOIAFileFactory(comm=comm, pages=4)
+        orphan = FOIACommunicationFactory(foia=None)
+        FOIAFileFactory(comm=orphan, pages=2)
+
+        comm.move([other_foia.pk], UserFactory())
+        orphan.move([other_foia.pk], UserFactory())
+        eq_(RequestStats.objects.get(agency=foia.agency).pages, 0)
+        eq_(RequestStats.objects.get(agency=other_foia.agency).pages, 6)
+
+    def test_request_stats_rebuild(self):
+        """Rebuilding the request stats should match the incremental updates"""
+        now = timezone.now()
+        FOIARequestFactory(
+            agency__jurisdiction=self.state,
+            status="done",
+            price=5,
+            datetime_done=now,
+            composer__datetime_submitted=now - timedelta(4),
+        )
+        local_comm = FOIACommunicationFactory(
+            foia__agency__jurisdiction=self.local, foia__status="ack"
+        )
+        FOIAFileFactory(comm=local_comm, pages=3)
+        fields = [f.name for f in RequestStats._meta.fields if f.name != "id"]
+        before = sorted(RequestStats.objects.values_list(*fields))
+        RequestStats.objects.all().delete()
+        eq_(RequestStats.rebuild(), len(before))
+        eq_(sorted(RequestStats.objects.values_list(*fields)), before)
+
     def test_get_proxy(self):
         """Test getting the proxy user for a state"""
         eq_(self.state.get_proxy(), None)
@@ -20,6 +20,25 @@ from muckrock.task.models import FlaggedTask
 from muckrock.task.serializers import FlaggedTaskSerializer
 
 
+class TestJurisdictionList(TestCase):
+    """The jurisdiction list may be paged through with a cursor"""
+
+    def test_cursor_pagination(self):
+        """Cursor pagination should page through every jurisdiction once"""
+        StateJurisdictionFactory.create_batch(3)
+        factory = APIRequestFactory()
+        view = JurisdictionViewSet.as_view({"get": "list"})
+        response = view(factory.get("/jurisdiction/?pagination=cursor&page_size=2"))
+        eq_(response.status_code, 200)
+        ok_("count" not in response.data)
+        seen = [j["id"] for j in response.data["results"]]
+        while response.data["next"]:
+            response = view(factory.get(response.data["next"]))
+            seen.extend(j["id"] for j in response.data["results"])
+        eq_(seen, sorted(seen))
+        eq_(len(seen), JurisdictionViewSet.queryset.count())
+
+
 class TestExemptionList(TestCase):
     """
     The exemption list view allows exemptions to be listed and filtered.
@@ -5,9 +5,10 @@ Views for the Jurisdiction application
 # Django
 from django.contrib import messages
 from django.contrib.auth.models import User
-from django.db.models import Count, Q, Sum
+from django.db.models import Count, F, Q, Sum
 from django.db.models.expressions import Value
 from django.db.models.fields import BooleanField
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils.decorators import method_decorator
@@ -169,8 +170,10 @@ def detail(request, fed_slug, state_slug=None, local_slug=None):
     agencies = (
         agencies.get_approved()
         .only("pk", "slug", "name", "jurisdiction")
-        .annotate(foia_count=Count("foiarequest", distinct=True))
-        .annotate(pages=Sum("foiarequest__communications__files__pages"))
+        .annotate(
+            foia_count=Coalesce("request_stats__requests", 0),
+            pages=F("request_stats__pages"),
+        )
         .order_by("-foia_count")[:10]
     )
 
@@ -178,9 +181,10 @@ def detail(request, fed_slug, state_slug=None, local_slug=None):
         "parent__parent"
     )
     _top_children = (
-        _children.annotate(foia_count=Count("agencies__foiarequest", distinct=True))
-        .annotate(pages=Sum("agencies__foiarequest__communications__files__pages"))
-        .order_by("-foia_count")[:10]
+        _children.annotate(
+            foia_count=Coalesce(Sum("agencies__request_stats__requests"), 0),
+            pages=Sum("agencies__request_stats__pages"),
+        ).order_by("-foia_count")[:10]
     )
 
     if request.method == "POST":
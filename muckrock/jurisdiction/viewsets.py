@@ -32,6 +32,8 @@ class JurisdictionViewSet(ModelViewSet):
     # pylint: disable=too-many-public-methods
     queryset = Jurisdiction.objects.order_by("id").select_related("parent__parent")
     serializer_class = JurisdictionSerializer
+    # allow ?pagination=cursor for paging through all jurisdictions
+    cursor_ordering = ("id",)
     # don't allow ordering by computed fields
     ordering_fields = [
         f
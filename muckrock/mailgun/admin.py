@@ -4,8 +4,54 @@ Admin registration for Tasks
 
 # Django
 from django.contrib import admin
+from django.db import transaction
+from django.utils import timezone
 
 # MuckRock
-from muckrock.mailgun.models import WhitelistDomain
+from muckrock.mailgun.models import InboundEmail, WhitelistDomain
+from muckrock.mailgun.tasks import process_inbound_email
+
+
+class InboundEmailAdmin(admin.ModelAdmin):
+    """Inbound email admin, for inspecting and retrying failed emails"""
+
+    list_display = (
+        "address",
+        "status",
+        "attempts",
+        "datetime_received",
+        "datetime_processed",
+    )
+    list_filter = ("status",)
+    search_fields = ("address", "message_id")
+    date_hierarchy = "datetime_received"
+    readonly_fields = (
+        "address",
+        "message_id",
+        "message_key",
+        "post",
+        "files",
+        "attempts",
+        "error",
+        "datetime_received",
+        "datetime_next_attempt",
+        "datetime_started",
+        "datetime_processed",
+    )
+    actions = ["retry"]
+
+    def retry(self, request, queryset):
+        """Retry failed emails"""
+        failed = list(queryset.filter(status="failed").values_list("pk", flat=True))
+        InboundEmail.objects.filter(pk__in=failed).update(
+            status="pending", attempts=0, datetime_next_attempt=timezone.now()
+        )
+        for pk in failed:
+            transaction.on_commit(lambda pk=pk: process_inbound_email.delay(pk))
+        self.message_user(request, "Retrying {} emails".format(len(failed)))
+
+    retry.short_description = "Retry failed emails"
+
 
 admin.site.register(WhitelistDomain)
+admin.site.register(InboundEmail, InboundEmailAdmin)
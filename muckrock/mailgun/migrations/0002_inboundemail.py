@@ -0,0 +1,40 @@
+# Generated by Django 3.2.9 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailgun', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboundEmail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('address', models.CharField(help_text='The address at our domain the email was sent to', max_length=254)),
+                ('message_id', models.CharField(blank=True, max_length=255)),
+                ('message_key', models.UUIDField(default=uuid.uuid4, help_text='Identifies the webhook post, shared with the other recipients')),
+                ('post', models.JSONField()),
+                ('files', models.JSONField(default=list)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('datetime_received', models.DateTimeField(default=django.utils.timezone.now)),
+                ('datetime_next_attempt', models.DateTimeField(default=django.utils.timezone.now)),
+                ('datetime_started', models.DateTimeField(blank=True, null=True)),
+                ('datetime_processed', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ('pk',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='inboundemail',
+            index=models.Index(fields=['address', 'status'], name='mailgun_inb_address_b8bbcd_idx'),
+        ),
+    ]
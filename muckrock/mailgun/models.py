@@ -3,7 +3,15 @@ Models for the mailgun app
 """
 
 # Django
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
 from django.db import models
+from django.http import QueryDict
+from django.utils import timezone
+
+# Standard Library
+import uuid
+from datetime import timedelta
 
 
 class WhitelistDomain(models.Model):
@@ -13,3 +21,132 @@ class WhitelistDomain(models.Model):
 
     def __str__(self):
         return self.domain
+
+
+class InboundEmail(models.Model):
+    """An incoming email waiting to be processed for a single recipient
+
+    When asynchronous ingestion is enabled, the mailgun webhook stores the post
+    data and attachments and creates one of these for each of our addresses the
+    email was sent to.  They are processed in order for each address, retried
+    with a backoff on errors, and kept as dead letters once they run out of
+    attempts.
+    """
+
+    max_attempts = 5
+
+    status = models.CharField(
+        max_length=10,
+        choices=(
+            ("pending", "Pending"),
+            ("processing", "Processing"),
+            ("done", "Done"),
+            ("failed", "Failed"),
+        ),
+        default="pending",
+    )
+    address = models.CharField(
+        max_length=254, help_text="The address at our domain the email was sent to"
+    )
+    message_id = models.CharField(max_length=255, blank=True)
+    message_key = models.UUIDField(
+        default=uuid.uuid4,
+        help_text="Identifies the webhook post, shared with the other recipients",
+    )
+    post = models.JSONField()
+    files = models.JSONField(default=list)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    datetime_received = models.DateTimeField(default=timezone.now)
+    datetime_next_attempt = models.DateTimeField(default=timezone.now)
+    datetime_started = models.DateTimeField(blank=True, null=True)
+    datetime_processed = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ("pk",)
+        indexes = [models.Index(fields=("address", "status"))]
+
+    def __str__(self):
+        return "Email to {} ({})".format(self.address, self.status)
+
+    @staticmethod
+    def store_files(message_key, files):
+        """Save the uploaded files to storage, returning a description of them"""
+        stored = []
+        for i, (key, file_) in enumerate(files.items()):
+            path = default_storage.save(
+                "mailgun_inbound/{}/{}/{}".format(message_key, i, file_.name[:200]),
+                file_,
+            )
+            stored.append(
+                {
+                    "key": key,
+                    "name": file_.name,
+                    "content_type": file_.content_type,
+                    "path": path,
+                }
+            )
+        return stored
+
+    def get_post(self):
+        """Rebuild the post data, keeping every value of repeated keys"""
+        post = QueryDict(mutable=True)
+        for key, values in self.post.items():
+            # emails stored before repeated keys were kept have single values
+            post.setlist(key, values if isinstance(values, list) else [values])
+        return post
+
+    def get_files(self):
+        """Open the stored files, in the same form as the uploaded files"""
+        files = {}
+        for file_ in self.files:
+            files[file_["key"]] = UploadedFile(
+                default_storage.open(file_["path"]),
+                name=file_["name"],
+                content_type=file_["content_type"],
+            )
+        return files
+
+    def delete_files(self):
+        """Delete the stored files once every recipient has been processed"""
+        if (
+            InboundEmail.objects.filter(message_key=self.message_key)
+            .exclude(status="done")
+            .exists()
+        ):
+            return
+        for file_ in self.files:
+            default_storage.delete(file_["path"])
+
+    def is_blocked(self):
+        """Is an earlier email to the same address still waiting to be processed?"""
+        return InboundEmail.objects.filter(
+            address=self.address, pk__lt=self.pk, status__in=("pending", "processing")
+        ).exists()
+
+    def get_next(self):
+        """Get the next email waiting for the same address"""
+        return InboundEmail.objects.filter(
+            address=self.address, pk__gt=self.pk, status="pending"
+        ).first()
+
+    def finish(self):
+        """Mark as successfully processed"""
+        self.status = "done"
+        self.error = ""
+        self.datetime_processed = timezone.now()
+        self.save()
+        self.delete_files()
+
+    def fail(self, error):
+        """Record an error, scheduling a retry or giving up"""
+        self.error = error
+        if self.attempts >= self.max_attempts:
+            self.status = "failed"
+            self.datetime_processed = timezone.now()
+        else:
+            self.status = "pending"
+            self.datetime_next_attempt = timezone.now() + timedelta(
+                minutes=2 ** self.attempts
+            )
+        self.save()
@@ -3,11 +3,25 @@ Celery tasks for mail handling
 """
 
 # Django
-from celery.task import task
+from celery.schedules import crontab
+from celery.task import periodic_task, task
+from django.db import transaction
+from django.utils import timezone
+
+# Standard Library
+import logging
+import traceback
+from datetime import timedelta
 
 # MuckRock
 from muckrock.foia.models import FOIACommunication
 from muckrock.mailgun import utils
+from muckrock.mailgun.models import InboundEmail
+
+logger = logging.getLogger(__name__)
+
+# emails left processing for longer than this are assumed to have been lost
+STUCK_TIMEOUT = timedelta(minutes=15)
 
 
 @task(ignore_result=True, name="muckrock.mailgun.tasks.download_links")
@@ -15,3 +29,109 @@ def download_links(comm_pk):
     """Download links from the communication"""
     communication = FOIACommunication.objects.get(pk=comm_pk)
     utils.download_links(communication)
+
+
+@task(
+    ignore_result=True,
+    time_limit=10 * 60,
+    soft_time_limit=9 * 60,
+    name="muckrock.mailgun.tasks.process_inbound_email",
+)
+def process_inbound_email(inbound_pk):
+    """Process a stored incoming email for one of its recipients"""
+    # pylint: disable=import-outside-toplevel, broad-except
+    from muckrock.mailgun.views import _forward, route_recipient
+
+    with transaction.atomic():
+        inbound = (
+            InboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(
+                pk=inbound_pk,
+                status="pending",
+                datetime_next_attempt__lte=timezone.now(),
+            )
+            .first()
+        )
+        # already claimed, finished or waiting for a retry
+        if inbound is None:
+            return
+        # emails to the same address are processed in the order they arrived,
+        # this one will be queued once the earlier ones are finished
+        if inbound.is_blocked():
+            return
+        inbound.status = "processing"
+        inbound.attempts += 1
+        inbound.datetime_started = timezone.now()
+        inbound.save()
+
+    post = inbound.get_post()
+    try:
+        with transaction.atomic():
+            route_recipient(
+                post, inbound.get_files(), inbound.address, forward_errors=False
+            )
+    except Exception as exc:
+        logger.warning(
+            "Error processing inbound email %d to %s (attempt %d): %s",
+            inbound.pk,
+            inbound.address,
+            inbound.attempts,
+            exc,
+            exc_info=True,
+        )
+        inbound.fail(traceback.format_exc())
+        if inbound.status == "failed":
+            logger.error(
+                "Inbound email %d to %s failed permanently", inbound.pk, inbound.address
+            )
+            # forward the email to staff so that it is not lost
+            _forward(
+                post,
+                inbound.get_files(),
+                "Uncaught Mailgun Exception",
+                extra_content="Inbound email {} failed after {} attempts".format(
+                    inbound.pk, inbound.attempts
+                ),
+                info=True,
+            )
+        else:
+            return
+    else:
+        inbound.finish()
+
+    next_inbound = inbound.get_next()
+    if next_inbound is not None:
+        process_inbound_email.delay(next_inbound.pk)
+
+
+@periodic_task(
+    run_every=crontab(minute="*"), name="muckrock.mailgun.tasks.drain_inbound_emails"
+)
+def drain_inbound_emails():
+    """Queue incoming emails which are due to be processed
+
+    This picks up retries, emails which were waiting on earlier emails to the
+    same address, and emails whose worker was lost
+    """
+    now = timezone.now()
+    stuck = InboundEmail.objects.filter(
+        status="processing", datetime_started__lt=now - STUCK_TIMEOUT
+    )
+    for inbound in stuck:
+        inbound.fail("Processing timed out")
+
+    # only queue the first pending email for each address, the rest will be
+    # queued in order as each one finishes
+    due = (
+        InboundEmail.objects.filter(status="pending")
+        .order_by("address", "pk")
+        .distinct("address")
+        .values_list("pk", "datetime_next_attempt")
+    )
+    for pk, next_attempt in due:
+        if next_attempt <= now:
+            process_inbound_email.delay(pk)
+
+    InboundEmail.objects.filter(
+        status="done", datetime_processed__lt=now - timedelta(days=30)
+    ).delete()
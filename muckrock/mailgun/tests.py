@@ -5,9 +5,11 @@ Tests for mailgun
 # Django
 from django.conf import settings
 from django.core import mail
+from django.core.cache import cache
 from django.template.loader import render_to_string
-from django.test import RequestFactory, TestCase
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 
 # Standard Library
 import hashlib
@@ -22,12 +24,15 @@ import nose.tools
 import pytz
 import requests_mock
 from freezegun import freeze_time
+from mock import patch
 
 # MuckRock
 from muckrock.communication.models import EmailAddress, EmailError, EmailOpen
 from muckrock.core.test_utils import RunCommitHooksMixin
 from muckrock.foia.factories import FOIACommunicationFactory, FOIARequestFactory
 from muckrock.foia.models import FOIACommunication
+from muckrock.mailgun.models import InboundEmail
+from muckrock.mailgun.tasks import process_inbound_email
 from muckrock.mailgun.views import bounces, delivered, opened, route_mailgun
 from muckrock.task.models import OrphanTask
 
@@ -239,6 +244,89 @@ class TestMailgunViewHandleRequest(RunCommitHooksMixin, TestMailgunViews):
         nose.tools.eq_(mail.outbox[0].to, [from_])
 
 
+@override_settings(MAILGUN_ASYNC_INGEST=True)
+class TestMailgunInboundQueue(RunCommitHooksMixin, TestMailgunViews):
+    """Tests for queueing incoming mail to be processed asynchronously"""
+
+    def setUp(self):
+        """Set up tests"""
+        self.factory = RequestFactory()
+        mail.outbox = []
+
+    def test_queue(self):
+        """Incoming mail should be stored and processed by the worker"""
+        foia = FOIARequestFactory()
+        attachment = StringIO("Good file")
+        attachment.name = "data.pdf"
+        self.mailgun_route(to_=foia.get_request_email(), attachments=[attachment])
+
+        inbound = InboundEmail.objects.get()
+        nose.tools.eq_(inbound.status, "pending")
+        nose.tools.eq_(inbound.address, foia.get_request_email())
+        nose.tools.eq_(inbound.post["To"], [foia.get_request_email()])
+        nose.tools.eq_(foia.communications.count(), 0)
+
+        self.run_commit_hooks()
+        inbound.refresh_from_db()
+        nose.tools.eq_(inbound.status, "done")
+        nose.tools.eq_(foia.communications.count(), 1)
+        nose.tools.eq_(foia.get_files().count(), 1)
+
+    def test_get_post(self):
+        """Every value of a repeated post key should be kept"""
+        inbound = InboundEmail(
+            address="example@requests.muckrock.com",
+            post={"Received": ["first", "second"], "subject": "Old"},
+        )
+        post = inbound.get_post()
+        nose.tools.eq_(post.getlist("Received"), ["first", "second"])
+        nose.tools.eq_(post.get("Received"), "second")
+        nose.tools.eq_(post.get("subject"), "Old")
+
+    def test_ordering(self):
+        """Mail to the same address should be processed in order"""
+        foia = FOIARequestFactory()
+        self.mailgun_route(to_=foia.get_request_email(), subject="First")
+        cache.clear()
+        self.mailgun_route(to_=foia.get_request_email(), subject="Second")
+        first, second = InboundEmail.objects.all()
+
+        process_inbound_email(second.pk)
+        second.refresh_from_db()
+        nose.tools.eq_(second.status, "pending")
+
+        process_inbound_email(first.pk)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        nose.tools.eq_(first.status, "done")
+        nose.tools.eq_(second.status, "done")
+        nose.tools.eq_(
+            list(foia.communications.values_list("subject", flat=True)),
+            ["First", "Second"],
+        )
+
+    def test_dead_letter(self):
+        """Mail which keeps failing should be retried, then kept and forwarded"""
+        foia = FOIARequestFactory()
+        self.mailgun_route(to_=foia.get_request_email())
+        inbound = InboundEmail.objects.get()
+
+        with patch(
+            "muckrock.mailgun.views.route_recipient", side_effect=ValueError("Boom")
+        ):
+            for _ in range(InboundEmail.max_attempts):
+                InboundEmail.objects.filter(pk=inbound.pk).update(
+                    datetime_next_attempt=timezone.now()
+                )
+                process_inbound_email(inbound.pk)
+
+        inbound.refresh_from_db()
+        nose.tools.eq_(inbound.status, "failed")
+        nose.tools.eq_(inbound.attempts, InboundEmail.max_attempts)
+        nose.tools.ok_("Boom" in inbound.error)
+        nose.tools.eq_(len(mail.outbox), 1)
+
+
 class TestMailgunViewCatchAll(TestMailgunViews):
     """Tests for catch all"""
 
@@ -21,6 +21,7 @@ import logging
 import re
 import sys
 import time
+import uuid
 from datetime import datetime
 from email.utils import getaddresses
 from functools import wraps
@@ -38,7 +39,8 @@ from muckrock.communication.models import (
 )
 from muckrock.foia.models import FOIACommunication, FOIARequest, RawEmail
 from muckrock.foia.tasks import classify_status
-from muckrock.mailgun.tasks import download_links
+from muckrock.mailgun.models import InboundEmail
+from muckrock.mailgun.tasks import download_links, process_inbound_email
 from muckrock.task.models import (
     FileDownloadLink,
     FlaggedTask,
@@ -182,22 +184,66 @@ def route_mailgun(request):
         if not cache.add(message_id, 1, 300):
             return HttpResponse("OK")
 
-    p_request_email = re.compile(r"(\d+-\d{3,10})@%s" % settings.MAILGUN_SERVER_NAME)
-    tos = post.get("To", "") or post.get("to", "")
-    ccs = post.get("Cc", "") or post.get("cc", "")
-    name_emails = getaddresses([tos.lower(), ccs.lower()])
+    recipients = _get_recipients(post)
     logger.info(
-        "Incoming email: %s - %s - %s", name_emails, post.get("Subject", ""), message_id
+        "Incoming email: %s - %s - %s", recipients, post.get("Subject", ""), message_id
     )
-    for _, email in name_emails:
-        m_request_email = p_request_email.match(email)
-        if m_request_email:
-            _handle_request(request, m_request_email.group(1))
-        elif email.endswith("@%s" % settings.MAILGUN_SERVER_NAME):
-            _catch_all(request, email)
+    if settings.MAILGUN_ASYNC_INGEST:
+        _queue_mail(post, request.FILES, message_id, recipients)
+    else:
+        for address in recipients:
+            route_recipient(post, request.FILES, address)
     return HttpResponse("OK")
 
 
+def _request_mail_id(email):
+    """Get the mail ID if this is the address for a request"""
+    p_request_email = re.compile(r"(\d+-\d{3,10})@%s" % settings.MAILGUN_SERVER_NAME)
+    m_request_email = p_request_email.match(email)
+    if m_request_email:
+        return m_request_email.group(1)
+    return None
+
+
+def _get_recipients(post):
+    """Get the addresses at our domain an email was sent to"""
+    tos = post.get("To", "") or post.get("to", "")
+    ccs = post.get("Cc", "") or post.get("cc", "")
+    return [
+        email
+        for _, email in getaddresses([tos.lower(), ccs.lower()])
+        if _request_mail_id(email)
+        or email.endswith("@%s" % settings.MAILGUN_SERVER_NAME)
+    ]
+
+
+def _queue_mail(post, files, message_id, recipients):
+    """Store the email to be processed by the workers, one per recipient"""
+    message_key = uuid.uuid4()
+    stored_files = InboundEmail.store_files(message_key, files)
+    with transaction.atomic():
+        for address in recipients:
+            inbound = InboundEmail.objects.create(
+                address=address,
+                message_id=(message_id or "")[:255],
+                message_key=message_key,
+                post=dict(post.lists()),
+                files=stored_files,
+            )
+            transaction.on_commit(
+                lambda pk=inbound.pk: process_inbound_email.delay(pk)
+            )
+
+
+def route_recipient(post, files, address, forward_errors=True):
+    """Handle an incoming email for one of the addresses it was sent to"""
+    mail_id = _request_mail_id(address)
+    if mail_id:
+        _handle_request(post, files, mail_id, forward_errors)
+    elif address.endswith("@%s" % settings.MAILGUN_SERVER_NAME):
+        _catch_all(post, files, address)
+
+
 def _parse_email_headers(post):
     """Parse email headers and return email address models"""
     from_ = post.get("From", "")
@@ -209,14 +255,17 @@ def _parse_email_headers(post):
     return from_email, to_emails, cc_emails
 
 
-def _handle_request(request, mail_id):
-    """Handle incoming mailgun FOI request messages"""
+def _handle_request(post, files, mail_id, forward_errors=True):
+    """Handle incoming mailgun FOI request messages
+
+    Unexpected errors are forwarded to staff, unless forward_errors is False, in
+    which case they are raised so the email may be retried
+    """
     # this function needs to be refactored
     # pylint: disable=broad-except
     # pylint: disable=too-many-locals
     # pylint: disable=too-many-branches
     # pylint: disable=too-many-statements
-    post = request.POST
     from_email, to_emails, cc_emails = _parse_email_headers(post)
     subject = post.get("Subject") or post.get("subject", "")
     message_id = (
@@ -228,7 +277,7 @@ def _handle_request(request, mail_id):
 
         # extra logging for next request portals for now
         if foia.portal and foia.portal.type == "nextrequest":
-            _log_mail(request)
+            _log_mail(post)
 
         if foia.deleted:
             if from_email is not None:
@@ -258,7 +307,7 @@ def _handle_request(request, mail_id):
                 subject,
                 message_id,
                 post,
-                request.FILES,
+                files,
                 foia,
             )
             OrphanTask.objects.create(
@@ -293,7 +342,7 @@ def _handle_request(request, mail_id):
             email_comm.to_emails.set(to_emails)
             email_comm.cc_emails.set(cc_emails)
             transaction.on_commit(lambda: RawEmail.objects.make(message_id))
-            comm.process_attachments(request.FILES)
+            comm.process_attachments(files)
             transaction.on_commit(lambda: download_links(comm.pk))
 
             if foia.portal:
@@ -357,27 +406,28 @@ def _handle_request(request, mail_id):
             subject,
             message_id,
             post,
-            request.FILES,
+            files,
             foia,
         )
         OrphanTask.objects.create(reason="ia", communication=comm, address=mail_id)
         return HttpResponse("WARNING")
     except Exception as exc:
+        if not forward_errors:
+            raise
         # If anything I haven't accounted for happens, at the very least forward
         # the email to requests so it isn't lost
         logger.error(
             "Uncaught Mailgun Exception - %s: %s", mail_id, exc, exc_info=sys.exc_info()
         )
-        _forward(post, request.FILES, "Uncaught Mailgun Exception", info=True)
+        _forward(post, files, "Uncaught Mailgun Exception", info=True)
         return HttpResponse("ERROR")
 
     return HttpResponse("OK")
 
 
-def _catch_all(request, address):
+def _catch_all(post, files, address):
     """Handle emails sent to other addresses"""
 
-    post = request.POST
     from_email, to_emails, cc_emails = _parse_email_headers(post)
     subject = post.get("Subject") or post.get("subject", "")
     message_id = (
@@ -397,7 +447,7 @@ def _catch_all(request, address):
             subject,
             message_id,
             post,
-            request.FILES,
+            files,
             foia,
         )
         OrphanTask.objects.create(reason="ia", communication=comm, address=address)
@@ -648,10 +698,10 @@ def _forward(post, files, title="", extra_content="", info=False):
     email.send(fail_silently=False)
 
 
-def _log_mail(request):
+def _log_mail(post):
     """Log a request"""
     body = []
-    for key, value in request.POST.items():
+    for key, value in post.items():
         body.append("\n{}:".format(key))
         body.append(str(value))
     email = EmailMessage(
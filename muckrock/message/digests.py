@@ -4,16 +4,17 @@ Digest objects for the messages app
 
 # Django
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.mail import get_connection
 from django.db.models import DurationField, F, Q
 from django.db.models.functions import Cast, Now
 from django.utils import timezone
 
 # Standard Library
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 from datetime import date, timedelta
 
 # Third Party
-from actstream.models import Action
 from dateutil.relativedelta import relativedelta
 
 # MuckRock
@@ -96,44 +97,99 @@ class Digest(TemplateEmail):
         return self.user
 
 
+# a classifier is a tuple of a key and a verb phrase to match
+# e.g. ('no_documents', 'no responsive documents')
+FOIA_CLASSIFIERS = [
+    ("completed", "completed"),
+    ("rejected", "rejected"),
+    ("no_documents", "no responsive documents"),
+    ("require_payment", "payment"),
+    ("require_fix", "require_fix"),
+    ("interim_response", "processing"),
+    ("acknowledged", "acknowledged"),
+    ("received", "sent a communication"),
+]
+
+
+def load_notifications(users, since):
+    """Load the unread notifications since the given time for a group of users
+
+    Returns a dictionary mapping user IDs to their notifications, and a
+    dictionary mapping the (content type ID, object ID) of every request or
+    question referenced by the notifications to the ID of the user who owns it
+    """
+    notifications = (
+        Notification.objects.filter(user__in=users, read=False, datetime__gte=since)
+        .select_related("action")
+        .prefetch_related("action__actor", "action__target", "action__action_object")
+    )
+    user_notifications = defaultdict(list)
+    for notification in notifications:
+        user_notifications[notification.user_id].append(notification)
+    owners = {}
+    for model, owner_field in [
+        (FOIARequest, "composer__user_id"),
+        (Question, "user_id"),
+    ]:
+        content_type = ContentType.objects.get_for_model(model)
+        object_ids = {
+            object_id
+            for notification in notifications
+            for ct_id, object_id in _action_objects(notification.action)
+            if ct_id == content_type.pk
+        }
+        owners.update(
+            ((content_type.pk, str(pk)), owner_id)
+            for pk, owner_id in model.objects.filter(pk__in=object_ids).values_list(
+                "pk", owner_field
+            )
+        )
+    return user_notifications, owners
+
+
+def _action_objects(action):
+    """The content type and object IDs for the objects involved in an action"""
+    return [
+        (action.actor_content_type_id, action.actor_object_id),
+        (action.target_content_type_id, action.target_object_id),
+        (action.action_object_content_type_id, action.action_object_object_id),
+    ]
+
+
 class ActivityDigest(Digest):
     """
     An ActivityDigest describes a collection of activity over a duration, which
     is then rendered into an email and delivered at a scheduled interval.
+
+    The notifications may be loaded ahead of time for many users at once using
+    `load_notifications`, and passed in along with the owners of the objects they
+    reference.  Otherwise they are loaded for the single user.  Notifications are
+    then classified in Python, without any further queries.
     """
 
     text_template = "message/digest/digest.txt"
     html_template = "message/digest/digest.html"
 
-    # Here we scaffold out the activity dictionary.
-    # It is scaffolded to prevent key errors when counting
-    # activity, as well as to provide some guidance for
-    # which activities to filter from the global stream.
-
     # Activity is independent from template context because
     # we use activity counts to influence other parts of the
     # email, like the subject line and whether or not to
     # even send the email at all.
 
-    activity = {
-        "count": 0,
-        "requests": {"count": 0, "mine": None, "following": None},
-        "questions": {"count": 0, "mine": None, "following": None},
-    }
-
     # Most of the work re: composing the email takes place
     # at init. This is by design, since digests should require
     # a minimum of configuration outside of their own configuration,
     # which is their responsibility. In other words, a digest really
     # only needs to know its user.
 
-    # Question: should interval be made into a required init value?
-    # On the one hand, having interval hardcoded into subclasses is
-    # less flexible. On the other, this flexibility might not be required
-    # beyond specifically-defined subclasses.
-
-    def __init__(self, **kwargs):
+    def __init__(self, notifications=None, owners=None, **kwargs):
         """Initialize the digest with a dynamic subject."""
+        self.notifications = notifications
+        self.owners = owners
+        self.activity = {
+            "count": 0,
+            "requests": {"count": 0, "mine": None, "following": None},
+            "questions": {"count": 0, "mine": None, "following": None},
+        }
         super(ActivityDigest, self).__init__(**kwargs)
         self.subject = self.get_subject()
 
@@ -148,33 +204,37 @@ class ActivityDigest(Digest):
         """Filter a list of notifications for a specific model,
         split between objects owned by the user and objects followed by the user."""
         user = self.get_user()
-        model_notifications = notifications.for_model(model)
-        own_model_actions = Action.objects.owned_by(user, model)
-        own_model_notifications = model_notifications.filter(
-            action__in=own_model_actions
-        )
-        following_model_notifications = model_notifications.exclude(
-            action__in=own_model_actions
-        )
-        return {
-            "count": model_notifications.count(),
-            "mine": own_model_notifications,
-            "following": following_model_notifications,
-        }
+        model_ct = ContentType.objects.get_for_model(model)
+        mine = []
+        following = []
+        for notification in notifications:
+            objects = [
+                (ct_id, object_id)
+                for ct_id, object_id in _action_objects(notification.action)
+                if ct_id == model_ct.pk
+            ]
+            if not objects:
+                continue
+            if notification.action.public and any(
+                self.owners.get(obj) == user.pk for obj in objects
+            ):
+                mine.append(notification)
+            else:
+                following.append(notification)
+        return {"count": len(mine) + len(following), "mine": mine, "following": following}
 
     def get_activity(self):
         """Returns a list of activities to be sent in the email"""
-        duration = self.get_duration()
-        user = self.get_user()
-        # get unread notifications for the user that are new since the last email
-        notifications = (
-            Notification.objects.for_user(user)
-            .get_unread()
-            .filter(datetime__gte=duration)
-        )
-        self.activity["requests"] = self.foia_notifications(notifications)
+        if self.notifications is None:
+            # get unread notifications for the user that are new since the last email
+            user = self.get_user()
+            user_notifications, self.owners = load_notifications(
+                [user], self.get_duration()
+            )
+            self.notifications = user_notifications[user.pk]
+        self.activity["requests"] = self.foia_notifications(self.notifications)
         self.activity["questions"] = self.notifications_for_model(
-            notifications, Question
+            self.notifications, Question
         )
         self.activity["count"] = (
             self.activity["requests"]["count"] + self.activity["questions"]["count"]
@@ -187,30 +247,10 @@ class ActivityDigest(Digest):
             notifications, FOIARequest
         )
         filtered_notifications["mine"] = self.classify_request_notifications(
-            filtered_notifications["mine"],
-            [
-                ("completed", "completed"),
-                ("rejected", "rejected"),
-                ("no_documents", "no responsive documents"),
-                ("require_payment", "payment"),
-                ("require_fix", "require_fix"),
-                ("interim_response", "processing"),
-                ("acknowledged", "acknowledged"),
-                ("received", "sent a communication"),
-            ],
+            filtered_notifications["mine"], FOIA_CLASSIFIERS
         )
         filtered_notifications["following"] = self.classify_request_notifications(
-            filtered_notifications["following"],
-            [
-                ("completed", "completed"),
-                ("rejected", "rejected"),
-                ("no_documents", "no responsive documents"),
-                ("require_payment", "payment"),
-                ("require_fix", "require_fix"),
-                ("interim_response", "processing"),
-                ("acknowledged", "acknowledged"),
-                ("received", "sent a communication"),
-            ],
+            filtered_notifications["following"], FOIA_CLASSIFIERS
         )
         filtered_notifications["count"] = (
             filtered_notifications["mine"]["count"]
@@ -220,16 +260,14 @@ class ActivityDigest(Digest):
 
     def classify_request_notifications(self, notifications, classifiers):
         """Break a single list of notifications into a classified dictionary."""
-        classified = {}
-        # a classifier should be a tuple of a key and a verb phrase to filter by
-        # e.g. ('no_documents', 'no responsive documents')
-        for classifier in classifiers:
-            classified[classifier[0]] = notifications.filter(
-                action__verb__icontains=classifier[1]
-            )
+        classified = {key: [] for key, _ in classifiers}
         activity_count = 0
-        for _, classified_stream in classified.items():
-            activity_count += len(classified_stream)
+        for notification in notifications:
+            verb = notification.action.verb.lower()
+            for key, phrase in classifiers:
+                if phrase in verb:
+                    classified[key].append(notification)
+                    activity_count += 1
         classified["count"] = activity_count
         return classified
 
@@ -248,6 +286,32 @@ class ActivityDigest(Digest):
         return super(ActivityDigest, self).send(fail_silently)
 
 
+def send_activity_digests(users, subject, interval):
+    """Build and send activity digests for a group of users
+
+    Notifications for all of the users are loaded at once, and the emails are
+    sent over a single connection.  Returns the number of emails sent.
+    """
+    user_notifications, owners = load_notifications(
+        users, timezone.now() - interval
+    )
+    emails = []
+    for user in users:
+        email = ActivityDigest(
+            user=user,
+            subject=subject,
+            interval=interval,
+            notifications=user_notifications[user.pk],
+            owners=owners,
+        )
+        if email.activity["count"] > 0:
+            emails.append(email)
+    if not emails:
+        return 0
+    with get_connection() as connection:
+        return connection.send_messages(emails)
+
+
 class StaffDigest(Digest):
     """An email that digests other site stats for staff members."""
 
@@ -29,6 +29,17 @@ from muckrock.message.notifications import SlackNotification
 logger = logging.getLogger(__name__)
 
 
+DIGEST_INTERVALS = {
+    "hourly": relativedelta(hours=1),
+    "daily": relativedelta(days=1),
+    "weekly": relativedelta(weeks=1),
+    "monthly": relativedelta(months=1),
+}
+
+# number of users to send digests to in each task
+DIGEST_BATCH_SIZE = 200
+
+
 @task(
     time_limit=600,
     soft_time_limit=570,
@@ -36,28 +47,34 @@ logger = logging.getLogger(__name__)
 )
 def send_activity_digest(user_id, subject, preference):
     """Individual task to create and send an activity digest to a user."""
-    user = User.objects.get(id=user_id)
-    interval = {
-        "hourly": relativedelta(hours=1),
-        "daily": relativedelta(days=1),
-        "weekly": relativedelta(weeks=1),
-        "monthly": relativedelta(months=1),
-    }[preference]
+    send_activity_digests([user_id], subject, preference)
+
+
+@task(
+    time_limit=600,
+    soft_time_limit=570,
+    name="muckrock.message.tasks.send_activity_digests",
+)
+def send_activity_digests(user_ids, subject, preference):
+    """Create and send activity digests to a batch of users"""
+    users = list(User.objects.filter(id__in=user_ids))
+    interval = DIGEST_INTERVALS[preference]
 
     logger.info(
-        "Starting activity digest at: %s User: %s Subject: %s Interval: %s",
+        "Starting activity digests at: %s Users: %d Subject: %s Interval: %s",
         timezone.now(),
-        user,
+        len(users),
         subject,
         interval,
     )
     try:
-        email = digests.ActivityDigest(user=user, subject=subject, interval=interval)
-        email.send()
+        sent = digests.send_activity_digests(users, subject, interval)
+        logger.info("Sent %d activity digests", sent)
     except SoftTimeLimitExceeded:
         logger.error(
-            "Send Activity Digest took too long. " "User: %s, Subject: %s, Interval %s",
-            user,
+            "Send Activity Digests took too long. "
+            "Users: %s, Subject: %s, Interval %s",
+            user_ids,
             subject,
             interval,
         )
@@ -65,11 +82,16 @@ def send_activity_digest(user_id, subject, preference):
 
 def send_digests(preference, subject):
     """Helper to send out timed digests"""
-    users = User.objects.filter(
-        profile__email_pref=preference, notifications__read=False
-    ).distinct()
-    for user in users:
-        send_activity_digest.delay(user.pk, subject, preference)
+    user_ids = list(
+        User.objects.filter(profile__email_pref=preference, notifications__read=False)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+        .distinct()
+    )
+    for i in range(0, len(user_ids), DIGEST_BATCH_SIZE):
+        send_activity_digests.delay(
+            user_ids[i : i + DIGEST_BATCH_SIZE], subject, preference
+        )
 
 
 # every hour
@@ -5,6 +5,7 @@ correctly grabbing site activity.
 """
 
 # Django
+from django.core import mail
 from django.test import TestCase
 
 # Standard Library
@@ -94,8 +95,8 @@ class TestDailyDigest(TestCase):
             1,
             "There should be activity that is not user initiated.",
         )
-        eq_(email.activity["questions"]["mine"].first().action.actor, other_user)
-        eq_(email.activity["questions"]["mine"].first().action.verb, "answered")
+        eq_(email.activity["questions"]["mine"][0].action.actor, other_user)
+        eq_(email.activity["questions"]["mine"][0].action.verb, "answered")
         eq_(email.send(), 1, "The email should send.")
 
     def test_digest_follow_questions(self):
@@ -107,14 +108,45 @@ class TestDailyDigest(TestCase):
         answer = AnswerFactory(user=other_user, question=question)
         email = self.digest(user=self.user, interval=self.interval)
         eq_(email.activity["count"], 1, "There should be activity.")
-        eq_(email.activity["questions"]["following"].first().action.actor, other_user)
+        eq_(email.activity["questions"]["following"][0].action.actor, other_user)
         eq_(
-            email.activity["questions"]["following"].first().action.action_object,
+            email.activity["questions"]["following"][0].action.action_object,
             answer,
         )
-        eq_(email.activity["questions"]["following"].first().action.target, question)
+        eq_(email.activity["questions"]["following"][0].action.target, question)
         eq_(email.send(), 1, "The email should send.")
 
+    def test_classify_notifications(self):
+        """Request notifications should be classified by their verb"""
+        agency = AgencyFactory()
+        my_foia = FOIARequestFactory(composer__user=self.user)
+        other_foia = FOIARequestFactory()
+        notify(self.user, new_action(agency, "completed", target=my_foia))
+        notify(self.user, new_action(agency, "rejected", target=other_foia))
+        notify(self.user, new_action(agency, "acknowledged", target=other_foia))
+        email = self.digest(user=self.user, interval=self.interval)
+        requests = email.activity["requests"]
+        eq_(requests["count"], 3)
+        eq_(requests["mine"]["count"], 1)
+        eq_(len(requests["mine"]["completed"]), 1)
+        eq_(requests["following"]["count"], 2)
+        eq_(len(requests["following"]["rejected"]), 1)
+        eq_(len(requests["following"]["acknowledged"]), 1)
+
+    def test_send_activity_digests(self):
+        """Digests should be sent to a batch of users at once"""
+        agency = AgencyFactory()
+        foia = FOIARequestFactory(agency=agency)
+        action = new_action(agency, "completed", target=foia)
+        users = UserFactory.create_batch(3)
+        notify(users[:2], action)
+        eq_(
+            digests.send_activity_digests(users, "Daily Digest", self.interval),
+            2,
+            "Only users with activity should be sent a digest.",
+        )
+        eq_(len(mail.outbox), 2)
+
 
 class TestStaffDigest(TestCase):
     """The Staff Digest updates us about the state of the website."""
@@ -27,14 +27,14 @@ class TestDailyTask(TestCase):
     def setUp(self):
         self.user = UserFactory()
 
-    @mock.patch("muckrock.message.tasks.send_activity_digest.delay")
+    @mock.patch("muckrock.message.tasks.send_activity_digests.delay")
     def test_when_unread(self, mock_send):
         """The send method should be called when a user has unread notifications."""
         NotificationFactory(user=self.user)
         tasks.daily_digest()
-        mock_send.assert_called_with(self.user.pk, "Daily Digest", "daily")
+        mock_send.assert_called_with([self.user.pk], "Daily Digest", "daily")
 
-    @mock.patch("muckrock.message.tasks.send_activity_digest.delay")
+    @mock.patch("muckrock.message.tasks.send_activity_digests.delay")
     def test_when_no_unread(self, mock_send):
         """The send method should not be called when a user does not have unread notifications."""
         tasks.daily_digest()
@@ -8,12 +8,11 @@ from django.db import models
 from django.urls import reverse
 
 # Third Party
-from actstream.models import followers
 from taggit.managers import TaggableManager
 
 # MuckRock
 from muckrock.accounts.models import Profile
-from muckrock.core.utils import new_action, notify
+from muckrock.core.utils import new_action, notify, notify_followers
 from muckrock.foia.models import FOIARequest
 from muckrock.tags.models import TaggedItemBase
 
@@ -104,7 +103,7 @@ class Answer(models.Model):
             )
             # Notify the question's owner and its followers about the new answer
             notify(self.question.user, action)
-            notify(followers(self.question), action)
+            notify_followers(self.question, action)
 
     class Meta:
         ordering = ["date"]
@@ -323,6 +323,7 @@ CELERY_IMPORTS = (
     "muckrock.agency.tasks",
     "muckrock.crowdsource.tasks",
     "muckrock.foia.tasks",
+    "muckrock.mailgun.tasks",
     "muckrock.portal.tasks",
     "muckrock.squarelet.tasks",
     "muckrock.task.tasks",
@@ -331,7 +332,10 @@ CELERY_WORKER_MAX_TASKS_PER_CHILD = os.environ.get(
     "CELERY_WORKER_MAX_TASKS_PER_CHILD", 100
 )
 CELERY_TASK_TIME_LIMIT = os.environ.get("CELERY_TASK_TIME_LIMIT", 5 * 60)
-CELERY_TASK_ROUTES = {"muckrock.foia.tasks.send_fax": {"queue": "phaxio"}}
+CELERY_TASK_ROUTES = {
+    "muckrock.foia.tasks.send_fax": {"queue": "phaxio"},
+    "muckrock.mailgun.tasks.process_inbound_email": {"queue": "mailgun"},
+}
 CELERY_WORKER_CONCURRENCY = os.environ.get("CELERY_WORKER_CONCURRENCY")
 CELERY_REDIS_MAX_CONNECTIONS = os.environ.get("CELERY_REDIS_MAX_CONNECTIONS")
 if CELERY_REDIS_MAX_CONNECTIONS is not None:
@@ -444,6 +448,8 @@ MAILGUN_SERVER_NAME = os.environ.get("MAILGUN_SERVER_NAME", "requests.muckrock.c
 MAILGUN_API_URL = os.environ.get(
     "MAILGUN_API_URL", f"https://api.mailgun.net/v3/{MAILGUN_SERVER_NAME}"
 )
+# store incoming mail from the webhook and process it on the mailgun queue
+MAILGUN_ASYNC_INGEST = boolcheck(os.environ.get("MAILGUN_ASYNC_INGEST", False))
 
 
 EMAIL_SUBJECT_PREFIX = "[Muckrock]"
@@ -487,7 +493,18 @@ DATABASES = {
 DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
 
 CACHES = {
-    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    # shared between processes in redis, with a small local cache in each process
+    "default": {
+        "BACKEND": "muckrock.core.cache.TieredRedisCache",
+        "LOCATION": REDIS_URL,
+        "KEY_PREFIX": "cache",
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "COMPRESSOR": "django_redis.compressors.zlib.ZlibCompressor",
+            "LOCAL_MAX_ENTRIES": int(os.environ.get("CACHE_LOCAL_MAX_ENTRIES", 1000)),
+            "LOCAL_TIMEOUT": int(os.environ.get("CACHE_LOCAL_TIMEOUT", 30)),
+        },
+    },
     "lock": {
         "BACKEND": "redis_lock.django_cache.RedisCache",
         "LOCATION": REDIS_URL,
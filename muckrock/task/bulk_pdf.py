@@ -0,0 +1,252 @@
+"""
+Generate the bulk snail mail PDF for printing
+
+The snail_mail_bulk_pdf_task splits the open snail mail tasks into chunks, which
+are prepared in parallel by the workers.  Each chunk merges its letters into a
+part PDF in storage, and records the page counts and attachments for the cover
+sheet in redis.  A chunk which fails records its tasks as failed instead, so they
+are flagged as errors on the cover sheet.  The last chunk to finish queues the
+merge, which combines the cover sheet and the parts in a temporary file on disk,
+and uploads it to S3 in parts, so that memory use does not grow with the number
+of letters.
+"""
+
+# Django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+# Standard Library
+import json
+import logging
+import shutil
+from contextlib import ExitStack
+from io import BytesIO
+from tempfile import TemporaryFile
+
+# Third Party
+import boto3
+from django_redis import get_redis_connection
+from fpdf import FPDF
+from PyPDF2 import PdfFileMerger
+
+# MuckRock
+from muckrock.foia.models import FOIAFile
+from muckrock.task.models import SnailMailTask
+from muckrock.task.pdf import CoverPDF, SnailMailPDF
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 20
+
+
+class BulkPDFRun:
+    """Tracks the progress of generating a bulk PDF in redis"""
+
+    prefix = "snail_mail_pdf"
+    # how long to keep the task list and results for a run
+    run_timeout = 24 * 60 * 60
+
+    def __init__(self, pdf_name):
+        self.pdf_name = pdf_name
+        self.redis = get_redis_connection("lock")
+
+    def _key(self, name):
+        """Build a redis key"""
+        return ":".join((self.prefix, self.pdf_name, name))
+
+    def part_name(self, index):
+        """The storage name for the merged letters of a chunk"""
+        return "{}.parts/{:05d}.pdf".format(self.pdf_name, index)
+
+    def start(self, task_pks):
+        """Record the tasks for this run, returns them split into chunks"""
+        chunks = [
+            task_pks[i : i + CHUNK_SIZE] for i in range(0, len(task_pks), CHUNK_SIZE)
+        ]
+        pipe = self.redis.pipeline()
+        pipe.set(self._key("pending"), len(chunks), ex=self.run_timeout)
+        pipe.set(self._key("chunks"), len(chunks), ex=self.run_timeout)
+        if task_pks:
+            pipe.rpush(self._key("tasks"), *task_pks)
+            pipe.expire(self._key("tasks"), self.run_timeout)
+        pipe.execute()
+        return chunks
+
+    def finish_chunk(self):
+        """Mark one chunk as finished, returns True if it was the last one"""
+        return self.redis.decr(self._key("pending")) <= 0
+
+    def record(self, results):
+        """Record the cover sheet information for a list of letters"""
+        if not results:
+            return
+        key = self._key("results")
+        mapping = {
+            task_pk: json.dumps(
+                {
+                    "pages": page_count,
+                    "files": [
+                        (file_.pk, status, pages) for file_, status, pages in files
+                    ],
+                }
+            )
+            for task_pk, page_count, files in results
+        }
+        pipe = self.redis.pipeline()
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, self.run_timeout)
+        pipe.execute()
+
+    def fail_chunk(self, task_pks):
+        """Record the tasks of a chunk which could not be prepared"""
+        if not task_pks:
+            return
+        key = self._key("failed")
+        pipe = self.redis.pipeline()
+        pipe.sadd(key, *task_pks)
+        pipe.expire(key, self.run_timeout)
+        pipe.execute()
+
+    def get_task_pks(self):
+        """Get the tasks for this run, in order"""
+        return [int(pk) for pk in self.redis.lrange(self._key("tasks"), 0, -1)]
+
+    def get_chunk_count(self):
+        """Get the number of chunks in this run"""
+        return int(self.redis.get(self._key("chunks")) or 0)
+
+    def get_results(self):
+        """Get the cover sheet information for each letter, by task"""
+        return {
+            int(task_pk): json.loads(value)
+            for task_pk, value in self.redis.hgetall(self._key("results")).items()
+        }
+
+    def get_failed(self):
+        """Get the tasks from chunks which could not be prepared"""
+        return {int(pk) for pk in self.redis.smembers(self._key("failed"))}
+
+    def clear(self):
+        """Clear the redis keys and part files for this run"""
+        for index in range(self.get_chunk_count()):
+            default_storage.delete(self.part_name(index))
+        self.redis.delete(
+            self._key("pending"),
+            self._key("chunks"),
+            self._key("tasks"),
+            self._key("results"),
+            self._key("failed"),
+        )
+
+
+def blank_page():
+    """A blank page, to align letters for double sided printing"""
+    blank_pdf = FPDF()
+    blank_pdf.add_page()
+    return BytesIO(blank_pdf.output(dest="S").encode("latin-1"))
+
+
+def prepare_chunk(run, index, task_pks):
+    """Prepare the letters for a chunk of tasks and merge them into a part"""
+    snails = SnailMailTask.objects.filter(pk__in=task_pks).preload_pdf().in_bulk()
+    merger = PdfFileMerger(strict=False)
+    results = []
+    for task_pk in task_pks:
+        snail = snails.get(task_pk)
+        if snail is None:
+            continue
+        pdf = SnailMailPDF(
+            snail.communication, snail.category, snail.switch, snail.amount
+        )
+        prepared_pdf, page_count, files, _mail = pdf.prepare()
+        if prepared_pdf is not None:
+            merger.append(prepared_pdf)
+            # ensure we align for double sided printing
+            if page_count % 2 == 1:
+                merger.append(blank_page())
+        results.append((snail.pk, page_count, files))
+    part = BytesIO()
+    merger.write(part)
+    default_storage.save(run.part_name(index), ContentFile(part.getvalue()))
+    # only record the letters once they are in the saved part
+    run.record(results)
+
+
+def cover_info(run):
+    """Build the cover sheet information from the recorded results
+
+    Letters from failed chunks are listed as errors
+    """
+    results = run.get_results()
+    for task_pk in run.get_failed():
+        results[task_pk] = {"pages": None, "files": []}
+    snails = SnailMailTask.objects.filter(pk__in=results).preload_pdf().in_bulk()
+    files = FOIAFile.objects.in_bulk(
+        [file_pk for result in results.values() for file_pk, _, _ in result["files"]]
+    )
+    return [
+        (
+            snails[task_pk],
+            results[task_pk]["pages"],
+            [
+                (files[file_pk], status, pages)
+                for file_pk, status, pages in results[task_pk]["files"]
+                if file_pk in files
+            ],
+        )
+        for task_pk in run.get_task_pks()
+        if task_pk in results and task_pk in snails
+    ]
+
+
+def merge_parts(run):
+    """Merge the cover sheet and the parts, and upload the bulk PDF
+
+    The part files and redis keys are cleared even if the merge fails
+    """
+    try:
+        _merge_parts(run)
+    finally:
+        run.clear()
+
+
+def _merge_parts(run):
+    """Merge the cover sheet and the parts, and upload the bulk PDF"""
+    failed = run.get_failed()
+    if failed:
+        logger.error(
+            "Bulk snail mail PDF %s: %d letters failed to prepare",
+            run.pdf_name,
+            len(failed),
+        )
+    cover_pdf = CoverPDF(cover_info(run))
+    cover_pdf.generate()
+    if cover_pdf.page % 2 == 1:
+        cover_pdf.add_page()
+
+    merger = PdfFileMerger(strict=False)
+    merger.append(BytesIO(cover_pdf.output(dest="S").encode("latin-1")))
+    with ExitStack() as stack:
+        # copy each part to disk, as the merger reads from them while writing
+        for index in range(run.get_chunk_count()):
+            name = run.part_name(index)
+            if not default_storage.exists(name):
+                continue
+            part = stack.enter_context(TemporaryFile())
+            with default_storage.open(name, "rb") as part_file:
+                shutil.copyfileobj(part_file, part)
+            part.seek(0)
+            merger.append(part)
+
+        bulk_pdf = stack.enter_context(TemporaryFile())
+        merger.write(bulk_pdf)
+        bulk_pdf.seek(0)
+        # upload_fileobj uploads large files in parts, reading them as it goes
+        s3 = boto3.client("s3")
+        s3.upload_fileobj(
+            bulk_pdf,
+            settings.AWS_MEDIA_BUCKET_NAME,
+            run.pdf_name,
+            ExtraArgs={"ACL": settings.AWS_DEFAULT_ACL},
+        )
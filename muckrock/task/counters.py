@@ -0,0 +1,108 @@
+"""
+Counts of the open tasks of each type, shown as badges on the task list
+
+Counting every open task joins all of the task type tables, so the counts are
+kept in the cache instead.  They are adjusted by signals as tasks are created,
+resolved, deferred or deleted, and periodically recounted from the database,
+which also picks up deferred tasks whose date has arrived.
+"""
+
+# Django
+from django.core.cache import cache
+from django.db.models import Count
+
+# Standard Library
+from datetime import date
+
+# MuckRock
+from muckrock.task.models import (
+    CrowdfundTask,
+    FlaggedTask,
+    MultiRequestTask,
+    NewAgencyTask,
+    NewPortalTask,
+    OrphanTask,
+    PaymentInfoTask,
+    PortalTask,
+    ProjectReviewTask,
+    ResponseTask,
+    ReviewAgencyTask,
+    SnailMailTask,
+    StatusChangeTask,
+    Task,
+)
+
+# counter name -> task type
+COUNTERS = {
+    "orphan": OrphanTask,
+    "snail_mail": SnailMailTask,
+    "review_agency": ReviewAgencyTask,
+    "flagged": FlaggedTask,
+    "projectreview": ProjectReviewTask,
+    "new_agency": NewAgencyTask,
+    "response": ResponseTask,
+    "status_change": StatusChangeTask,
+    "crowdfund": CrowdfundTask,
+    "multirequest": MultiRequestTask,
+    "portal": PortalTask,
+    "new_portal": NewPortalTask,
+    "payment_info": PaymentInfoTask,
+}
+COUNTER_NAMES = {model: name for name, model in COUNTERS.items()}
+
+# longer than the recount interval, so the counts never expire while the
+# recount task is running, but will not be stale for long if it stops
+TIMEOUT = 60 * 60
+
+
+def _key(name):
+    """The cache key for a counter"""
+    return "task_count:{}".format(name)
+
+
+def is_open(resolved, date_deferred):
+    """Is a task with these values counted?"""
+    return not resolved and (date_deferred is None or date_deferred <= date.today())
+
+
+def count_tasks():
+    """Count all of the open tasks of each type in the database"""
+    return (
+        Task.objects.get_unresolved()
+        .get_undeferred()
+        .aggregate(
+            all=Count("id"),
+            **{
+                name: Count(model._meta.model_name)
+                for name, model in COUNTERS.items()
+            }
+        )
+    )
+
+
+def recount():
+    """Recount the open tasks and store the counts in the cache"""
+    counts = count_tasks()
+    cache.set_many({_key(name): count for name, count in counts.items()}, TIMEOUT)
+    return counts
+
+
+def get_counts():
+    """Get the number of open tasks of each type"""
+    names = ["all"] + list(COUNTERS)
+    cached = cache.get_many([_key(name) for name in names])
+    if len(cached) < len(names):
+        return recount()
+    return {name: cached[_key(name)] for name in names}
+
+
+def adjust(model, delta):
+    """Adjust the counters for a task of the given type"""
+    for name in ("all", COUNTER_NAMES.get(model)):
+        if name is None:
+            continue
+        try:
+            cache.incr(_key(name), delta)
+        except ValueError:
+            # the counter is not cached, it will be recounted when next needed
+            pass
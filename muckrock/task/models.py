@@ -4,10 +4,12 @@ Models for the Task application
 # Django
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.mail import send_mail
 from django.db import models, transaction
-from django.db.models import Case, Count, Max, When
-from django.db.models.functions import Cast, Now
+from django.db.models import Case, Count, F, Max, OuterRef, Subquery, When, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Coalesce, Now, RowNumber
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils import timezone
@@ -15,8 +17,8 @@ from django.utils.html import linebreaks, urlize
 
 # Standard Library
 import logging
+from collections import defaultdict
 from datetime import date
-from itertools import groupby
 
 # Third Party
 import bleach
@@ -30,7 +32,16 @@ from zenpy.lib.api_objects import (
 from zenpy.lib.exception import APIException
 
 # MuckRock
-from muckrock.communication.models import Check, EmailAddress, PhoneNumber
+from muckrock.communication.models import (
+    Check,
+    EmailAddress,
+    EmailCommunication,
+    EmailError,
+    EmailOpen,
+    FaxCommunication,
+    FaxError,
+    PhoneNumber,
+)
 from muckrock.core.models import ExtractDay
 from muckrock.core.utils import zoho_get, zoho_post
 from muckrock.foia.models import STATUS, FOIATemplate
@@ -306,144 +317,47 @@ class ReviewAgencyTask(Task):
     def get_absolute_url(self):
         return reverse("review-agency-task", kwargs={"pk": self.pk})
 
-    def get_review_data(self):
-        """Get all the data on all open requests for the agency"""
-        review_data = []
+    # how long to cache the review data, it is also cleared by signals when
+    # the agency's requests or their addresses' errors, opens or confirmations
+    # change
+    review_cache_timeout = 60 * 60
+    # how many of the latest errors to show for each address
+    review_error_limit = 5
 
-        def get_data(email_or_fax):
-            """Helper function to get email or fax data"""
-            if email_or_fax == "email":
-                address_model = EmailAddress
-                confirm_rel = "to_emails"
-                error_fields = [
-                    "email",
-                    "datetime",
-                    "recipient",
-                    "code",
-                    "error",
-                    "event",
-                    "reason",
-                ]
-            elif email_or_fax == "fax":
-                address_model = PhoneNumber
-                confirm_rel = "faxes"
-                error_fields = [
-                    "fax",
-                    "datetime",
-                    "recipient",
-                    "error_type",
-                    "error_code",
-                    "error_id",
-                ]
+    @staticmethod
+    def review_cache_key(agency_id):
+        """The cache key for an agency's review data"""
+        return "review_agency:{}".format(agency_id)
 
-            open_requests = (
-                self.agency.foiarequest_set.get_open()
-                .order_by("%s__status" % email_or_fax, email_or_fax)
-                .exclude(**{email_or_fax: None})
-                .select_related(
-                    "agency__jurisdiction", "composer", "email", "fax", "portal"
-                )
-                .annotate(
-                    latest_response=ExtractDay(
-                        Cast(
-                            Now()
-                            - Max(
-                                Case(
-                                    When(
-                                        communications__response=True,
-                                        then="communications__datetime",
-                                    )
-                                )
-                            ),
-                            models.DurationField(),
-                        )
-                    )
-                )
-                .only(
-                    "pk",
-                    "status",
-                    "title",
-                    "slug",
-                    "agency__jurisdiction__slug",
-                    "agency__jurisdiction__id",
-                    "composer__datetime_submitted",
-                    "date_estimate",
-                    "portal__name",
-                    "email__email",
-                    "email__name",
-                    "email__status",
-                    "fax__number",
-                    "fax__status",
-                )
-            )
-            grouped_requests = [
-                (k, list(v))
-                for k, v in groupby(open_requests, lambda f: getattr(f, email_or_fax))
-            ]
-            # do seperate queries for per email addr/fax number stats
-            # do annotations separately for performance reasons (limit joins)
-            addresses = address_model.objects.annotate(
-                error_count=Count("errors", distinct=True),
-                last_error=Max("errors__datetime"),
-            )
-            addresses = addresses.in_bulk(g[0].pk for g in grouped_requests)
-            addresses_confirm = address_model.objects.annotate(
-                last_confirm=Max("%s__confirmed_datetime" % confirm_rel)
-            )
-            addresses_confirm = addresses_confirm.in_bulk(
-                g[0].pk for g in grouped_requests
-            )
-            if email_or_fax == "email":
-                addresses_open = address_model.objects.annotate(
-                    last_open=Max("opens__datetime")
-                )
-                addresses_open = addresses_open.in_bulk(
-                    g[0].pk for g in grouped_requests
-                )
+    @classmethod
+    def clear_review_data(cls, agency_ids):
+        """Clear the cached review data for the given agencies"""
+        cache.delete_many({cls.review_cache_key(pk) for pk in agency_ids})
 
-            review_data = []
-            for addr, foias in grouped_requests:
-                # fetch the address with the annotated stats
-                addr = addresses[addr.pk]
-                review_data.append(
-                    {
-                        "address": addr,
-                        "error": addr.status == "error",
-                        "errors": addr.errors.select_related(
-                            "%s__communication__foia__agency__jurisdiction"
-                            % email_or_fax
-                        )
-                        .order_by("-datetime")
-                        .only(
-                            *error_fields
-                            + [
-                                "%s__communication__foia__agency__jurisdiction__slug"
-                                % email_or_fax,
-                                "%s__communication__foia__slug" % email_or_fax,
-                                "%s__communication__foia__title" % email_or_fax,
-                            ]
-                        )[:5],
-                        "foias": foias,
-                        "unacknowledged": any(f.status == "ack" for f in foias),
-                        "total_errors": addr.error_count,
-                        "last_error": addr.last_error,
-                        "last_confirm": addresses_confirm[addr.pk].last_confirm,
-                        "last_open": addresses_open[addr.pk].last_open
-                        if email_or_fax == "email"
-                        else None,
-                        "checkbox_name": "foias-%d-%s-%d"
-                        % (self.pk, email_or_fax, addr.pk),
-                        "email_or_fax": email_or_fax,
-                    }
-                )
-            return review_data
+    def get_review_data(self):
+        """Get all the data on all open requests for the agency"""
+        key = self.review_cache_key(self.agency_id)
+        review_data = cache.get(key)
+        if review_data is None:
+            review_data = self._load_review_data()
+            cache.set(key, review_data, self.review_cache_timeout)
+        # the data is shared by all tasks for the agency, but the checkbox names
+        # are specific to this task
+        return [
+            dict(
+                data,
+                checkbox_name="foias-%d-%s-%d"
+                % (self.pk, data["email_or_fax"], data["address"].pk)
+                if "email_or_fax" in data
+                else "%d-snail" % self.pk,
+            )
+            for data in review_data
+        ]
 
-        review_data.extend(get_data("email"))
-        review_data.extend(get_data("fax"))
-        # snail mail
+    def _load_review_data(self):
+        """Load the review data for the agency's open requests"""
         foias = list(
             self.agency.foiarequest_set.get_open()
-            .filter(email=None, fax=None)
             .select_related(
                 "agency__jurisdiction", "composer", "email", "fax", "portal"
             )
@@ -479,19 +393,153 @@ class ReviewAgencyTask(Task):
                 "fax__number",
                 "fax__status",
             )
+            .order_by("pk")
         )
+
+        review_data = []
+        for email_or_fax in ("email", "fax"):
+            grouped_requests = defaultdict(list)
+            for foia in foias:
+                address_id = getattr(foia, "%s_id" % email_or_fax)
+                if address_id is not None:
+                    grouped_requests[address_id].append(foia)
+            addresses = self._review_addresses(email_or_fax, grouped_requests)
+            errors = self._review_errors(email_or_fax, grouped_requests)
+            for addr in sorted(addresses.values(), key=lambda a: (a.status, a.pk)):
+                foias_ = grouped_requests[addr.pk]
+                review_data.append(
+                    {
+                        "address": addr,
+                        "error": addr.status == "error",
+                        "errors": errors[addr.pk],
+                        "foias": foias_,
+                        "unacknowledged": any(f.status == "ack" for f in foias_),
+                        "total_errors": addr.error_count,
+                        "last_error": addr.last_error,
+                        "last_confirm": addr.last_confirm,
+                        "last_open": getattr(addr, "last_open", None),
+                        "email_or_fax": email_or_fax,
+                    }
+                )
+
+        # snail mail
+        foias = [f for f in foias if f.email_id is None and f.fax_id is None]
         if foias:
             review_data.append(
                 {
                     "address": "Snail Mail",
                     "foias": foias,
-                    "checkbox_name": "%d-snail" % self.pk,
                     "unacknowledged": any(f.status == "ack" for f in foias),
                 }
             )
 
         return review_data
 
+    @staticmethod
+    def _review_addresses(email_or_fax, address_ids):
+        """Load the addresses with their error, confirm and open stats
+
+        Each stat is a separate subquery, so that they do not multiply each
+        other's rows
+        """
+
+        def aggregate(queryset, group, expression):
+            """Aggregate the queryset for each address"""
+            return Subquery(
+                queryset.order_by()
+                .values(group)
+                .annotate(value=expression)
+                .values("value")
+            )
+
+        if email_or_fax == "email":
+            address_model = EmailAddress
+            errors = EmailError.objects.filter(recipient=OuterRef("pk"))
+            confirms = EmailCommunication.objects.filter(to_emails=OuterRef("pk"))
+            confirm_group = "to_emails"
+        else:
+            address_model = PhoneNumber
+            errors = FaxError.objects.filter(recipient=OuterRef("pk"))
+            confirms = FaxCommunication.objects.filter(to_number=OuterRef("pk"))
+            confirm_group = "to_number"
+        annotations = {
+            "error_count": Coalesce(aggregate(errors, "recipient", Count("pk")), 0),
+            "last_error": aggregate(errors, "recipient", Max("datetime")),
+            "last_confirm": aggregate(
+                confirms, confirm_group, Max("confirmed_datetime")
+            ),
+        }
+        if email_or_fax == "email":
+            annotations["last_open"] = aggregate(
+                EmailOpen.objects.filter(recipient=OuterRef("pk")),
+                "recipient",
+                Max("datetime"),
+            )
+        return address_model.objects.annotate(**annotations).in_bulk(address_ids)
+
+    def _review_errors(self, email_or_fax, address_ids):
+        """Load the latest errors for each address in a single query"""
+        if email_or_fax == "email":
+            error_model = EmailError
+            error_fields = [
+                "email",
+                "datetime",
+                "recipient",
+                "code",
+                "error",
+                "event",
+                "reason",
+            ]
+        else:
+            error_model = FaxError
+            error_fields = [
+                "fax",
+                "datetime",
+                "recipient",
+                "error_type",
+                "error_code",
+                "error_id",
+            ]
+        # number each address's errors from the latest, to keep only the first few
+        ranked = (
+            error_model.objects.filter(recipient__in=address_ids)
+            .annotate(
+                error_rank=Window(
+                    RowNumber(),
+                    partition_by=[F("recipient")],
+                    order_by=F("datetime").desc(),
+                )
+            )
+            .order_by()
+            .values("pk", "error_rank")
+        )
+        sql, params = ranked.query.sql_with_params()
+        errors = (
+            error_model.objects.filter(
+                pk__in=RawSQL(
+                    "SELECT id FROM ({}) AS ranked WHERE error_rank <= %s".format(sql),
+                    params + (self.review_error_limit,),
+                )
+            )
+            .select_related(
+                "%s__communication__foia__agency__jurisdiction" % email_or_fax
+            )
+            .order_by("-datetime")
+            .only(
+                *error_fields
+                + [
+                    "%s__communication__foia__agency__jurisdiction__slug"
+                    % email_or_fax,
+                    "%s__communication__foia__slug" % email_or_fax,
+                    "%s__communication__foia__title" % email_or_fax,
+                ]
+            )
+        )
+        grouped_errors = defaultdict(list)
+        for error in errors:
+            grouped_errors[error.recipient_id].append(error)
+        return grouped_errors
+
     def update_contact(self, email_or_fax, foia_list, update_info, snail):
         """Updates the contact info on the agency and the provided requests."""
         # pylint: disable=too-many-branches, import-outside-toplevel
@@ -1,19 +1,31 @@
 """Signals for the task application"""
 # Django
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.urls import reverse
 
 # Standard Library
 import logging
 
 # MuckRock
+from muckrock.communication.models import (
+    EmailCommunication,
+    EmailError,
+    EmailOpen,
+    FaxCommunication,
+    FaxError,
+)
+from muckrock.foia.models import FOIACommunication, FOIARequest
 from muckrock.message.tasks import slack
 from muckrock.message.utils import format_user, slack_attachment, slack_message
+from muckrock.task import counters
 from muckrock.task.models import (
     BlacklistDomain,
     FlaggedTask,
     OrphanTask,
     ProjectReviewTask,
+    ReviewAgencyTask,
+    Task,
 )
 from muckrock.task.tasks import create_ticket
 
@@ -120,6 +132,80 @@ def flagged(sender, instance, created, **kwargs):
         create_ticket.delay(instance.pk)
 
 
+def count_pre_save(sender, instance, raw=False, **kwargs):
+    """Remember whether the task was counted as open before it is saved"""
+    # pylint: disable=protected-access
+    instance._counted_open = False
+    if instance.pk is not None and not raw:
+        old = (
+            Task.objects.filter(pk=instance.pk)
+            .values_list("resolved", "date_deferred")
+            .first()
+        )
+        instance._counted_open = old is not None and counters.is_open(*old)
+
+
+def count_post_save(sender, instance, raw=False, **kwargs):
+    """Update the open task counters if the task was opened or closed"""
+    # pylint: disable=protected-access
+    if raw:
+        return
+    is_open = counters.is_open(instance.resolved, instance.date_deferred)
+    if is_open != instance._counted_open:
+        delta = 1 if is_open else -1
+        transaction.on_commit(lambda: counters.adjust(sender, delta))
+
+
+def count_post_delete(sender, instance, **kwargs):
+    """Stop counting a deleted task"""
+    if counters.is_open(instance.resolved, instance.date_deferred):
+        transaction.on_commit(lambda: counters.adjust(sender, -1))
+
+
+# model -> the requests whose agencies' review data may change with it
+REVIEW_REQUESTS = {
+    FOIACommunication: lambda i: FOIARequest.objects.filter(pk=i.foia_id),
+    EmailError: lambda i: FOIARequest.objects.filter(email=i.recipient_id),
+    EmailOpen: lambda i: FOIARequest.objects.filter(email=i.recipient_id),
+    FaxError: lambda i: FOIARequest.objects.filter(fax=i.recipient_id),
+    EmailCommunication: lambda i: FOIARequest.objects.filter(email__to_emails=i),
+    FaxCommunication: lambda i: FOIARequest.objects.filter(fax=i.to_number_id),
+}
+
+
+def clear_review_data(sender, instance, raw=False, **kwargs):
+    """Clear the cached review data for the agencies affected by a change"""
+    if raw:
+        return
+    if sender is FOIARequest:
+        # the request may have just been closed, so always clear its agency
+        _clear_review_agencies([instance.agency_id])
+    else:
+        _clear_review_requests(REVIEW_REQUESTS[sender](instance))
+
+
+def clear_review_data_to_emails(sender, instance, action, reverse, pk_set, **kwargs):
+    """Clear the cached review data when an email's recipients are added"""
+    if action != "post_add":
+        return
+    email_ids = [instance.pk] if reverse else pk_set
+    _clear_review_requests(FOIARequest.objects.filter(email__in=email_ids))
+
+
+def _clear_review_requests(foias):
+    """Clear the cached review data for the agencies of the open requests"""
+    _clear_review_agencies(
+        foias.get_open().values_list("agency_id", flat=True).distinct()
+    )
+
+
+def _clear_review_agencies(agency_ids):
+    """Clear the cached review data for the agencies once committed"""
+    agency_ids = [pk for pk in agency_ids if pk is not None]
+    if agency_ids:
+        transaction.on_commit(lambda: ReviewAgencyTask.clear_review_data(agency_ids))
+
+
 post_save.connect(
     domain_blacklist,
     sender=OrphanTask,
@@ -138,3 +224,42 @@ post_save.connect(
 post_save.connect(
     flagged, sender=FlaggedTask, dispatch_uid="muckrock.task.signals.flagged"
 )
+
+# only the task types are counted - deleting a task also deletes its parent Task
+# row and sends post_delete for it, which would count the deletion twice
+for model in Task.__subclasses__():
+    pre_save.connect(
+        count_pre_save,
+        sender=model,
+        dispatch_uid="muckrock.task.signals.count_pre_save_{}".format(
+            model.__name__
+        ),
+    )
+    post_save.connect(
+        count_post_save,
+        sender=model,
+        dispatch_uid="muckrock.task.signals.count_post_save_{}".format(
+            model.__name__
+        ),
+    )
+    post_delete.connect(
+        count_post_delete,
+        sender=model,
+        dispatch_uid="muckrock.task.signals.count_post_delete_{}".format(
+            model.__name__
+        ),
+    )
+
+for model in [FOIARequest] + list(REVIEW_REQUESTS):
+    post_save.connect(
+        clear_review_data,
+        sender=model,
+        dispatch_uid="muckrock.task.signals.clear_review_data_{}".format(
+            model.__name__
+        ),
+    )
+m2m_changed.connect(
+    clear_review_data_to_emails,
+    sender=EmailCommunication.to_emails.through,
+    dispatch_uid="muckrock.task.signals.clear_review_data_to_emails",
+)
@@ -12,21 +12,17 @@ from django.utils import timezone
 # Standard Library
 import logging
 import sys
-from io import BytesIO
 from random import randint
 
 # Third Party
-import boto3
-from fpdf import FPDF
-from PyPDF2 import PdfFileMerger, PdfFileReader
 from requests.exceptions import RequestException
 from zenpy.lib.exception import APIException, ZenpyException
 
 # MuckRock
 from muckrock.foia.models import FOIACommunication, FOIARequest
+from muckrock.task import bulk_pdf, counters
 from muckrock.task.filters import SnailMailTaskFilterSet
 from muckrock.task.models import FlaggedTask, SnailMailTask
-from muckrock.task.pdf import CoverPDF, SnailMailPDF
 
 logger = logging.getLogger(__name__)
 
@@ -49,63 +45,55 @@ def submit_review_update(foia_pks, reply_text, **kwargs):
         foia.submit(switch=True)
 
 
+@task(ignore_result=True, name="muckrock.task.tasks.snail_mail_bulk_pdf_task")
+def snail_mail_bulk_pdf_task(pdf_name, get, **kwargs):
+    """Save a PDF file for all open snail mail tasks"""
+    # pylint: disable=unused-argument
+    task_pks = list(
+        SnailMailTaskFilterSet(
+            get,
+            queryset=SnailMailTask.objects.filter(resolved=False).order_by(
+                "-amount", "communication__foia__agency"
+            ),
+        ).qs.values_list("pk", flat=True)
+    )
+    run = bulk_pdf.BulkPDFRun(pdf_name)
+    chunks = run.start(task_pks)
+    if not chunks:
+        snail_mail_bulk_pdf_merge.delay(pdf_name)
+    for index, chunk in enumerate(chunks):
+        snail_mail_bulk_pdf_chunk.delay(pdf_name, index, chunk)
+
+
 @task(
     ignore_result=True,
     time_limit=900,
-    name="muckrock.task.tasks.snail_mail_bulk_pdf_task",
+    name="muckrock.task.tasks.snail_mail_bulk_pdf_chunk",
 )
-def snail_mail_bulk_pdf_task(pdf_name, get, **kwargs):
-    """Save a PDF file for all open snail mail tasks"""
-    # pylint: disable=too-many-locals
+def snail_mail_bulk_pdf_chunk(pdf_name, index, task_pks, **kwargs):
+    """Prepare the letters for a chunk of the bulk PDF"""
     # pylint: disable=unused-argument
-    # pylint: disable=too-many-statements
-    cover_info = []
-    bulk_merger = PdfFileMerger(strict=False)
-
-    snails = SnailMailTaskFilterSet(
-        get,
-        queryset=SnailMailTask.objects.filter(resolved=False)
-        .order_by("-amount", "communication__foia__agency")
-        .preload_pdf(),
-    ).qs[:100]
-
-    blank_pdf = FPDF()
-    blank_pdf.add_page()
-    blank = BytesIO(blank_pdf.output(dest="S").encode("latin-1"))
-    for snail in snails.iterator():
-        # generate the pdf and merge all pdf attachments
-        pdf = SnailMailPDF(
-            snail.communication, snail.category, snail.switch, snail.amount
-        )
-        prepared_pdf, page_count, files, _mail = pdf.prepare()
-        cover_info.append((snail, page_count, files))
-
-        if prepared_pdf is not None:
-            # append to the bulk pdf
-            bulk_merger.append(prepared_pdf)
-            # ensure we align for double sided printing
-            if PdfFileReader(prepared_pdf).getNumPages() % 2 == 1:
-                blank.seek(0)
-                bulk_merger.append(blank)
-
-    # preprend the cover sheet
-    cover_pdf = CoverPDF(cover_info)
-    cover_pdf.generate()
-    if cover_pdf.page % 2 == 1:
-        cover_pdf.add_page()
-    bulk_merger.merge(0, BytesIO(cover_pdf.output(dest="S").encode("latin-1")))
-
-    bulk_pdf = BytesIO()
-    bulk_merger.write(bulk_pdf)
-    bulk_pdf.seek(0)
-
-    s3 = boto3.client("s3")
-    s3.upload_fileobj(
-        bulk_pdf,
-        settings.AWS_MEDIA_BUCKET_NAME,
-        pdf_name,
-        ExtraArgs={"ACL": settings.AWS_DEFAULT_ACL},
-    )
+    run = bulk_pdf.BulkPDFRun(pdf_name)
+    try:
+        bulk_pdf.prepare_chunk(run, index, task_pks)
+    except Exception:
+        # flag the letters on the cover sheet instead of silently leaving them out
+        run.fail_chunk(task_pks)
+        raise
+    finally:
+        if run.finish_chunk():
+            snail_mail_bulk_pdf_merge.delay(pdf_name)
+
+
+@task(
+    ignore_result=True,
+    time_limit=900,
+    name="muckrock.task.tasks.snail_mail_bulk_pdf_merge",
+)
+def snail_mail_bulk_pdf_merge(pdf_name, **kwargs):
+    """Merge the prepared letters into the bulk PDF"""
+    # pylint: disable=unused-argument
+    bulk_pdf.merge_parts(bulk_pdf.BulkPDFRun(pdf_name))
 
 
 @task(ignore_result=True, max_retries=5, name="muckrock.task.tasks.create_ticket")
@@ -137,6 +125,14 @@ def create_ticket(flag_pk, **kwargs):
         )
 
 
+@periodic_task(
+    run_every=crontab(minute="*/15"), name="muckrock.task.tasks.recount_tasks"
+)
+def recount_tasks():
+    """Correct any drift in the cached open task counts"""
+    counters.recount()
+
+
 @periodic_task(
     run_every=crontab(hour=4, minute=0), name="muckrock.task.tasks.cleanup_flags"
 )
@@ -0,0 +1,134 @@
+"""
+Tests for generating the bulk snail mail PDF
+"""
+
+# Django
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase
+
+# Standard Library
+from io import BytesIO
+
+# Third Party
+from fpdf import FPDF
+from mock import Mock, patch
+from nose.tools import assert_raises, eq_, ok_
+
+# MuckRock
+from muckrock.task import bulk_pdf
+from muckrock.task.factories import SnailMailTaskFactory
+
+
+def mock_run(results=None, failed=None, task_pks=None, chunks=0):
+    """A run with its progress stored in a mock instead of redis"""
+    run = Mock(pdf_name="bulk.pdf")
+    run.part_name.side_effect = "bulk.pdf.parts/{:05d}.pdf".format
+    run.get_results.return_value = results or {}
+    run.get_failed.return_value = failed or set()
+    run.get_task_pks.return_value = task_pks or []
+    run.get_chunk_count.return_value = chunks
+    return run
+
+
+@patch("muckrock.task.bulk_pdf.get_redis_connection")
+class TestBulkPDFRun(TestCase):
+    """The progress of a bulk PDF is tracked in redis"""
+
+    def test_start(self, mock_redis):
+        """The tasks are split into chunks, which are all pending"""
+        run = bulk_pdf.BulkPDFRun("bulk.pdf")
+        task_pks = list(range(bulk_pdf.CHUNK_SIZE * 2 + 1))
+        chunks = run.start(task_pks)
+        eq_(len(chunks), 3)
+        eq_(sum(chunks, []), task_pks)
+        pipe = mock_redis.return_value.pipeline.return_value
+        pipe.set.assert_any_call(
+            "snail_mail_pdf:bulk.pdf:pending", 3, ex=run.run_timeout
+        )
+        pipe.rpush.assert_called_once_with("snail_mail_pdf:bulk.pdf:tasks", *task_pks)
+
+    def test_finish_chunk(self, mock_redis):
+        """Only the last chunk to finish is told to merge"""
+        mock_redis.return_value.decr.side_effect = [2, 1, 0]
+        run = bulk_pdf.BulkPDFRun("bulk.pdf")
+        eq_([run.finish_chunk() for _ in range(3)], [False, False, True])
+
+    def test_fail_chunk(self, mock_redis):
+        """The tasks of failed chunks are recorded"""
+        mock_redis.return_value.smembers.return_value = {b"1", b"2"}
+        run = bulk_pdf.BulkPDFRun("bulk.pdf")
+        run.fail_chunk([1, 2])
+        mock_redis.return_value.pipeline.return_value.sadd.assert_called_once_with(
+            "snail_mail_pdf:bulk.pdf:failed", 1, 2
+        )
+        eq_(run.get_failed(), {1, 2})
+
+    def test_clear(self, mock_redis):
+        """Clearing a run deletes its part files"""
+        mock_redis.return_value.get.return_value = b"1"
+        default_storage.save("bulk.pdf.parts/00000.pdf", ContentFile(b"part"))
+        bulk_pdf.BulkPDFRun("bulk.pdf").clear()
+        ok_(not default_storage.exists("bulk.pdf.parts/00000.pdf"))
+
+
+class TestBulkPDF(TestCase):
+    """Preparing and merging the bulk PDF"""
+
+    def test_prepare_chunk(self):
+        """Letters are recorded once their part is saved"""
+        snail = SnailMailTaskFactory()
+        run = mock_run()
+        bulk_pdf.prepare_chunk(run, 0, [snail.pk])
+        ok_(default_storage.exists("bulk.pdf.parts/00000.pdf"))
+        run.record.assert_called_once_with([(snail.pk, 1, [])])
+
+    @patch("muckrock.task.bulk_pdf.PdfFileMerger")
+    def test_prepare_chunk_error(self, mock_merger):
+        """Nothing is recorded if the part can not be written"""
+        mock_merger.return_value.write.side_effect = ValueError
+        snail = SnailMailTaskFactory()
+        run = mock_run()
+        with assert_raises(ValueError):
+            bulk_pdf.prepare_chunk(run, 0, [snail.pk])
+        run.record.assert_not_called()
+
+    def test_cover_info(self):
+        """Letters are listed in order, with failed letters as errors"""
+        snails = SnailMailTaskFactory.create_batch(3)
+        run = mock_run(
+            results={snails[0].pk: {"pages": 2, "files": []}},
+            failed={snails[1].pk},
+            task_pks=[snail.pk for snail in reversed(snails)],
+        )
+        eq_(bulk_pdf.cover_info(run), [(snails[1], None, []), (snails[0], 2, [])])
+
+    @patch("muckrock.task.bulk_pdf.default_storage")
+    @patch("muckrock.task.bulk_pdf.boto3")
+    def test_merge_parts(self, mock_boto3, mock_storage):
+        """The cover sheet and parts are uploaded, and the run is cleared"""
+        part = FPDF()
+        part.add_page()
+        mock_storage.exists.side_effect = lambda name: name.endswith("00000.pdf")
+        mock_storage.open.return_value = BytesIO(
+            part.output(dest="S").encode("latin-1")
+        )
+        snail = SnailMailTaskFactory()
+        run = mock_run(
+            results={snail.pk: {"pages": 1, "files": []}},
+            task_pks=[snail.pk],
+            chunks=2,
+        )
+        bulk_pdf.merge_parts(run)
+        mock_storage.open.assert_called_once_with("bulk.pdf.parts/00000.pdf", "rb")
+        mock_boto3.client.return_value.upload_fileobj.assert_called_once()
+        run.clear.assert_called_once_with()
+
+    @patch("muckrock.task.bulk_pdf.boto3")
+    def test_merge_parts_error(self, mock_boto3):
+        """The run is cleared even if the upload fails"""
+        mock_boto3.client.return_value.upload_fileobj.side_effect = ValueError
+        run = mock_run()
+        with assert_raises(ValueError):
+            bulk_pdf.merge_parts(run)
+        run.clear.assert_called_once_with()
@@ -4,6 +4,7 @@ Tests for Tasks models
 
 # Django
 from django.conf import settings
+from django.core.cache import cache
 from django.test import TestCase
 from django.test.utils import override_settings
 from django.urls import reverse
@@ -11,6 +12,7 @@ from django.utils import timezone
 
 # Standard Library
 import logging
+from datetime import timedelta
 
 # Third Party
 import mock
@@ -18,6 +20,11 @@ import requests_mock
 from nose.tools import assert_false, eq_, ok_, raises
 
 # MuckRock
+from muckrock.communication.factories import (
+    EmailAddressFactory,
+    EmailCommunicationFactory,
+)
+from muckrock.communication.models import EmailError, EmailOpen
 from muckrock.core.factories import AgencyFactory, UserFactory
 from muckrock.core.test_utils import mock_squarelet
 from muckrock.foia.factories import (
@@ -27,7 +34,14 @@ from muckrock.foia.factories import (
 )
 from muckrock.foia.models import FOIARequest
 from muckrock.jurisdiction.factories import StateJurisdictionFactory
-from muckrock.task.factories import FlaggedTaskFactory, ProjectReviewTaskFactory
+from muckrock.task import counters
+from muckrock.task.factories import (
+    FlaggedTaskFactory,
+    OrphanTaskFactory,
+    ProjectReviewTaskFactory,
+    ResponseTaskFactory,
+    ReviewAgencyTaskFactory,
+)
 from muckrock.task.forms import ResponseTaskForm
 from muckrock.task.models import (
     BlacklistDomain,
@@ -36,6 +50,7 @@ from muckrock.task.models import (
     NewAgencyTask,
     OrphanTask,
     ResponseTask,
+    ReviewAgencyTask,
     SnailMailTask,
     StatusChangeTask,
     Task,
@@ -420,6 +435,112 @@ class NewAgencyTaskTests(TestCase):
         assert_false(FOIARequest.objects.filter(pk=existing_foia.pk).exists())
 
 
+class ReviewAgencyTaskTests(TestCase):
+    """Test the ReviewAgencyTask class"""
+
+    def test_get_review_data(self):
+        """The review data groups the open requests by address"""
+        agency = AgencyFactory()
+        email = EmailAddressFactory()
+        foia = FOIARequestFactory(agency=agency, email=email, status="ack")
+        FOIARequestFactory(agency=agency, email=None, status="processed")
+        FOIARequestFactory(agency=agency, email=email, status="done")
+        email_comm = EmailCommunicationFactory(communication__foia=foia)
+        for i in range(6):
+            EmailError.objects.create(
+                email=email_comm,
+                datetime=timezone.now() - timedelta(i),
+                recipient=email,
+                code="550",
+                event="bounced",
+                reason="",
+            )
+        task = ReviewAgencyTaskFactory(agency=agency)
+
+        review_data = task.get_review_data()
+        eq_(len(review_data), 2)
+        eq_(review_data[0]["address"], email)
+        eq_(review_data[0]["foias"], [foia])
+        eq_(review_data[0]["total_errors"], 6)
+        eq_(len(review_data[0]["errors"]), 5)
+        ok_(review_data[0]["unacknowledged"])
+        eq_(
+            review_data[0]["checkbox_name"], "foias-%d-email-%d" % (task.pk, email.pk)
+        )
+        eq_(review_data[1]["address"], "Snail Mail")
+        eq_(review_data[1]["checkbox_name"], "%d-snail" % task.pk)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class ReviewAgencyTaskCacheTests(TestCase):
+    """Test clearing the cached review data for an agency"""
+
+    def setUp(self):
+        self.email = EmailAddressFactory()
+        self.foia = FOIARequestFactory(email=self.email, status="ack")
+        self.task = ReviewAgencyTaskFactory(agency=self.foia.agency)
+        self.key = ReviewAgencyTask.review_cache_key(self.foia.agency_id)
+        self.email_comm = EmailCommunicationFactory(communication__foia=self.foia)
+        self.task.get_review_data()
+        ok_(cache.get(self.key) is not None)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_email_error(self):
+        """A new error for the request's email address clears the data"""
+        with self.captureOnCommitCallbacks(execute=True):
+            EmailError.objects.create(
+                email=self.email_comm,
+                datetime=timezone.now(),
+                recipient=self.email,
+                code="550",
+                event="bounced",
+                reason="",
+            )
+        ok_(cache.get(self.key) is None)
+
+    def test_email_open(self):
+        """A new open for the request's email address clears the data"""
+        with self.captureOnCommitCallbacks(execute=True):
+            EmailOpen.objects.create(
+                email=self.email_comm,
+                datetime=timezone.now(),
+                recipient=self.email,
+                city="Boston",
+                region="MA",
+                country="US",
+                client_type="browser",
+                client_name="Firefox",
+                client_os="Linux",
+            )
+        ok_(cache.get(self.key) is None)
+
+    def test_email_communication(self):
+        """Sending an email to the request's address clears the data"""
+        with self.captureOnCommitCallbacks(execute=True):
+            email_comm = EmailCommunicationFactory(communication__foia=self.foia)
+        self.task.get_review_data()
+        with self.captureOnCommitCallbacks(execute=True):
+            email_comm.to_emails.add(self.email)
+        ok_(cache.get(self.key) is None)
+
+    def test_foia_request(self):
+        """Saving a request clears the data, even once it is closed"""
+        self.foia.status = "done"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.foia.save()
+        ok_(cache.get(self.key) is None)
+
+    def test_other_agency(self):
+        """Changes to other agencies' requests leave the data cached"""
+        with self.captureOnCommitCallbacks(execute=True):
+            FOIARequestFactory()
+        ok_(cache.get(self.key) is not None)
+
+
 class ResponseTaskTests(TestCase):
     """Test the ResponseTask class"""
 
@@ -637,3 +758,41 @@ class TestTaskManager(TestCase):
             self.tasks,
             "The manager should return all the tasks that incorporate this FOIA.",
         )
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class TestTaskCounters(TestCase):
+    """Test the cached open task counters"""
+
+    def test_counters(self):
+        """The counters are kept up to date as tasks change"""
+        OrphanTaskFactory()
+        counts = counters.get_counts()
+        eq_(counts["all"], 1)
+        eq_(counts["orphan"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            task = OrphanTaskFactory()
+            ResponseTaskFactory()
+        with self.captureOnCommitCallbacks(execute=True):
+            task.defer(timezone.now().date() + timedelta(1))
+        counts = counters.get_counts()
+        eq_(counts["all"], 2)
+        eq_(counts["orphan"], 1)
+        eq_(counts["response"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            task.defer(None)
+            task.resolve()
+        eq_(counters.get_counts(), counters.count_tasks())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response_task = ResponseTaskFactory()
+        with self.captureOnCommitCallbacks(execute=True):
+            response_task.delete()
+        counts = counters.get_counts()
+        eq_(counts["all"], 2)
+        eq_(counts["response"], 1)
+        eq_(counts, counters.count_tasks())
@@ -9,7 +9,6 @@ from django.contrib.auth.decorators import user_passes_test
 from django.contrib.auth.models import User
 from django.core.exceptions import PermissionDenied
 from django.db import transaction
-from django.db.models import Count
 from django.http import (
     Http404,
     HttpResponse,
@@ -41,6 +40,7 @@ from muckrock.core.views import MRFilterListView, class_view_decorator
 from muckrock.foia.models import STATUS, FOIARequest
 from muckrock.foia.tasks import prepare_snail_mail
 from muckrock.portal.forms import PortalForm
+from muckrock.task import counters
 from muckrock.task.filters import (
     FlaggedTaskFilterSet,
     NewAgencyTaskFilterSet,
@@ -79,31 +79,6 @@ from muckrock.task.pdf import SnailMailPDF
 from muckrock.task.tasks import snail_mail_bulk_pdf_task, submit_review_update
 
 
-def count_tasks():
-    """Counts all unresolved tasks and adds them to a dictionary"""
-    count = (
-        Task.objects.get_unresolved()
-        .get_undeferred()
-        .aggregate(
-            all=Count("id"),
-            orphan=Count("orphantask"),
-            snail_mail=Count("snailmailtask"),
-            review_agency=Count("reviewagencytask"),
-            flagged=Count("flaggedtask"),
-            projectreview=Count("projectreviewtask"),
-            new_agency=Count("newagencytask"),
-            response=Count("responsetask"),
-            status_change=Count("statuschangetask"),
-            crowdfund=Count("crowdfundtask"),
-            multirequest=Count("multirequesttask"),
-            portal=Count("portaltask"),
-            new_portal=Count("newportaltask"),
-            payment_info=Count("paymentinfotask"),
-        )
-    )
-    return count
-
-
 @method_decorator(user_passes_test(lambda u: u.is_staff), name="get")
 class TaskList(MRFilterListView):
     """List of tasks"""
@@ -144,7 +119,7 @@ class TaskList(MRFilterListView):
     def get_context_data(self, **kwargs):
         """Adds counters for each of the sections and for processing requests."""
         context = super(TaskList, self).get_context_data(**kwargs)
-        context["counters"] = count_tasks()
+        context["counters"] = counters.get_counts()
         context["bulk_actions"] = self.bulk_actions
         context["processing_count"] = FOIARequest.objects.filter(
             status="submitted"